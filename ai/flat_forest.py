@@ -0,0 +1,136 @@
+import numpy as np
+
+TREE_LEAF = -1
+
+
+class FlatForest:
+    """
+    RandomForestRegressor를 평탄한 배열로 변환한 추론 전용 모델.
+
+    모든 트리의 노드를 하나의 연속 배열(feature, threshold, left, right, value)에 이어 붙이고,
+    리프는 자기 자신을 가리키게 하여 max_depth번 반복하면 모든 (트리, 행)이 리프에 도달합니다.
+    sklearn과 같은 방식(float32 입력, 트리 순서대로 누적 후 평균)으로 계산하므로 결과가 동일합니다.
+    """
+
+    __slots__ = ("feature", "threshold", "left", "right", "value", "missing_left", "roots", "max_depth",
+                 "n_features")
+
+    def __init__(self, feature, threshold, left, right, value, missing_left, roots, max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.missing_left = missing_left
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features = n_features
+
+    @classmethod
+    def from_sklearn(cls, model) -> "FlatForest":
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        if any(tree.n_outputs != 1 for tree in trees):
+            raise ValueError("단일 출력 회귀 모델만 변환할 수 있습니다.")
+
+        features, thresholds, lefts, rights, values, missing, roots = [], [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            n = tree.node_count
+            index = np.arange(offset, offset + n, dtype=np.int64)
+            is_leaf = tree.children_left == TREE_LEAF
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, index, tree.children_left + offset))
+            rights.append(np.where(is_leaf, index, tree.children_right + offset))
+            values.append(tree.value[:, 0, 0])
+            mgl = getattr(tree, "missing_go_to_left", None)
+            missing.append(np.where(is_leaf, True, mgl.astype(bool)) if mgl is not None else is_leaf.copy())
+            roots.append(offset)
+            offset += n
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.int64),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.int64),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.int64),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            missing_left=np.ascontiguousarray(np.concatenate(missing), dtype=bool),
+            roots=np.asarray(roots, dtype=np.int64),
+            max_depth=max(tree.max_depth for tree in trees),
+            n_features=model.n_features_in_,
+        )
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def predict(self, X) -> np.ndarray:
+        """(n_rows, n_features) 입력의 예측값을 반환합니다."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"입력 형태 오류: {X.shape}, 특성 수 {self.n_features} 필요")
+        # (행, 트리) 노드 위치
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.n_trees))
+        leaf_values = _traverse(self, X, nodes)
+        return _average(leaf_values, np.full(X.shape[0], self.n_trees))
+
+
+def _traverse(forest: FlatForest, X: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+    rows = np.arange(X.shape[0])[:, None]
+    for _ in range(forest.max_depth):
+        x = X[rows, forest.feature[nodes]]
+        go_left = (x <= forest.threshold[nodes]) | (np.isnan(x) & forest.missing_left[nodes])
+        nodes = np.where(go_left, forest.left[nodes], forest.right[nodes])
+    return forest.value[nodes]
+
+
+def _average(leaf_values: np.ndarray, n_trees: np.ndarray) -> np.ndarray:
+    # sklearn과 같은 순서(트리 순서대로 누적 후 나눗셈)로 합산해야 결과가 비트 단위로 같음
+    total = np.zeros(leaf_values.shape[0], dtype=np.float64)
+    for t in range(leaf_values.shape[1]):
+        total += leaf_values[:, t]
+    return total / n_trees
+
+
+def predict_each(forests: list, X) -> np.ndarray:
+    """
+    forests[i]로 X[i] 한 행씩 예측합니다.
+    여러 센서의 모델과 입력을 한 번의 배열 연산으로 평가합니다.
+    """
+    if not forests:
+        return np.empty(0, dtype=np.float64)
+    X = np.asarray(X, dtype=np.float32)
+
+    offsets = np.cumsum([0] + [len(f.value) for f in forests[:-1]])
+    max_trees = max(f.n_trees for f in forests)
+    # 트리 수가 적은 모델은 값이 0인 리프(마지막 노드)로 채움: 합에 0을 더해도 값이 바뀌지 않음
+    pad = int(offsets[-1]) + len(forests[-1].value)
+
+    merged = FlatForest(
+        feature=np.concatenate([f.feature for f in forests] + [np.zeros(1, dtype=np.int64)]),
+        threshold=np.concatenate([f.threshold for f in forests] + [np.full(1, np.inf)]),
+        left=np.concatenate([f.left + o for f, o in zip(forests, offsets)] + [np.full(1, pad)]),
+        right=np.concatenate([f.right + o for f, o in zip(forests, offsets)] + [np.full(1, pad)]),
+        value=np.concatenate([f.value for f in forests] + [np.zeros(1)]),
+        missing_left=np.concatenate([f.missing_left for f in forests] + [np.ones(1, dtype=bool)]),
+        roots=None,
+        max_depth=max(f.max_depth for f in forests),
+        n_features=forests[0].n_features,
+    )
+    nodes = np.full((len(forests), max_trees), pad, dtype=np.int64)
+    for i, (f, o) in enumerate(zip(forests, offsets)):
+        nodes[i, :f.n_trees] = f.roots + o
+
+    leaf_values = _traverse(merged, X, nodes)
+    return _average(leaf_values, np.array([f.n_trees for f in forests]))
+
+
+def compile_model(model):
+    """지원하는 모델(RandomForestRegressor)이면 FlatForest로 변환하고, 아니면 그대로 반환합니다."""
+    if type(model).__name__ == "RandomForestRegressor" and hasattr(model, "estimators_"):
+        try:
+            return FlatForest.from_sklearn(model)
+        except (AttributeError, ValueError):
+            return model
+    return model
@@ -1,10 +1,14 @@
 import pandas as pd
-import pickle
-import os
 import logging
 from datetime import datetime, timedelta, timezone
-from ai.heuristic_health_score import heuristic_health_score
+from ai.flat_forest import FlatForest, predict_each
+from ai.heuristic_health_score import heuristic_health_score, heuristic_health_scores, heuristic_scores_from_means
+from ai.model_cache import model_cache
+from ai.model_registry import save_model as save_to_registry, SavedModels
+from config.metrics import metrics
+from config.settings import MIN_ANALYSIS_DAYS
 from services.analysis_result_service import send_analysis_result
+from services.analysis_window import recent_window
 
 
 REQUIRED_DAYS = 15
@@ -12,102 +16,69 @@ KST = timezone(timedelta(hours=9))
 
 logger = logging.getLogger(__name__)
 
+@metrics.timed("model_load_seconds")
 def load_model(sensor_type: str, gateway_id: str, sensor_id: str):
-    model_path = f"model_registry/{sensor_type}/{gateway_id}_{sensor_id}.pkl"
-    if not os.path.isfile(model_path):
-        return None
     try:
-        with open(model_path, 'rb') as f:
-            model = pickle.load(f)
-        return model
+        return model_cache.get(sensor_type, gateway_id, sensor_id)
     except Exception as e:
-        logger.error(f"모델 로드 실패: {e}")
+        logger.error("모델 로드 실패: %s", e)
         return None
 
 def save_model(model, sensor_type, gateway_id, sensor_id):
-    model_dir = f"model_registry/{sensor_type}"
-    os.makedirs(model_dir, exist_ok=True)
-    model_path = f"{model_dir}/{gateway_id}_{sensor_id}.pkl"
-    with open(model_path, 'wb') as f:
-        pickle.dump(model, f)
-    logger.info(f"모델 저장 완료: {model_path}")
+    save_to_registry(model, sensor_type, gateway_id, sensor_id)
+    logger.info("모델 저장 완료: %s/%s_%s", sensor_type, gateway_id, sensor_id)
 
+def _build_result(sensor_type, gateway_id, sensor_id, model_type, score, analyzed_at,
+                  status, failure_reason, actual_days) -> dict:
+    if model_type is None:
+        method = "none"
+    else:
+        method = "model" if model_type.startswith("RandomForest") else "heuristic"
+    metrics.inc("sensors_scored_total", method=method, status=status)
+    return {
+        "result": {
+            "analysisType": "THRESHOLD_DIFF_ANALYSIS",
+            "sensorInfo": {
+                "gatewayId": gateway_id,
+                "sensorId": sensor_id,
+                "sensorType": sensor_type
+            },
+            "model": model_type,
+            "healthScore": round(score, 4) if score is not None else None,
+            "analyzedAt": analyzed_at,
+            "meta": {
+                "analysisStatus": status,
+                "failureReason": failure_reason,
+                "actualDataDays": actual_days,
+                "requiredData_days": REQUIRED_DAYS,
+                "analysisWindowDays": REQUIRED_DAYS
+            }
+        }
+    }
+
+@metrics.timed("predict_seconds")
 def predict(sensor_type: str, gateway_id: str, sensor_id: str, data: pd.DataFrame) -> dict:
-    from model_trainer import train_model  # 🔄 조건 만족 시 내부에서 호출
+    from ai.model_trainer import train_model  # 🔄 조건 만족 시 내부에서 호출
 
     actual_days = len(data)
     analyzed_at = int(datetime.now(KST).timestamp())
 
     if actual_days < REQUIRED_DAYS:
-        logger.warning(f"데이터 일수 부족: {actual_days}일 - heuristic 점수 계산으로 대체합니다.")
+        logger.warning("데이터 일수 부족: %s일 - heuristic 점수 계산으로 대체합니다.", actual_days)
         score = heuristic_health_score(data)
-        return {
-            "result": {
-                "analysisType": "THRESHOLD_DIFF_ANALYSIS",
-                "sensorInfo": {
-                    "gatewayId": gateway_id,
-                    "sensorId": sensor_id,
-                    "sensorType": sensor_type
-                },
-                "model": "Heuristic-based (insufficient data)",
-                "healthScore": round(score, 4),
-                "analyzedAt": analyzed_at,
-                "meta": {
-                    "analysisStatus": "insufficient_data_heuristic_used",
-                    "failureReason": "not_enough_days",
-                    "actualDataDays": actual_days,
-                    "requiredData_days": REQUIRED_DAYS,
-                    "analysisWindowDays": REQUIRED_DAYS
-                }
-            }
-        }
+        return _build_result(sensor_type, gateway_id, sensor_id, "Heuristic-based (insufficient data)", score,
+                             analyzed_at, "insufficient_data_heuristic_used", "not_enough_days", actual_days)
 
     required_columns = ['min_diff', 'max_diff', 'avg_diff']
     if not all(col in data.columns for col in required_columns):
-        logger.error(f"필요 컬럼 누락: {required_columns} 중 일부가 데이터에 없습니다.")
-        return {
-            "result": {
-                "analysisType": "THRESHOLD_DIFF_ANALYSIS",
-                "sensorInfo": {
-                    "gatewayId": gateway_id,
-                    "sensorId": sensor_id,
-                    "sensorType": sensor_type
-                },
-                "model": None,
-                "healthScore": None,
-                "analyzedAt": analyzed_at,
-                "meta": {
-                    "analysisStatus": "invalid_data",
-                    "failureReason": "missing_required_columns",
-                    "actualDataDays": actual_days,
-                    "requiredData_days": REQUIRED_DAYS,
-                    "analysisWindowDays": REQUIRED_DAYS
-                }
-            }
-        }
+        logger.error("필요 컬럼 누락: %s 중 일부가 데이터에 없습니다.", required_columns)
+        return _build_result(sensor_type, gateway_id, sensor_id, None, None,
+                             analyzed_at, "invalid_data", "missing_required_columns", actual_days)
 
     if data[required_columns].isnull().values.any():
         logger.error("결측치 존재: 데이터에 NULL 값이 포함되어 있습니다.")
-        return {
-            "result": {
-                "analysisType": "THRESHOLD_DIFF_ANALYSIS",
-                "sensorInfo": {
-                    "gatewayId": gateway_id,
-                    "sensorId": sensor_id,
-                    "sensorType": sensor_type
-                },
-                "model": None,
-                "healthScore": None,
-                "analyzedAt": analyzed_at,
-                "meta": {
-                    "analysisStatus": "invalid_data",
-                    "failureReason": "contains_null_values",
-                    "actualDataDays": actual_days,
-                    "requiredData_days": REQUIRED_DAYS,
-                    "analysisWindowDays": REQUIRED_DAYS
-                }
-            }
-        }
+        return _build_result(sensor_type, gateway_id, sensor_id, None, None,
+                             analyzed_at, "invalid_data", "contains_null_values", actual_days)
 
     model = load_model(sensor_type, gateway_id, sensor_id)
     x_input = data[required_columns].mean().values.reshape(1, -1)
@@ -115,19 +86,19 @@ def predict(sensor_type: str, gateway_id: str, sensor_id: str, data: pd.DataFram
     if model:
         score = model.predict(x_input)[0]
         model_type = "RandomForest"
-        logger.info(f"모델 예측 성공 - 점수: {score}")
+        logger.info("모델 예측 성공 - 점수: %s", score)
     else:
         # ✨ 조건 만족 시 학습 시도
         if 'health_score' in data.columns and actual_days >= REQUIRED_DAYS:
             try:
-                logger.info(f"모델이 없어 학습 시도 중: {sensor_type}/{gateway_id}/{sensor_id}")
+                logger.info("모델이 없어 학습 시도 중: %s/%s/%s", sensor_type, gateway_id, sensor_id)
                 model = train_model(data)
                 save_model(model, sensor_type, gateway_id, sensor_id)
                 score = model.predict(x_input)[0]
                 model_type = "RandomForest (newly trained)"
-                logger.info(f"새 모델 학습 및 예측 성공 - 점수: {score}")
+                logger.info("새 모델 학습 및 예측 성공 - 점수: %s", score)
             except Exception as e:
-                logger.error(f"모델 학습 실패, 휴리스틱으로 대체: {e}")
+                logger.error("모델 학습 실패, 휴리스틱으로 대체: %s", e)
                 score = heuristic_health_score(data)
                 model_type = "Heuristic-based (fallback)"
         else:
@@ -135,26 +106,167 @@ def predict(sensor_type: str, gateway_id: str, sensor_id: str, data: pd.DataFram
             model_type = "Heuristic-based"
             logger.info("모델이 없어 heuristic으로 점수 계산")
 
-    return {
-        "result": {
-            "analysisType": "THRESHOLD_DIFF_ANALYSIS",
-            "sensorInfo": {
-                "gatewayId": gateway_id,
-                "sensorId": sensor_id,
-                "sensorType": sensor_type
-            },
-            "model": model_type,
-            "healthScore": round(score, 4),
-            "analyzedAt": analyzed_at,
-            "meta": {
-                "analysisStatus": "analyzed",
-                "failureReason": None,
-                "actualDataDays": actual_days,
-                "requiredData_days": REQUIRED_DAYS,
-                "analysisWindowDays": REQUIRED_DAYS
-            }
-        }
-    }
+    return _build_result(sensor_type, gateway_id, sensor_id, model_type, score,
+                         analyzed_at, "analyzed", None, actual_days)
+
+@metrics.timed("predict_batch_seconds")
+def predict_batch(data: pd.DataFrame, sensor_type: str = None,
+                  min_days: int = MIN_ANALYSIS_DAYS, failed: list = None) -> list:
+    """
+    여러 센서의 이력을 한 번에 받아 센서별 predict 결과 목록을 반환합니다.
+
+    - 센서별 최근 REQUIRED_DAYS개(결측 제외) 윈도우 추출, 일수 확인, heuristic 점수 계산을
+      groupby 한 번으로 처리합니다.
+    - 변환된 모델(FlatForest)이 있는 센서는 모아서 predict_each 한 번으로 예측합니다.
+    - 그 외 모델이 있거나 학습이 가능한 센서만 predict를 개별 호출합니다.
+    - sensor_type을 주지 않으면 data의 sensor_type 컬럼 기준으로 전체 센서를 처리합니다.
+    - min_days 미만인 센서는 결과에서 제외합니다.
+    - failed(list)를 주면 예측 중 오류로 결과가 없는 센서의 (gateway_id, sensor_id)를 담습니다.
+    """
+    required_columns = ['min_diff', 'max_diff', 'avg_diff']
+    missing = set(required_columns) - set(data.columns)
+    if missing:
+        raise ValueError(f"필요 컬럼 누락: {missing}")
+
+    if sensor_type is not None:
+        data = data.assign(sensor_type=sensor_type)
+    keys = ["sensor_type", "gateway_id", "sensor_id"]
+
+    # 센서별 최근 REQUIRED_DAYS개 윈도우 (이력 저장소/롤링 윈도우와 같은 기준)
+    window = recent_window(data, REQUIRED_DAYS)
+
+    counts = window.groupby(keys, observed=True, sort=False).size()
+    eligible = counts[counts >= min_days]
+    if len(eligible) < len(counts):
+        logger.warning("⚠️ 분석 생략 - 데이터 부족 센서 %s개 (최소 %s개 필요)", len(counts) - len(eligible), min_days)
+    if eligible.empty:
+        return []
+
+    grouped = window.groupby(keys, observed=True, sort=False)
+    scores = heuristic_health_scores(window, keys).reindex(eligible.index)
+    can_train = 'health_score' in window.columns
+    analyzed_at = int(datetime.now(KST).timestamp())
+    saved_models = {}
+    compiled = []  # (s_type, gateway_id, sensor_id, actual_days, forest)
+    results = []
+
+    for (s_type, gateway_id, sensor_id), actual_days, score in zip(eligible.index, eligible.values, scores.values):
+        actual_days = int(actual_days)
+        if actual_days < REQUIRED_DAYS:
+            results.append(_build_result(
+                s_type, gateway_id, sensor_id, "Heuristic-based (insufficient data)", float(score),
+                analyzed_at, "insufficient_data_heuristic_used", "not_enough_days", actual_days))
+            continue
+
+        if s_type not in saved_models:
+            saved_models[s_type] = SavedModels(s_type)
+        has_model = (gateway_id, sensor_id) in saved_models[s_type]
+        if has_model:
+            model = load_model(s_type, gateway_id, sensor_id)
+            if isinstance(model, FlatForest):
+                compiled.append((s_type, gateway_id, sensor_id, actual_days, model))
+                continue
+        if can_train or has_model:
+            # 모델 예측/학습이 필요한 센서만 개별 처리
+            try:
+                group = grouped.get_group((s_type, gateway_id, sensor_id))
+                results.append(predict(s_type, gateway_id, sensor_id, group))
+            except Exception as e:
+                logger.error("❌ 분석 실패: %s/%s/%s - %s", s_type, gateway_id, sensor_id, e)
+                _record_failure(failed, gateway_id, sensor_id)
+            continue
+
+        results.append(_build_result(
+            s_type, gateway_id, sensor_id, "Heuristic-based", float(score),
+            analyzed_at, "analyzed", None, actual_days))
+
+    if compiled:
+        # predict와 같은 입력(윈도우 평균)
+        x_input = grouped[required_columns].mean().loc[[entry[:3] for entry in compiled]].to_numpy()
+        results.extend(_predict_compiled(compiled, x_input, analyzed_at, grouped.get_group, failed))
+    return results
+
+@metrics.timed("predict_windows_seconds")
+def predict_windows(batch, min_days: int = MIN_ANALYSIS_DAYS, failed: list = None) -> list:
+    """
+    롤링 윈도우(services.rolling_window.WindowBatch)로 predict_batch와 같은 형식의 결과를 만듭니다.
+    (min_days, failed는 predict_batch와 같음)
+    센서별 윈도우 평균만 사용하므로 DataFrame을 만들지 않습니다.
+    (모델이 FlatForest로 변환되지 않은 센서만 해당 센서의 DataFrame을 만들어 predict를 호출)
+    """
+    eligible = batch.counts >= min_days
+    if not eligible.all():
+        logger.warning("⚠️ 분석 생략 - 데이터 부족 센서 %s개 (최소 %s개 필요)", int((~eligible).sum()), min_days)
+    if not eligible.any():
+        return []
+
+    batch = batch.take(eligible)
+    s_type = batch.sensor_type
+    means = batch.means()
+    scores = heuristic_scores_from_means(means)
+    saved_models = SavedModels(s_type)
+    analyzed_at = int(datetime.now(KST).timestamp())
+    compiled, compiled_rows = [], {}
+    results = []
+
+    for i, (gateway_id, sensor_id, actual_days, score) in enumerate(
+            zip(batch.gateway_ids, batch.sensor_ids, batch.counts, scores)):
+        actual_days = int(actual_days)
+        if actual_days < REQUIRED_DAYS:
+            results.append(_build_result(
+                s_type, gateway_id, sensor_id, "Heuristic-based (insufficient data)", float(score),
+                analyzed_at, "insufficient_data_heuristic_used", "not_enough_days", actual_days))
+            continue
+
+        if (gateway_id, sensor_id) in saved_models:
+            model = load_model(s_type, gateway_id, sensor_id)
+            if isinstance(model, FlatForest):
+                compiled.append((s_type, gateway_id, sensor_id, actual_days, model))
+                compiled_rows[(s_type, gateway_id, sensor_id)] = i
+                continue
+            try:
+                results.append(predict(s_type, gateway_id, sensor_id, batch.frame(i)))
+            except Exception as e:
+                logger.error("❌ 분석 실패: %s/%s/%s - %s", s_type, gateway_id, sensor_id, e)
+                _record_failure(failed, gateway_id, sensor_id)
+            continue
+
+        results.append(_build_result(
+            s_type, gateway_id, sensor_id, "Heuristic-based", float(score),
+            analyzed_at, "analyzed", None, actual_days))
+
+    if compiled:
+        x_input = means[list(compiled_rows.values())]
+        results.extend(_predict_compiled(compiled, x_input, analyzed_at,
+                                         lambda key: batch.frame(compiled_rows[key]), failed))
+    return results
+
+def _record_failure(failed: list, gateway_id, sensor_id):
+    if failed is not None:
+        failed.append((str(gateway_id), str(sensor_id)))
+
+def _predict_compiled(compiled: list, x_input, analyzed_at: int, get_data, failed: list = None) -> list:
+    # 여러 센서의 모델을 한 번에 평가, 실패하면 get_data(key)로 센서별 DataFrame을 받아 predict
+    try:
+        scores = predict_each([entry[4] for entry in compiled], x_input)
+    except Exception as e:
+        logger.error("❌ 일괄 모델 예측 실패, 센서별 예측으로 대체: %s", e)
+        results = []
+        for (s_type, gateway_id, sensor_id, _, _) in compiled:
+            try:
+                group = get_data((s_type, gateway_id, sensor_id))
+                results.append(predict(s_type, gateway_id, sensor_id, group))
+            except Exception as e:
+                logger.error("❌ 분석 실패: %s/%s/%s - %s", s_type, gateway_id, sensor_id, e)
+                _record_failure(failed, gateway_id, sensor_id)
+        return results
+
+    logger.info("모델 일괄 예측 성공: %s개 센서", len(compiled))
+    return [
+        _build_result(s_type, gateway_id, sensor_id, "RandomForest", float(score),
+                      analyzed_at, "analyzed", None, actual_days)
+        for (s_type, gateway_id, sensor_id, actual_days, _), score in zip(compiled, scores)
+    ]
 
 if __name__ == "__main__":
     import sys
@@ -165,7 +277,8 @@ if __name__ == "__main__":
     csv_path, sensor_type, gateway_id, sensor_id, output_path = sys.argv[1:]
 
     try:
-        df = pd.read_csv(csv_path, parse_dates=['date'])
+        from services.history_loader import read_history_csv
+        df = read_history_csv(csv_path)
         df_filtered = df[(df['gateway_id'] == gateway_id) & (df['sensor_id'] == sensor_id)]
         df_filtered = df_filtered.sort_values(by='date').tail(REQUIRED_DAYS)
 
@@ -174,5 +287,5 @@ if __name__ == "__main__":
         send_analysis_result(result)
         logger.info("예측 결과 전송 완료")
     except Exception as e:
-        logger.error(f"예측 실패: {e}")
+        logger.error("예측 실패: %s", e)
         sys.exit(1)
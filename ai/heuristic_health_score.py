@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 # 스케일링 계수: 평균 차이(mean_diff)를 이 값으로 곱해 0~SCALE 범위로 변환
@@ -19,3 +20,29 @@ def heuristic_health_score(data: pd.DataFrame) -> float:
     health_score = 1 - (scaled_diff_score / 100)
     
     return round(health_score, 4)
+
+def heuristic_health_scores(data: pd.DataFrame, by: list) -> pd.Series:
+    """
+    heuristic_health_score와 같은 식으로 그룹(by)별 점수를 한 번에 계산합니다.
+    센서마다 작은 DataFrame을 만들지 않고 groupby 한 번으로 처리합니다.
+    """
+    required_columns = ['min_diff', 'max_diff', 'avg_diff']
+    if not set(required_columns).issubset(data.columns):
+        raise ValueError(f"DataFrame must contain columns: {set(required_columns)}")
+
+    # 그룹별 컬럼 평균 → 세 컬럼 평균
+    mean_diff_values = data.groupby(by, observed=True, sort=False)[required_columns].mean().mean(axis=1)
+
+    scaled_diff_scores = (mean_diff_values * SCALE).clip(lower=0, upper=SCALE)
+    health_scores = 1 - (scaled_diff_scores / 100)
+
+    return health_scores.round(4)
+
+def heuristic_scores_from_means(means: np.ndarray) -> np.ndarray:
+    """
+    센서별 (min_diff, max_diff, avg_diff) 평균 배열 (n, 3)로 heuristic 점수를 계산합니다.
+    롤링 윈도우처럼 평균을 이미 알고 있을 때 DataFrame 없이 사용합니다.
+    """
+    mean_diff_values = means.mean(axis=1)
+    scaled_diff_scores = np.clip(mean_diff_values * SCALE, 0, SCALE)
+    return np.round(1 - (scaled_diff_scores / 100), 4)
@@ -0,0 +1,92 @@
+import logging
+import threading
+from collections import OrderedDict
+from ai.flat_forest import compile_model
+from ai.model_registry import model_version
+from config.metrics import metrics
+from config.settings import MODEL_CACHE_MAX_ENTRIES, MODEL_CACHE_MAX_BYTES, MODEL_COMPILE
+
+logger = logging.getLogger(__name__)
+
+
+class ModelCache:
+    """
+    (sensor_type, gateway_id, sensor_id) 단위 LRU 모델 캐시.
+    - 항목 수(max_entries)와 파일 크기 합(max_bytes) 중 하나라도 넘으면 오래된 항목부터 제거
+    - 레지스트리 항목(또는 개별 파일의 mtime/크기)이 바뀌면 다시 로드
+    - compile_models=True면 RandomForest는 FlatForest로 변환해 보관 (predict 인터페이스 동일)
+    """
+
+    def __init__(self, max_entries: int = MODEL_CACHE_MAX_ENTRIES, max_bytes: int = MODEL_CACHE_MAX_BYTES,
+                 compile_models: bool = MODEL_COMPILE):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.compile_models = compile_models
+        self._entries = OrderedDict()  # key -> (model, version token, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, sensor_type: str, gateway_id: str, sensor_id: str):
+        key = (sensor_type, gateway_id, sensor_id)
+        version = model_version(sensor_type, gateway_id, sensor_id)
+        if version is None:
+            self.invalidate(key)
+            metrics.inc("model_cache_requests_total", result="not_found")
+            return None
+
+        token, size, loader = version
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == token:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.inc("model_cache_requests_total", result="hit")
+                return entry[0]
+            self.misses += 1
+        metrics.inc("model_cache_requests_total", result="miss")
+
+        model = loader()
+        if self.compile_models:
+            model = compile_model(model)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (model, token, size)
+            self._bytes += size
+            self._evict()
+        return model
+
+    def invalidate(self, key: tuple = None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                self._remove(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def _evict(self):
+        # 방금 넣은 항목 하나는 한도를 넘더라도 유지
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry[2]
+            self.evictions += 1
+
+
+model_cache = ModelCache()
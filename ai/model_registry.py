@@ -0,0 +1,460 @@
+import os
+import json
+import mmap
+import time
+import pickle
+import sqlite3
+import logging
+import threading
+import joblib
+from config.settings import MODEL_FORMAT, MODEL_MMAP_MODE
+
+MODEL_DIR = "model_registry"
+MODEL_EXTENSIONS = (".joblib", ".pkl")  # 개별 파일 로드 우선순위 순서
+PACK_ALIGNMENT = 64  # 배열 버퍼 정렬 단위 (일반 numpy 배열은 mmap 위에서 그대로 사용)
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------- 개별 파일 (기존 방식)
+
+def model_path(sensor_type: str, gateway_id: str, sensor_id: str, fmt: str = "joblib") -> str:
+    return f"{MODEL_DIR}/{sensor_type}/{gateway_id}_{sensor_id}.{fmt}"
+
+
+def find_model_path(sensor_type: str, gateway_id: str, sensor_id: str):
+    """저장된 개별 모델 파일 경로를 반환합니다. (.joblib 우선, 없으면 .pkl)"""
+    for ext in MODEL_EXTENSIONS:
+        path = f"{MODEL_DIR}/{sensor_type}/{gateway_id}_{sensor_id}{ext}"
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def load_model_file(path: str):
+    """
+    개별 모델 파일을 로드합니다.
+    .joblib 파일은 numpy 배열을 mmap으로 엽니다. 단, sklearn 트리(Tree.__setstate__)는 노드 배열을
+    복사해 복원하므로 RandomForest 모델은 프로세스마다 자체 메모리를 사용합니다.
+    """
+    if path.endswith(".joblib"):
+        return joblib.load(path, mmap_mode=MODEL_MMAP_MODE)
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def dump_model_file(model, path: str):
+    """모델을 임시 파일에 쓴 뒤 교체하여, 읽는 쪽이 쓰다 만 파일을 보지 않도록 합니다."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    if path.endswith(".joblib"):
+        # 압축하면 mmap 로드가 불가능하므로 비압축으로 저장
+        joblib.dump(model, tmp_path, compress=0)
+    else:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(model, f)
+    os.replace(tmp_path, path)
+
+
+def meta_path(sensor_type: str, gateway_id: str, sensor_id: str) -> str:
+    """개별 모델 파일의 메타데이터(학습 해시 등) 사이드카 경로. 팩 항목의 meta와 같은 내용을 담습니다."""
+    return f"{MODEL_DIR}/{sensor_type}/{gateway_id}_{sensor_id}.meta.json"
+
+
+def read_meta_file(sensor_type: str, gateway_id: str, sensor_id: str) -> dict:
+    try:
+        with open(meta_path(sensor_type, gateway_id, sensor_id), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write_meta_file(sensor_type: str, gateway_id: str, sensor_id: str, meta: dict):
+    path = meta_path(sensor_type, gateway_id, sensor_id)
+    if not meta:
+        if os.path.isfile(path):
+            os.remove(path)
+        return
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# ---------------------------------------------------------------------- 타입별 단일 파일
+
+def _align(offset: int) -> int:
+    return (offset + PACK_ALIGNMENT - 1) // PACK_ALIGNMENT * PACK_ALIGNMENT
+
+
+class PackedModelRegistry:
+    """
+    센서 타입 하나의 모델을 한 파일에 모아 저장하는 레지스트리.
+
+        <root>/<sensor_type>.<gen>.pack        모델 바이트를 이어 붙인 데이터 파일 (append-only)
+        <root>/<sensor_type>.index.sqlite3     (gateway_id, sensor_id) -> 파일/오프셋 인덱스
+
+    - 모델은 pickle protocol 5로 저장하고 numpy 배열은 정렬된 별도 버퍼로 기록해
+      로드 시 mmap 버퍼를 그대로 넘깁니다. 일반 numpy 배열은 mmap 위에 그대로 남지만,
+      sklearn 트리는 복원 중 노드 배열을 복사하므로 RandomForest 모델은 페이지 캐시를 공유하지 않습니다.
+    - 항목 교체는 새 바이트를 덧붙인 뒤 인덱스 행을 트랜잭션으로 바꾸므로 읽는 쪽은 항상 완전한 항목만 봅니다.
+    - compact()는 살아있는 항목만 새 세대 파일로 옮기고 인덱스를 한 번에 전환합니다.
+    """
+
+    def __init__(self, sensor_type: str, root: str = MODEL_DIR):
+        self.sensor_type = sensor_type
+        self.root = root
+        self.index_path = os.path.join(root, f"{sensor_type}.index.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+        self._maps = {}  # pack 파일명 -> mmap
+
+    # ------------------------------------------------------------------ 인덱스
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None or self._conn_pid != os.getpid():
+            os.makedirs(self.root, exist_ok=True)
+            conn = sqlite3.connect(self.index_path, timeout=60, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " gateway_id TEXT NOT NULL, sensor_id TEXT NOT NULL,"
+                " pack TEXT NOT NULL, pickle_offset INTEGER NOT NULL, pickle_length INTEGER NOT NULL,"
+                " buffers TEXT NOT NULL, size INTEGER NOT NULL, saved_at REAL NOT NULL, meta TEXT,"
+                " PRIMARY KEY (gateway_id, sensor_id)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS state (name TEXT PRIMARY KEY, value TEXT)")
+            self._conn = conn
+            self._conn_pid = os.getpid()
+            self._maps = {}
+        return self._conn
+
+    def entry(self, gateway_id: str, sensor_id: str):
+        """인덱스 항목(dict)을 반환합니다. 없으면 None."""
+        if not os.path.isfile(self.index_path):
+            return None
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT pack, pickle_offset, pickle_length, buffers, size, saved_at, meta"
+                " FROM entries WHERE gateway_id = ? AND sensor_id = ?",
+                (gateway_id, sensor_id)
+            ).fetchone()
+        if row is None:
+            return None
+        pack, pickle_offset, pickle_length, buffers, size, saved_at, meta = row
+        return {
+            "pack": pack,
+            "pickleOffset": pickle_offset,
+            "pickleLength": pickle_length,
+            "buffers": json.loads(buffers),
+            "size": size,
+            "savedAt": saved_at,
+            "meta": json.loads(meta) if meta else {},
+        }
+
+    def keys(self) -> set:
+        if not os.path.isfile(self.index_path):
+            return set()
+        with self._lock:
+            return set(self._connect().execute("SELECT gateway_id, sensor_id FROM entries").fetchall())
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._connect()
+            count, live = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            pack = self._current_pack(conn)
+        pack_path = os.path.join(self.root, pack) if pack else None
+        total = os.path.getsize(pack_path) if pack_path and os.path.isfile(pack_path) else 0
+        return {"entries": count, "liveBytes": live, "packBytes": total, "deadBytes": max(0, total - live)}
+
+    @staticmethod
+    def _current_pack(conn: sqlite3.Connection):
+        row = conn.execute("SELECT value FROM state WHERE name = 'pack'").fetchone()
+        return row[0] if row else None
+
+    # ------------------------------------------------------------------ 읽기
+
+    def _map(self, pack: str, needed: int) -> mmap.mmap:
+        mm = self._maps.get(pack)
+        if mm is None or len(mm) < needed:
+            # 파일 끝에 새 항목이 붙었으면 다시 매핑 (이전 매핑은 참조가 사라질 때 해제)
+            with open(os.path.join(self.root, pack), "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[pack] = mm
+        return mm
+
+    def _read(self, entry: dict):
+        end = max([entry["pickleOffset"] + entry["pickleLength"]] + [o + n for o, n in entry["buffers"]])
+        with self._lock:
+            view = memoryview(self._map(entry["pack"], end))
+        buffers = [view[o:o + n] for o, n in entry["buffers"]]
+        return pickle.loads(view[entry["pickleOffset"]:entry["pickleOffset"] + entry["pickleLength"]],
+                            buffers=buffers)
+
+    def load(self, gateway_id: str, sensor_id: str):
+        """모델을 로드합니다. 없으면 None."""
+        for attempt in range(2):
+            entry = self.entry(gateway_id, sensor_id)
+            if entry is None:
+                return None
+            try:
+                return self._read(entry)
+            except FileNotFoundError:
+                # 조회와 읽기 사이에 compact로 파일이 바뀐 경우 인덱스를 다시 조회
+                if attempt:
+                    raise
+
+    # ------------------------------------------------------------------ 쓰기
+
+    def save(self, gateway_id: str, sensor_id: str, model, meta: dict = None) -> dict:
+        """모델을 파일 끝에 덧붙이고 인덱스 항목을 교체합니다."""
+        buffers = []
+        data = pickle.dumps(model, protocol=5, buffer_callback=buffers.append)
+        raw_buffers = [b.raw() for b in buffers]
+
+        with self._lock:
+            conn = self._connect()
+            # 쓰기 잠금: 여러 프로세스가 동시에 저장해도 파일 끝 위치가 겹치지 않음
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                pack = self._current_pack(conn)
+                if pack is None:
+                    pack = f"{self.sensor_type}.1.pack"
+                    conn.execute("INSERT OR REPLACE INTO state (name, value) VALUES ('pack', ?)", (pack,))
+                with open(os.path.join(self.root, pack), "ab") as f:
+                    offset = f.seek(0, os.SEEK_END)
+                    pickle_offset, buffer_spans, offset = self._write_blob(f, offset, data, raw_buffers)
+                    f.flush()
+                    os.fsync(f.fileno())
+                size = offset - pickle_offset
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries"
+                    " (gateway_id, sensor_id, pack, pickle_offset, pickle_length, buffers, size, saved_at, meta)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (gateway_id, sensor_id, pack, pickle_offset, len(data), json.dumps(buffer_spans),
+                     size, time.time(), json.dumps(meta) if meta else None)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return {"pack": pack, "size": size}
+
+    @staticmethod
+    def _write_blob(f, offset: int, data: bytes, raw_buffers: list):
+        pickle_offset = _align(offset)
+        f.write(b"\0" * (pickle_offset - offset))
+        f.write(data)
+        offset = pickle_offset + len(data)
+
+        spans = []
+        for buf in raw_buffers:
+            start = _align(offset)
+            f.write(b"\0" * (start - offset))
+            f.write(buf)
+            spans.append([start, len(buf)])
+            offset = start + len(buf)
+        return pickle_offset, spans, offset
+
+    def delete(self, gateway_id: str, sensor_id: str):
+        with self._lock:
+            self._connect().execute(
+                "DELETE FROM entries WHERE gateway_id = ? AND sensor_id = ?", (gateway_id, sensor_id)
+            )
+
+    def compact(self) -> dict:
+        """살아있는 항목만 새 세대 파일로 옮기고 이전 파일을 삭제합니다."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                old_pack = self._current_pack(conn)
+                if old_pack is None:
+                    conn.execute("ROLLBACK")
+                    return {"before": 0, "after": 0}
+                generation = int(old_pack.rsplit(".", 2)[-2]) + 1
+                new_pack = f"{self.sensor_type}.{generation}.pack"
+                rows = conn.execute(
+                    "SELECT gateway_id, sensor_id, pack, pickle_offset, pickle_length, buffers FROM entries"
+                ).fetchall()
+
+                sources = {}
+                updates = []
+                offset = 0
+                with open(os.path.join(self.root, new_pack), "wb") as f:
+                    for gateway_id, sensor_id, pack, pickle_offset, pickle_length, buffers in rows:
+                        if pack not in sources:
+                            with open(os.path.join(self.root, pack), "rb") as src:
+                                sources[pack] = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ)
+                        src = sources[pack]
+                        data = src[pickle_offset:pickle_offset + pickle_length]
+                        raw_buffers = [src[o:o + n] for o, n in json.loads(buffers)]
+                        new_offset, spans, offset = self._write_blob(f, offset, data, raw_buffers)
+                        updates.append((new_pack, new_offset, json.dumps(spans), offset - new_offset,
+                                        gateway_id, sensor_id))
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                conn.executemany(
+                    "UPDATE entries SET pack = ?, pickle_offset = ?, buffers = ?, size = ?"
+                    " WHERE gateway_id = ? AND sensor_id = ?",
+                    updates
+                )
+                conn.execute("UPDATE state SET value = ? WHERE name = 'pack'", (new_pack,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            for mm in sources.values():
+                mm.close()
+            self._maps = {}
+
+        old_paths = [os.path.join(self.root, p) for p in set(sources) | {old_pack}]
+        old_paths = [p for p in old_paths if os.path.exists(p)]
+        before = sum(os.path.getsize(p) for p in old_paths)
+        for path in old_paths:
+            # 다른 프로세스에서 이미 열린 mmap은 파일 삭제 후에도 유효함
+            os.remove(path)
+        after = os.path.getsize(os.path.join(self.root, new_pack))
+        logger.info("모델 레지스트리 압축 완료: %s %s → %s bytes (%s개)", self.sensor_type, before, after, len(updates))
+        return {"before": before, "after": after, "entries": len(updates)}
+
+    def import_files(self) -> int:
+        """model_registry/<type>/ 아래 개별 모델 파일을 가져옵니다."""
+        legacy_dir = os.path.join(self.root, self.sensor_type)
+        if not os.path.isdir(legacy_dir):
+            return 0
+        imported = 0
+        existing = self.keys()
+        for name in sorted(os.listdir(legacy_dir)):
+            stem, ext = os.path.splitext(name)
+            if ext not in MODEL_EXTENSIONS or "_" not in stem:
+                continue
+            gateway_id, sensor_id = stem.split("_", 1)
+            if (gateway_id, sensor_id) in existing:
+                continue
+            self.save(gateway_id, sensor_id, load_model_file(os.path.join(legacy_dir, name)),
+                      read_meta_file(self.sensor_type, gateway_id, sensor_id))
+            imported += 1
+        logger.info("개별 모델 파일 가져오기 완료: %s %s개", self.sensor_type, imported)
+        return imported
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(sensor_type: str) -> PackedModelRegistry:
+    with _registries_lock:
+        registry = _registries.get(sensor_type)
+        if registry is None:
+            registry = _registries[sensor_type] = PackedModelRegistry(sensor_type)
+        return registry
+
+
+# ---------------------------------------------------------------------- 공통 진입점
+
+def _resolve(sensor_type: str, gateway_id: str, sensor_id: str):
+    """
+    저장된 모델의 위치를 ("pack", 인덱스 항목) 또는 ("file", 경로)로 반환합니다. 없으면 None.
+    두 곳에 모두 있으면 설정된 형식(MODEL_FORMAT) 쪽을 먼저 봅니다.
+    (형식을 바꾼 뒤 남아 있는 이전 형식의 모델이 새로 학습한 모델을 가리지 않도록)
+    """
+    def from_pack():
+        entry = get_registry(sensor_type).entry(gateway_id, sensor_id)
+        return ("pack", entry) if entry is not None else None
+
+    def from_file():
+        path = find_model_path(sensor_type, gateway_id, sensor_id)
+        return ("file", path) if path is not None else None
+
+    order = (from_pack, from_file) if MODEL_FORMAT == "pack" else (from_file, from_pack)
+    for lookup in order:
+        found = lookup()
+        if found is not None:
+            return found
+    return None
+
+
+def model_version(sensor_type: str, gateway_id: str, sensor_id: str):
+    """
+    저장된 모델의 (버전 토큰, 크기, 로더)를 반환합니다. 없으면 None.
+    버전 토큰은 항목이 교체되면 바뀌므로 캐시 무효화에 사용합니다.
+    """
+    found = _resolve(sensor_type, gateway_id, sensor_id)
+    if found is None:
+        return None
+    kind, target = found
+    if kind == "pack":
+        token = (target["pack"], target["pickleOffset"])
+        return token, target["size"], lambda: get_registry(sensor_type).load(gateway_id, sensor_id)
+
+    stat = os.stat(target)
+    return (target, stat.st_mtime_ns, stat.st_size), stat.st_size, lambda: load_model_file(target)
+
+
+def load_model(sensor_type: str, gateway_id: str, sensor_id: str):
+    version = model_version(sensor_type, gateway_id, sensor_id)
+    return version[2]() if version else None
+
+
+def save_model(model, sensor_type: str, gateway_id: str, sensor_id: str, meta: dict = None,
+               fmt: str = MODEL_FORMAT) -> int:
+    """
+    설정된 형식(MODEL_FORMAT)으로 모델을 저장하고 저장된 크기(bytes)를 반환합니다.
+    개별 파일로 저장할 때는 meta를 사이드카(.meta.json)에 쓰고, 남아 있는 팩 항목은 지웁니다.
+    """
+    if fmt == "pack":
+        return get_registry(sensor_type).save(gateway_id, sensor_id, model, meta)["size"]
+    path = model_path(sensor_type, gateway_id, sensor_id, fmt)
+    dump_model_file(model, path)
+    write_meta_file(sensor_type, gateway_id, sensor_id, meta)
+    registry = get_registry(sensor_type)
+    if os.path.isfile(registry.index_path):
+        registry.delete(gateway_id, sensor_id)
+    return os.path.getsize(path)
+
+
+def model_meta(sensor_type: str, gateway_id: str, sensor_id: str) -> dict:
+    """현재 사용되는 모델(model_version과 같은 기준)의 메타데이터를 반환합니다. 없으면 {}."""
+    found = _resolve(sensor_type, gateway_id, sensor_id)
+    if found is None:
+        return {}
+    kind, target = found
+    if kind == "pack":
+        return target["meta"]
+    return read_meta_file(sensor_type, gateway_id, sensor_id)
+
+
+class SavedModels:
+    """센서 타입의 저장된 모델 목록. 센서마다 조회하지 않도록 한 번에 읽어 둡니다."""
+
+    def __init__(self, sensor_type: str):
+        self.packed = get_registry(sensor_type).keys()
+        legacy_dir = os.path.join(MODEL_DIR, sensor_type)
+        self.files = set(os.listdir(legacy_dir)) if os.path.isdir(legacy_dir) else set()
+
+    def __contains__(self, key: tuple) -> bool:
+        gateway_id, sensor_id = key
+        if (gateway_id, sensor_id) in self.packed:
+            return True
+        return any(f"{gateway_id}_{sensor_id}{ext}" in self.files for ext in MODEL_EXTENSIONS)
+
+
+if __name__ == "__main__":
+    import sys
+    import config.logging_setup  # noqa: F401
+
+    if len(sys.argv) != 3 or sys.argv[1] not in ("import", "compact", "stats"):
+        logger.error("사용법: python -m ai.model_registry <import|compact|stats> <sensor_type>")
+        sys.exit(1)
+
+    command, sensor_type = sys.argv[1], sys.argv[2]
+    registry = get_registry(sensor_type)
+    if command == "import":
+        registry.import_files()
+    elif command == "compact":
+        registry.compact()
+    print(json.dumps(registry.stats(), ensure_ascii=False))
@@ -1,8 +1,7 @@
-import pandas as pd
-import pickle
 import os
+import pandas as pd
 import logging
-from config.settings import REQUIRED_DAYS
+from ai.model_registry import save_model as save_to_registry
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error
@@ -20,8 +19,8 @@ def validate_data(data: pd.DataFrame):
         raise ValueError(f"필수 컬럼 누락: {missing}")
     return data.dropna(subset=['min_diff', 'max_diff', 'avg_diff'])
 
-def train_model(data: pd.DataFrame):
-    """모델 학습"""
+def fit_model(data: pd.DataFrame, n_jobs: int = None):
+    """모델 학습 후 (모델, 검증 MSE)를 반환합니다. n_jobs는 트리 학습에 사용할 코어 수입니다."""
     data = validate_data(data)
 
     X = data[['min_diff', 'max_diff', 'avg_diff']]
@@ -35,45 +34,38 @@ def train_model(data: pd.DataFrame):
         n_estimators=150,
         min_samples_leaf=3,
         max_features='sqrt',
-        random_state=42
+        random_state=42,
+        n_jobs=n_jobs
     )
     model.fit(X_train, y_train)
+    # 예측은 단일 행 위주이므로 학습 후에는 병렬 처리를 끔
+    model.set_params(n_jobs=None)
 
     y_pred = model.predict(X_val)
     mse = mean_squared_error(y_val, y_pred)
-    logger.info(f"[모델검증] MSE = {mse:.5f}")
+    logger.info("[모델검증] MSE = %.5f", mse)
+
+    return model, mse
 
-    return model
+def train_model(data: pd.DataFrame):
+    """모델 학습"""
+    return fit_model(data)[0]
 
-def save_model(model, save_path: str):
-    """모델 저장"""
-    os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    with open(save_path, 'wb') as f:
-        pickle.dump(model, f)
-    logger.info(f"[모델저장] 완료: {save_path}")
+def save_model(model, sensor_type: str, gateway_id: str, sensor_id: str, meta: dict = None) -> int:
+    """모델 저장 (모델 레지스트리 경유), 저장된 크기(bytes)를 반환"""
+    size = save_to_registry(model, sensor_type, gateway_id, sensor_id, meta)
+    logger.info("[모델저장] 완료: %s/%s_%s (%d bytes)", sensor_type, gateway_id, sensor_id, size)
+    return size
 
 def train_all_models(csv_path: str, sensor_type: str):
-    """센서별 전체 모델 학습"""
-    try:
-        df = pd.read_csv(csv_path, parse_dates=['date'])
-    except Exception as e:
-        logger.error(f"[파일로드 실패] {csv_path}: {e}")
-        return
+    """센서별 전체 모델 학습 (CSV를 센서 단위 묶음으로 나눠 읽으며 training_engine으로 병렬 학습)"""
+    from ai.training_engine import train_csv
 
-    grouped = df.groupby(['gateway_id', 'sensor_id'])
-
-    for (gateway_id, sensor_id), group in grouped:
-        if len(group) < REQUIRED_DAYS:
-            logger.warning(f"[데이터부족] {gateway_id}-{sensor_id}: {len(group)}일")
-            continue
+    if not os.path.isfile(csv_path):
+        logger.error("[파일로드 실패] %s: 파일이 없습니다.", csv_path)
+        return
 
-        logger.info(f"[학습시작] {gateway_id}-{sensor_id} - {len(group)}건")
-        try:
-            model = train_model(group)
-            save_path = f"model_registry/{sensor_type}/{gateway_id}_{sensor_id}.pkl"
-            save_model(model, save_path)
-        except Exception as e:
-            logger.error(f"[학습실패] {gateway_id}-{sensor_id}: {e}")
+    return train_csv(csv_path, sensor_type)
 
 if __name__ == "__main__":
     import sys
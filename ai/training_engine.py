@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import logging
+from datetime import datetime
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from config.settings import REQUIRED_DAYS, TRAIN_WORKERS, TRAIN_REPORT_DIR
+from ai.model_registry import model_meta
+from ai.model_trainer import fit_model, save_model, REQUIRED_COLUMNS
+from services.history_loader import iter_csv_batches
+from services.history_store import get_history_store
+from services.watermark_manifest import get_manifest
+
+TRAIN_COLUMNS = ["date", "min_diff", "max_diff", "avg_diff", "health_score"]
+
+logger = logging.getLogger(__name__)
+
+
+def training_hash(group: pd.DataFrame) -> str:
+    """학습 윈도우 해시. 행 순서와 무관하게 같은 입력이면 같은 값이 나옵니다."""
+    hashes = pd.util.hash_pandas_object(group[TRAIN_COLUMNS], index=False)
+    return format(int(hashes.sum()), "016x")
+
+
+def plan_parallelism(n_tasks: int, cores: int) -> tuple:
+    """
+    (프로세스 수, 모델당 n_jobs)를 결정합니다.
+    모델이 코어보다 많으면 모델 간 병렬, 적으면 남는 코어를 모델 내부(트리) 병렬에 배분합니다.
+    """
+    if n_tasks <= 0:
+        return 0, 1
+    if n_tasks >= cores:
+        return cores, 1
+    return n_tasks, max(1, cores // n_tasks)
+
+
+def _fit_one(sensor_type: str, gateway_id: str, sensor_id: str, group: pd.DataFrame, n_jobs: int,
+             window_hash: str) -> dict:
+    """센서 하나의 모델을 학습/저장하고 리포트 항목을 반환합니다. (워커 프로세스에서 실행)"""
+    started = time.perf_counter()
+    model, mse = fit_model(group, n_jobs=n_jobs)
+    fit_sec = time.perf_counter() - started
+
+    size = save_model(model, sensor_type, gateway_id, sensor_id, meta={"trainHash": window_hash})
+    return {
+        "gatewayId": gateway_id,
+        "sensorId": sensor_id,
+        "rows": len(group),
+        "fitSec": round(fit_sec, 3),
+        "mse": float(mse),
+        "modelBytes": size,
+    }
+
+
+def train_models(df: pd.DataFrame, sensor_type: str, workers: int = TRAIN_WORKERS, force: bool = False,
+                 report_dir: str = TRAIN_REPORT_DIR) -> dict:
+    """
+    센서 타입 하나의 이력(df)으로 센서별 모델을 병렬 학습합니다.
+
+    - 학습 윈도우 해시가 레지스트리에 저장된 모델의 해시와 같으면 건너뜁니다. (force=True면 모두 학습)
+    - 결과(학습 시간, MSE, 모델 크기)를 report_dir에 JSON 리포트로 남깁니다. (None이면 남기지 않음)
+    """
+    cores = workers if workers > 0 else (os.cpu_count() or 1)
+    report = {"sensorType": sensor_type, "startedAt": datetime.now().isoformat(),
+              "trained": [], "skipped": [], "failed": []}
+
+    missing = REQUIRED_COLUMNS - set(df.columns)
+    if missing:
+        logger.error("[학습생략] %s: 필수 컬럼 누락 %s", sensor_type, missing)
+        report["failed"].append({"error": f"missing_columns: {sorted(missing)}"})
+        _write_report(report, report_dir)
+        return report
+
+    tasks = []
+    for (gateway_id, sensor_id), group in df.groupby(["gateway_id", "sensor_id"], observed=True):
+        gateway_id, sensor_id = str(gateway_id), str(sensor_id)
+        if len(group) < REQUIRED_DAYS:
+            logger.warning("[데이터부족] %s-%s: %d일", gateway_id, sensor_id, len(group))
+            report["skipped"].append({"gatewayId": gateway_id, "sensorId": sensor_id, "reason": "not_enough_days"})
+            continue
+
+        window_hash = training_hash(group)
+        # model_meta는 현재 로드될 모델(팩 항목 또는 개별 파일의 사이드카)의 메타데이터
+        if not force and model_meta(sensor_type, gateway_id, sensor_id).get("trainHash") == window_hash:
+            report["skipped"].append({"gatewayId": gateway_id, "sensorId": sensor_id, "reason": "unchanged"})
+            continue
+        tasks.append((gateway_id, sensor_id, group, window_hash))
+
+    n_procs, n_jobs = plan_parallelism(len(tasks), cores)
+    logger.info("[학습시작] %s: %s개 모델, 프로세스 %s개 × n_jobs %s", sensor_type, len(tasks), n_procs, n_jobs)
+
+    def record(entry):
+        report["trained"].append(entry)
+
+    def record_failure(task, e):
+        gateway_id, sensor_id = task[:2]
+        logger.error("[학습실패] %s-%s: %s", gateway_id, sensor_id, e)
+        report["failed"].append({"gatewayId": gateway_id, "sensorId": sensor_id, "error": str(e)})
+
+    if n_procs <= 1:
+        for task in tasks:
+            try:
+                record(_fit_one(sensor_type, *task[:3], n_jobs, task[3]))
+            except Exception as e:
+                record_failure(task, e)
+    elif tasks:
+        with ProcessPoolExecutor(max_workers=n_procs, mp_context=get_context("spawn")) as pool:
+            futures = {pool.submit(_fit_one, sensor_type, *task[:3], n_jobs, task[3]): task for task in tasks}
+            for future in as_completed(futures):
+                try:
+                    record(future.result())
+                except Exception as e:
+                    record_failure(futures[future], e)
+
+    if report["trained"]:
+        _mark_rescore(sensor_type, report["trained"])
+
+    report["finishedAt"] = datetime.now().isoformat()
+    _write_report(report, report_dir)
+    logger.info("[학습종료] %s: 학습 %s, 생략 %s, 실패 %s", sensor_type,
+                len(report['trained']), len(report['skipped']), len(report['failed']))
+    return report
+
+
+def _mark_rescore(sensor_type: str, trained: list):
+    # 모델이 바뀐 센서는 입력이 같아도 다음 파이프라인에서 다시 분석
+    manifest = get_manifest()
+    for entry in trained:
+        manifest.mark_dirty(sensor_type, entry["gatewayId"], entry["sensorId"])
+
+
+def _write_report(report: dict, report_dir: str):
+    if report_dir is None:
+        return
+    os.makedirs(report_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(report_dir, f"train-{report['sensorType']}-{stamp}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info("[학습리포트] %s", path)
+
+
+def train_batches(batches, sensor_type: str, workers: int = TRAIN_WORKERS, force: bool = False,
+                  report_dir: str = TRAIN_REPORT_DIR) -> dict:
+    """
+    센서 단위로 완결된 DataFrame 묶음(services.history_loader)을 차례로 학습하고 리포트를 하나로 합칩니다.
+    한 번에 메모리에 올리는 이력은 묶음 하나뿐입니다.
+    """
+    report = {"sensorType": sensor_type, "startedAt": datetime.now().isoformat(),
+              "trained": [], "skipped": [], "failed": []}
+    try:
+        for batch in batches:
+            part = train_models(batch, sensor_type, workers, force, report_dir=None)
+            for key in ("trained", "skipped", "failed"):
+                report[key].extend(part[key])
+    except Exception as e:
+        logger.error("[파일로드 실패] %s: %s", sensor_type, e)
+        report["failed"].append({"error": str(e)})
+
+    report["finishedAt"] = datetime.now().isoformat()
+    _write_report(report, report_dir)
+    return report
+
+
+def train_csv(csv_path: str, sensor_type: str, workers: int = TRAIN_WORKERS, force: bool = False) -> dict:
+    """이력 CSV 하나를 센서 단위 묶음으로 나눠 읽으며 학습합니다."""
+    return train_batches(iter_csv_batches(csv_path), sensor_type, workers, force)
+
+
+def train_fleet(sensor_types: list = None, workers: int = TRAIN_WORKERS, force: bool = False) -> list:
+    """이력 저장소의 센서 타입별로 전체 이력을 센서 단위 묶음으로 나눠 읽으며 학습합니다."""
+    store = get_history_store()
+    return [train_batches(store.iter_sensor_batches(sensor_type), sensor_type, workers, force)
+            for sensor_type in sensor_types or store.sensor_types()]
+
+
+if __name__ == "__main__":
+    import argparse
+    import config.logging_setup  # noqa: F401
+
+    parser = argparse.ArgumentParser(description="센서별 모델 일괄 학습")
+    parser.add_argument("sensor_types", nargs="*", help="학습할 센서 타입 (생략 시 전체)")
+    parser.add_argument("--workers", type=int, default=TRAIN_WORKERS, help="사용할 코어 수 (0이면 전체)")
+    parser.add_argument("--force", action="store_true", help="변경 없는 센서도 다시 학습")
+    args = parser.parse_args()
+
+    train_fleet(args.sensor_types or None, args.workers, args.force)
@@ -0,0 +1,67 @@
+"""
+RandomForest 단일 행 예측 지연 비교: sklearn model.predict vs FlatForest
+
+실행: python -m benchmarks.forest_inference --models 50 --repeat 200
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from ai.flat_forest import FlatForest, predict_each
+from ai.model_trainer import fit_model
+
+
+def make_history(rng: np.random.Generator, days: int) -> pd.DataFrame:
+    """센서 하나의 일별 임계치 변화량/건강 점수 이력 (임의 생성)"""
+    min_diff = rng.gamma(2.0, 0.5, days)
+    max_diff = min_diff + rng.gamma(2.0, 0.8, days)
+    avg_diff = (min_diff + max_diff) / 2 + rng.normal(0, 0.1, days)
+    health_score = np.clip(1 - (min_diff + max_diff + avg_diff) / 15 + rng.normal(0, 0.02, days), 0, 1)
+    return pd.DataFrame({
+        "date": pd.date_range("2025-01-01", periods=days),
+        "min_diff": min_diff, "max_diff": max_diff, "avg_diff": avg_diff, "health_score": health_score,
+    })
+
+
+def per_call_us(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main(n_models: int, days: int, repeat: int, seed: int):
+    rng = np.random.default_rng(seed)
+    histories = [make_history(rng, days) for _ in range(n_models)]
+    models = [fit_model(h)[0] for h in histories]
+    forests = [FlatForest.from_sklearn(m) for m in models]
+    rows = np.array([h[["min_diff", "max_diff", "avg_diff"]].tail(15).mean().values for h in histories])
+
+    # 결과 일치 확인 (비트 단위)
+    expected = np.array([m.predict(r.reshape(1, -1))[0] for m, r in zip(models, rows)])
+    single = np.array([f.predict(r.reshape(1, -1))[0] for f, r in zip(forests, rows)])
+    batched = predict_each(forests, rows)
+    assert np.array_equal(expected, single), "FlatForest.predict 결과가 sklearn과 다릅니다."
+    assert np.array_equal(expected, batched), "predict_each 결과가 sklearn과 다릅니다."
+
+    x = rows[:1]
+    sklearn_us = per_call_us(lambda: models[0].predict(x), repeat)
+    flat_us = per_call_us(lambda: forests[0].predict(x), repeat)
+    batch_us = per_call_us(lambda: predict_each(forests, rows), max(1, repeat // 10)) / n_models
+
+    print(f"모델 {n_models}개, 트리 {forests[0].n_trees}개, 최대 깊이 {max(f.max_depth for f in forests)}")
+    print(f"{'방식':<28}{'예측당 지연(µs)':>16}")
+    print(f"{'sklearn model.predict':<28}{sklearn_us:>16.1f}")
+    print(f"{'FlatForest.predict':<28}{flat_us:>16.1f}")
+    print(f"{'predict_each (센서 일괄)':<28}{batch_us:>16.1f}")
+    print(f"단일 행 속도 향상: {sklearn_us / flat_us:.1f}배, 일괄: {sklearn_us / batch_us:.1f}배")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FlatForest 예측 지연 벤치마크")
+    parser.add_argument("--models", type=int, default=50, help="비교할 센서 모델 수")
+    parser.add_argument("--days", type=int, default=60, help="센서당 학습 이력 일수")
+    parser.add_argument("--repeat", type=int, default=200, help="단일 행 예측 반복 횟수")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    main(args.models, args.days, args.repeat, args.seed)
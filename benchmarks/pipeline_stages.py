@@ -0,0 +1,234 @@
+"""
+파이프라인 단계별 벤치마크
+
+가상 플릿(benchmarks.synthetic_fleet)을 여러 크기로 만들어 단계마다 따로 시간을 잽니다.
+  flatten  : 센서 API 응답 평탄화 (flatten_sensor_data)
+  save     : 이력 저장 (save_by_sensor_and_type, 하루치씩)
+  load     : 센서 타입 탐색 + 분석 윈도우 로드 (sensor_types / read_recent)
+  heuristic: 모델 없는 상태의 일괄 분석 (predict_batch)
+  train    : 일부 센서 모델 학습/저장 (train_models)
+  predict  : 학습된 모델로 일괄 분석 (predict_batch)
+  send     : 로컬 스텁 서버로 결과 전송 (ResultSender)
+
+각 크기는 별도 프로세스와 임시 작업 디렉토리에서 실행하므로 저장소/캐시 상태가 섞이지 않습니다.
+peak 메모리는 tracemalloc 기준(파이썬 할당)이며, tracemalloc 자체가 실행 시간을 늘리므로
+시간만 정확히 보려면 --no-memory로 실행합니다.
+
+실행: python -m benchmarks.pipeline_stages --sizes 10x10 50x20 --days 15 --json reports/bench.json
+"""
+import os
+import gc
+import json
+import time
+import shutil
+import logging
+import tempfile
+import threading
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from ai.health_predictor import predict_batch
+from ai.training_engine import train_models
+from services.history_store import get_history_store
+from services.result_sender import ResultSender
+from services.rolling_window import flush_rolling_windows
+from services.sensor_service import flatten_sensor_data, save_by_sensor_and_type
+from benchmarks.synthetic_fleet import SyntheticFleet, DEFAULT_SENSOR_TYPES, with_health_labels
+
+logger = logging.getLogger(__name__)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """분석 결과 API 스텁: 본문을 읽고 200을 반환"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def measure(stage: str, fn, track_memory: bool = True) -> tuple:
+    """fn()은 (결과, 처리 건수)를 반환해야 합니다. (결과, 단계 통계)를 반환합니다."""
+    gc.collect()
+    if track_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    result, items = fn()
+    elapsed = time.perf_counter() - started
+    peak = None
+    if track_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    stats = {
+        "stage": stage,
+        "items": items,
+        "sec": round(elapsed, 4),
+        "itemsPerSec": round(items / elapsed, 1) if elapsed > 0 else None,
+        "peakMiB": round(peak / 2 ** 20, 2) if peak is not None else None,
+    }
+    logger.info("[벤치마크] %s", stats)
+    return result, stats
+
+
+def run_size(n_gateways: int, n_sensors: int, sensor_types: list, n_days: int, seed: int,
+             train_sensors: int, track_memory: bool = True, keep: bool = False) -> dict:
+    """플릿 크기 하나를 임시 작업 디렉토리에서 측정합니다. (별도 프로세스에서 실행)"""
+    workdir = tempfile.mkdtemp(prefix="sensor-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)  # 저장소/모델/상태 파일 경로가 모두 상대 경로이므로 임시 디렉토리에 생성됨
+    try:
+        return _run_stages(n_gateways, n_sensors, sensor_types, n_days, seed, train_sensors, track_memory)
+    finally:
+        os.chdir(cwd)
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _run_stages(n_gateways, n_sensors, sensor_types, n_days, seed, train_sensors, track_memory) -> dict:
+    fleet = SyntheticFleet(n_gateways, n_sensors, sensor_types, seed)
+    payloads = [payload for _, payload in fleet.payloads(n_days)]
+    stages = []
+
+    def flatten():
+        frames = [flatten_sensor_data(payload) for payload in payloads]
+        return frames, sum(len(f) for f in frames)
+
+    frames, stats = measure("flatten", flatten, track_memory)
+    stages.append(stats)
+    payloads = None  # 원본 응답 해제 (클로저가 참조하므로 del 대신 재바인딩)
+
+    def save():
+        saved = sum(len(save_by_sensor_and_type(df)) for df in frames)
+        flush_rolling_windows()
+        return None, saved
+
+    _, stats = measure("save", save, track_memory)
+    stages.append(stats)
+    frames = None
+
+    store = get_history_store()
+
+    def load():
+        windows = {t: store.read_recent(t) for t in store.sensor_types()}
+        return windows, sum(len(w) for w in windows.values())
+
+    windows, stats = measure("load", load, track_memory)
+    stages.append(stats)
+
+    def heuristic():
+        results = [r for t, w in windows.items() for r in predict_batch(w, t)]
+        return results, len(results)
+
+    results, stats = measure("heuristic", heuristic, track_memory)
+    stages.append(stats)
+
+    # 첫 번째 센서 타입에서 train_sensors개 센서만 학습 (학습은 센서 수에 비례하므로 일부만 측정)
+    train_type = fleet.sensor_types[0]
+    history = store.read_all(train_type)
+    keys = history[["gateway_id", "sensor_id"]].drop_duplicates().head(train_sensors)
+    subset = with_health_labels(history.merge(keys, on=["gateway_id", "sensor_id"]))
+
+    def train():
+        report = train_models(subset, train_type, report_dir=os.path.join("reports", "training"))
+        return report, len(report["trained"])
+
+    _, stats = measure("train", train, track_memory)
+    stages.append(stats)
+
+    scoring = windows[train_type].merge(keys, on=["gateway_id", "sensor_id"])
+
+    def predict():
+        scored = predict_batch(scoring, train_type)
+        return scored, len(scored)
+
+    _, stats = measure("predict", predict, track_memory)
+    stages.append(stats)
+
+    server, url = start_stub_server()
+
+    def send():
+        sender = ResultSender(endpoint=f"{url}/analysis-results", bulk_endpoint=f"{url}/analysis-results/bulk",
+                              max_retries=0)
+        for result in results:
+            sender.submit(result)
+        summary = sender.close()
+        return summary, summary["sent"]
+
+    try:
+        _, stats = measure("send", send, track_memory)
+        stages.append(stats)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return {
+        "gateways": n_gateways,
+        "sensorsPerGateway": n_sensors,
+        "sensorTypes": len(fleet.sensor_types),
+        "days": n_days,
+        "recordsPerDay": fleet.n_records,
+        "stages": stages,
+    }
+
+
+def parse_size(text: str) -> tuple:
+    """"<게이트웨이 수>x<게이트웨이당 센서 수>" 형식"""
+    n_gateways, n_sensors = text.lower().split("x")
+    return int(n_gateways), int(n_sensors)
+
+
+def run_benchmarks(sizes: list, sensor_types: list = None, n_days: int = 15, seed: int = 42,
+                   train_sensors: int = 20, track_memory: bool = True, keep: bool = False) -> list:
+    reports = []
+    for n_gateways, n_sensors in sizes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            reports.append(pool.submit(run_size, n_gateways, n_sensors, sensor_types or DEFAULT_SENSOR_TYPES,
+                                       n_days, seed, train_sensors, track_memory, keep).result())
+    return reports
+
+
+def print_reports(reports: list):
+    for report in reports:
+        print(f"\n== 게이트웨이 {report['gateways']} × 센서 {report['sensorsPerGateway']} × "
+              f"타입 {report['sensorTypes']} × {report['days']}일 (하루 {report['recordsPerDay']}건)")
+        table = pd.DataFrame(report["stages"]).set_index("stage")
+        print(table.to_string())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="파이프라인 단계별 벤치마크")
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=[(10, 10), (50, 20), (100, 50)],
+                        help="플릿 크기 목록 (<게이트웨이 수>x<게이트웨이당 센서 수>)")
+    parser.add_argument("--types", nargs="+", default=DEFAULT_SENSOR_TYPES, help="센서 타입 목록")
+    parser.add_argument("--days", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--train-sensors", type=int, default=20, help="학습 단계에서 학습할 센서 수")
+    parser.add_argument("--no-memory", action="store_true", help="tracemalloc 없이 시간만 측정")
+    parser.add_argument("--keep", action="store_true", help="임시 작업 디렉토리를 지우지 않음")
+    parser.add_argument("--json", help="결과를 저장할 JSON 경로")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = run_benchmarks(args.sizes, args.types, args.days, args.seed, args.train_sensors,
+                             not args.no_memory, args.keep)
+    print_reports(results)
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,120 @@
+"""
+복제본 분할 실행 시뮬레이션
+
+한 머신에서 여러 프로세스를 복제본으로 띄워 services.replica_coordinator의 동작을 확인합니다.
+  1. 모든 복제본이 같은 밤(night)에 수집을 시도 → 리스를 잡은 한 곳만 수집
+  2. 살아 있는 복제본 링으로 센서를 나눠 claim → 가상 전송 → done 표시
+  3. --kill로 지정한 복제본은 claim만 하고 전송 전에 죽음 (os._exit)
+  4. 리스 만료 후 남은 복제본이 점검(job_check) 실행처럼 한 번 더 돌며 빈 자리를 나눠 맡음
+끝나면 센서마다 정확히 한 번 전송됐는지, 수집이 한 번만 실행됐는지 검사합니다.
+
+실행: python -m benchmarks.replica_simulation --replicas 3 --sensors 2000 --kill 1
+"""
+import os
+import time
+import shutil
+import tempfile
+from collections import Counter
+from multiprocessing import get_context
+from services.replica_coordinator import ReplicaCoordinator, sensor_key
+
+SENSOR_TYPE = "temperature"
+NIGHT = "2000-01-01"
+
+
+def _sensors(n_sensors: int) -> list:
+    return [(f"gw-{i % 50}", f"sensor-{i}") for i in range(n_sensors)]
+
+
+def _result(gateway_id: str, sensor_id: str) -> dict:
+    return {"result": {"sensorInfo": {"gatewayId": gateway_id, "sensorId": sensor_id, "sensorType": SENSOR_TYPE},
+                       "analyzedAt": 0}}
+
+
+def _replica(replica_id: str, workdir: str, n_sensors: int, lease_seconds: float, die: bool, barrier):
+    coordinator = ReplicaCoordinator(replica_id, os.path.join(workdir, "replicas.sqlite3"),
+                                     lease_seconds=lease_seconds, heartbeat_seconds=lease_seconds / 4)
+    coordinator.start()
+    barrier.wait()  # 모든 복제본이 등록된 뒤 같은 링으로 시작
+
+    def ingest():
+        with open(os.path.join(workdir, "ingest.log"), "a") as f:
+            f.write(f"{replica_id}\n")
+        time.sleep(0.2)
+        return n_sensors
+
+    def run_once():
+        coordinator.ingest_once(NIGHT, ingest, wait_seconds=30, poll=0.05)
+        sensors = _sensors(n_sensors)
+        ownership = coordinator.ownership(NIGHT)
+        mask = ownership.mask(SENSOR_TYPE, [gw for gw, _ in sensors], [sid for _, sid in sensors])
+        claimed = coordinator.claim(NIGHT, [_result(gw, sid) for (gw, sid), own in zip(sensors, mask) if own])
+        if die:
+            os._exit(1)  # claim 후 전송 전에 비정상 종료
+        with open(os.path.join(workdir, f"sent-{replica_id}.log"), "a") as f:
+            for result in claimed:
+                info = result["result"]["sensorInfo"]
+                f.write(sensor_key(SENSOR_TYPE, info["gatewayId"], info["sensorId"]) + "\n")
+        coordinator.mark_done(claimed, NIGHT)
+        return len(claimed)
+
+    first = run_once()
+    # 죽은 복제본이 만료될 때까지 기다렸다가 점검 실행
+    time.sleep(lease_seconds * 1.5)
+    second = run_once()
+    coordinator.stop()
+    return replica_id, first, second
+
+
+def simulate(n_replicas: int = 3, n_sensors: int = 2000, kill: int = 1, lease_seconds: float = 2.0) -> dict:
+    workdir = tempfile.mkdtemp(prefix="replica-sim-")
+    try:
+        ctx = get_context("spawn")
+        barrier = ctx.Manager().Barrier(n_replicas)
+        with ctx.Pool(n_replicas) as pool:
+            jobs = [pool.apply_async(_replica, (f"replica-{i}", workdir, n_sensors, lease_seconds, i < kill, barrier))
+                    for i in range(n_replicas)]
+            finished = []
+            for i, job in enumerate(jobs):
+                if i < kill:
+                    continue
+                finished.append(job.get(timeout=120))
+
+        sent = Counter()
+        for name in os.listdir(workdir):
+            if name.startswith("sent-"):
+                with open(os.path.join(workdir, name)) as f:
+                    sent.update(line.strip() for line in f)
+        with open(os.path.join(workdir, "ingest.log")) as f:
+            ingests = [line.strip() for line in f]
+
+        expected = {sensor_key(SENSOR_TYPE, gw, sid) for gw, sid in _sensors(n_sensors)}
+        report = {
+            "replicas": n_replicas,
+            "killed": kill,
+            "sensors": n_sensors,
+            "ingestRuns": len(ingests),
+            "perReplica": {replica_id: {"first": first, "sweep": second} for replica_id, first, second in finished},
+            "missing": len(expected - set(sent)),
+            "duplicates": sum(1 for count in sent.values() if count > 1),
+        }
+        report["ok"] = report["ingestRuns"] == 1 and report["missing"] == 0 and report["duplicates"] == 0
+        return report
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import json
+    import argparse
+
+    parser = argparse.ArgumentParser(description="복제본 분할 실행 시뮬레이션")
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--sensors", type=int, default=2000)
+    parser.add_argument("--kill", type=int, default=1, help="전송 전에 죽일 복제본 수")
+    parser.add_argument("--lease", type=float, default=2.0, help="리스/heartbeat 만료 시간(초)")
+    args = parser.parse_args()
+
+    report = simulate(args.replicas, args.sensors, args.kill, args.lease)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    raise SystemExit(0 if report["ok"] else 1)
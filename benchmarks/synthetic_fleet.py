@@ -0,0 +1,126 @@
+"""
+재현 가능한 가상 센서 플릿 생성기
+
+센서 API(/threshold-histories/date/<날짜>) 응답과 같은 중첩 구조를 만듭니다.
+
+    [{"gateway_id": ..., "sensors": [{"sensor_id": ..., "types": [
+        {"type_en_name": ..., "min_diff": ..., "max_diff": ..., "avg_diff": ..., "calculated_at": <ms>}]}]}]
+
+같은 seed면 같은 플릿(센서별 기준값, 열화 센서)과 같은 날짜별 값을 만듭니다.
+날짜별 난수는 (seed, 날짜)로 만들기 때문에 하루치만 따로 생성해도 결과가 같습니다.
+
+실행: python -m benchmarks.synthetic_fleet --gateways 10 --sensors 20 --days 15 --out test_data/fleet
+"""
+import os
+import json
+import calendar
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+DEFAULT_SENSOR_TYPES = ["temperature", "humidity", "co2"]
+DEGRADING_RATIO = 0.1  # 변화량이 날마다 커지는(열화) 센서 비율
+
+
+class SyntheticFleet:
+    """게이트웨이 n_gateways개 × 게이트웨이당 센서 n_sensors개 × 센서 타입 목록"""
+
+    def __init__(self, n_gateways: int, n_sensors: int, sensor_types: list = None, seed: int = 42,
+                 start: date = date(2025, 1, 1), missing_rate: float = 0.0):
+        self.n_gateways = n_gateways
+        self.n_sensors = n_sensors
+        self.sensor_types = list(sensor_types or DEFAULT_SENSOR_TYPES)
+        self.seed = seed
+        self.start = start
+        self.missing_rate = missing_rate
+
+        self.gateway_ids = [f"gw-{g:04d}" for g in range(n_gateways)]
+        self.sensor_ids = [[f"sensor-{g:04d}-{s:03d}" for s in range(n_sensors)] for g in range(n_gateways)]
+
+        # 센서(게이트웨이, 센서, 타입)별 고정 특성
+        rng = np.random.default_rng(seed)
+        shape = (n_gateways, n_sensors, len(self.sensor_types))
+        self._base = rng.gamma(2.0, 0.3, shape)
+        self._spread = rng.gamma(2.0, 0.4, shape)
+        self._drift = np.where(rng.random(shape) < DEGRADING_RATIO, rng.uniform(0.02, 0.1, shape), 0.0)
+
+    @property
+    def n_records(self) -> int:
+        """하루치 레코드 수"""
+        return self.n_gateways * self.n_sensors * len(self.sensor_types)
+
+    def _values(self, day: date):
+        rng = np.random.default_rng([self.seed, day.toordinal()])
+        shape = self._base.shape
+        age = (day - self.start).days
+        min_diff = self._base * (1 + self._drift * age) * rng.lognormal(0, 0.15, shape)
+        max_diff = min_diff + self._spread * (1 + self._drift * age) * rng.lognormal(0, 0.15, shape)
+        avg_diff = min_diff + (max_diff - min_diff) * rng.uniform(0.3, 0.7, shape)
+        missing = rng.random(shape) < self.missing_rate
+        return np.round(min_diff, 4), np.round(max_diff, 4), np.round(avg_diff, 4), missing
+
+    def payload(self, day: date) -> list:
+        """day 하루치 센서 API 응답 (중첩 구조)"""
+        min_diff, max_diff, avg_diff, missing = self._values(day)
+        calculated_at = calendar.timegm(day.timetuple()) * 1000
+
+        payload = []
+        for g, gateway_id in enumerate(self.gateway_ids):
+            sensors = []
+            for s, sensor_id in enumerate(self.sensor_ids[g]):
+                types = []
+                for t, type_name in enumerate(self.sensor_types):
+                    if missing[g, s, t]:
+                        values = {"min_diff": None, "max_diff": None, "avg_diff": None}
+                    else:
+                        values = {"min_diff": float(min_diff[g, s, t]), "max_diff": float(max_diff[g, s, t]),
+                                  "avg_diff": float(avg_diff[g, s, t])}
+                    types.append({"type_en_name": type_name, **values, "calculated_at": calculated_at})
+                sensors.append({"sensor_id": sensor_id, "types": types})
+            payload.append({"gateway_id": gateway_id, "sensors": sensors})
+        return payload
+
+    def days(self, n_days: int) -> list:
+        return [self.start + timedelta(days=i) for i in range(n_days)]
+
+    def payloads(self, n_days: int):
+        """(날짜, 하루치 응답)을 날짜 순서대로 내줍니다."""
+        for day in self.days(n_days):
+            yield day, self.payload(day)
+
+
+def with_health_labels(df: pd.DataFrame) -> pd.DataFrame:
+    """학습용 health_score 컬럼을 추가합니다. (변화량이 클수록 낮은 점수)"""
+    total = df["min_diff"] + df["max_diff"] + df["avg_diff"]
+    return df.assign(health_score=(1 - total / (total.max() or 1)).clip(0, 1).round(4))
+
+
+def write_payloads(fleet: SyntheticFleet, n_days: int, out_dir: str) -> list:
+    """날짜별 응답을 <out_dir>/<YYYY-MM-DD>.json으로 저장하고 경로 목록을 반환합니다."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for day, payload in fleet.payloads(n_days):
+        path = os.path.join(out_dir, f"{day.isoformat()}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="가상 센서 플릿 응답 생성")
+    parser.add_argument("--gateways", type=int, default=10)
+    parser.add_argument("--sensors", type=int, default=20, help="게이트웨이당 센서 수")
+    parser.add_argument("--types", nargs="+", default=DEFAULT_SENSOR_TYPES, help="센서 타입 목록")
+    parser.add_argument("--days", type=int, default=15)
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2025, 1, 1), help="시작 날짜 (YYYY-MM-DD)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--missing-rate", type=float, default=0.0, help="값이 비어 있는 레코드 비율")
+    parser.add_argument("--out", default="test_data/fleet", help="출력 디렉토리")
+    args = parser.parse_args()
+
+    fleet = SyntheticFleet(args.gateways, args.sensors, args.types, args.seed, args.start, args.missing_rate)
+    written = write_payloads(fleet, args.days, args.out)
+    print(f"{len(written)}일 × {fleet.n_records}건 생성: {args.out}")
@@ -1,5 +1,11 @@
 import os
+import copy
+import time
+import queue
+import atexit
 import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
 from dotenv import load_dotenv
 
 # .env 파일 로드
@@ -14,15 +20,161 @@ log_file = os.getenv("LOGGING_FILE_NAME", "logs/sensor-health-ai.log")
 log_level_str = os.getenv("LOGGING_LEVEL", "DEBUG").upper()
 log_level = getattr(logging, log_level_str, logging.INFO)
 
+# 비동기 기록: 로그는 큐에 넣고 별도 스레드가 파일/콘솔에 기록 (false면 기존처럼 호출 스레드에서 기록)
+log_async = os.getenv("LOGGING_ASYNC", "true").lower() == "true"
+log_queue_size = int(os.getenv("LOGGING_QUEUE_SIZE", "10000"))
+# 같은 메시지(포맷 문자열 기준)는 window초마다 burst건까지만 기록하고 나머지는 건수 요약으로 대체 (0이면 제한 없음)
+log_rate_burst = int(os.getenv("LOGGING_RATE_BURST", "20"))
+log_rate_window = float(os.getenv("LOGGING_RATE_WINDOW", "60"))
+
+LOG_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
+
+
+class RepeatSummaryFilter(logging.Filter):
+    """
+    반복되는 메시지를 요약하는 필터.
+
+    (logger 이름, 레벨, 포맷 문자열)이 같은 메시지를 window초 동안 burst건까지만 통과시키고,
+    나머지는 세어 두었다가 "같은 로그 N건 생략" 요약 한 건으로 기록합니다.
+    센서별 메시지는 logger.warning("데이터 일수 부족: %s일", days)처럼 % 인자로 남겨야 같은 메시지로 묶입니다.
+    ERROR 이상은 제한하지 않습니다.
+    """
+
+    def __init__(self, burst: int, window: float, emit=None):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.emit = emit
+        self._lock = threading.Lock()
+        self._state = {}  # key -> [window 시작 시각, 통과 건수, 생략 건수, 마지막 생략 레코드]
+        self._flusher = None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.levelno >= logging.ERROR or getattr(record, "log_summary", False):
+            return True
+
+        key = (record.name, record.levelno, record.msg if isinstance(record.msg, str) else type(record.msg))
+        with self._lock:
+            state = self._state.get(key)
+            if state is None or record.created - state[0] >= self.window:
+                if state is not None and state[2]:
+                    self._emit_summary(state)
+                self._state[key] = [record.created, 1, 0, None]
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+            state[3] = record
+            self._start_flusher()
+            return False
+
+    def flush(self, expired_only: bool = False):
+        """생략 건수가 남은 요약을 기록합니다. expired_only면 window가 끝난 항목만 처리합니다."""
+        now = time.time()
+        with self._lock:
+            for key, state in list(self._state.items()):
+                if expired_only and now - state[0] < self.window:
+                    continue
+                if state[2]:
+                    self._emit_summary(state)
+                del self._state[key]
+
+    def _emit_summary(self, state: list):
+        last = state[3]
+        summary = logging.LogRecord(
+            last.name, last.levelno, last.pathname, last.lineno,
+            "같은 로그 %d건 생략 (%d초 동안): %s", (state[2], int(self.window), last.msg), None)
+        summary.log_summary = True
+        state[2] = 0
+        if self.emit is not None:
+            self.emit(summary)
+
+    def _start_flusher(self):
+        # 반복이 멈춘 메시지도 다음 window 안에 요약이 기록되도록 주기적으로 확인
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name="log-summary", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.window)
+            self.flush(expired_only=True)
+
+
+class FanoutHandler(logging.Handler):
+    """받은 레코드를 여러 핸들러에 그대로 전달 (동기 모드에서 필터를 한 번만 적용하기 위함)"""
+
+    def __init__(self, handlers: list):
+        super().__init__()
+        self.handlers = handlers
+
+    def emit(self, record: logging.LogRecord):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    큐가 가득 차면 기다리지 않고 버리는 QueueHandler.
+    메시지(msg % args)는 기본 QueueHandler.prepare처럼 큐에 넣기 전에 합치고 args를 비웁니다.
+    (DataFrame/dict 같은 가변 인자를 기록 스레드에서 나중에 포맷하면 바뀐 상태가 기록될 수 있음)
+    예외 정보는 그대로 두어 기록 스레드의 출력 핸들러 포맷(LOG_FORMAT)으로 traceback을 씁니다.
+    반복 요약 필터는 큐에 넣기 전에 원래 포맷 문자열로 판단하므로 영향이 없습니다.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
 # 로그 디렉토리 없으면 생성
 os.makedirs(os.path.dirname(log_file), exist_ok=True)
 
+formatter = logging.Formatter(LOG_FORMAT)
+output_handlers = [
+    logging.FileHandler(log_file, encoding='utf-8'),
+    logging.StreamHandler()  # 콘솔 출력도 병행
+]
+for handler in output_handlers:
+    handler.setFormatter(formatter)
+
+if log_async:
+    root_handler = DroppingQueueHandler(queue.Queue(maxsize=log_queue_size))
+    listener = QueueListener(root_handler.queue, *output_handlers, respect_handler_level=True)
+    listener.start()
+else:
+    root_handler = FanoutHandler(output_handlers)
+
+summary_filter = RepeatSummaryFilter(log_rate_burst, log_rate_window, emit=root_handler.handle)
+root_handler.addFilter(summary_filter)
+
+
+def _shutdown():
+    # 남은 요약을 기록하고 큐를 비운 뒤 종료
+    summary_filter.flush()
+    if log_async:
+        listener.stop()
+        if root_handler.dropped:
+            FanoutHandler(output_handlers).handle(logging.makeLogRecord({
+                "name": __name__, "levelno": logging.WARNING, "levelname": "WARNING",
+                "msg": "로그 큐가 가득 차 %d건을 기록하지 못했습니다.", "args": (root_handler.dropped,)}))
+
+
+atexit.register(_shutdown)
+
 # 로깅 설정
-logging.basicConfig(
-    level=log_level,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[
-        logging.FileHandler(log_file, encoding='utf-8'),
-        logging.StreamHandler()  # 콘솔 출력도 병행
-    ]
-)
\ No newline at end of file
+logging.basicConfig(level=log_level, handlers=[root_handler])
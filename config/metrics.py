@@ -0,0 +1,319 @@
+import io
+import os
+import sys
+import json
+import time
+import bisect
+import cProfile
+import contextvars
+import logging
+import pstats
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from config.settings import METRICS_DIR, METRICS_PREFIX, PIPELINE_PROFILE, PROFILE_SAMPLE_INTERVAL
+
+# 지연 시간 히스토그램 버킷 (초)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+logger = logging.getLogger(__name__)
+
+# scoped_metrics()로 지정한 레지스트리 (스레드/컨텍스트 단위)
+_scope = contextvars.ContextVar("metrics_scope", default=None)
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted(labels.items()))
+
+
+class Metrics:
+    """
+    프로세스 단위 카운터/게이지/히스토그램 모음.
+
+        metrics.inc("records_ingested_total", len(df))
+        with metrics.timer("stage_seconds", stage="fetch"):
+            ...
+        metrics.write()  # JSON + Prometheus 텍스트 파일
+
+    값은 (이름, 라벨) 단위로 모이며, 워커 프로세스의 snapshot()은 merge()로 합칠 수 있습니다.
+    """
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}  # key -> [버킷별 개수(+Inf 포함), 합계, 개수]
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = _key(name, labels)
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def timed(self, name: str, **labels):
+        """함수 실행 시간을 히스토그램 name에 기록하는 데코레이터"""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def since(self, baseline: dict) -> "Metrics":
+        """
+        baseline(snapshot()) 이후에 쌓인 값만 담은 새 Metrics를 반환합니다. (게이지는 현재 값)
+        전역 레지스트리를 reset()하지 않고 한 번의 실행 지표만 따로 남길 때 사용합니다.
+        """
+        delta = Metrics(self.buckets)
+        delta.merge(self.snapshot())
+        for item in baseline.get("counters", []):
+            key = _key(item["name"], item["labels"])
+            value = delta._counters.get(key, 0) - item["value"]
+            if value:
+                delta._counters[key] = value
+            else:
+                delta._counters.pop(key, None)
+        for item in baseline.get("histograms", []):
+            key = _key(item["name"], item["labels"])
+            histogram = delta._histograms.get(key)
+            if histogram is None:
+                continue
+            histogram[0] = [a - b for a, b in zip(histogram[0], item["counts"])]
+            histogram[1] -= item["sum"]
+            histogram[2] -= item["count"]
+            if histogram[2] <= 0:
+                del delta._histograms[key]
+        return delta
+
+    def snapshot(self) -> dict:
+        """JSON으로 직렬화할 수 있는 현재 값"""
+        with self._lock:
+            return {
+                "counters": [{"name": n, "labels": dict(l), "value": v} for (n, l), v in self._counters.items()],
+                "gauges": [{"name": n, "labels": dict(l), "value": v} for (n, l), v in self._gauges.items()],
+                "histograms": [
+                    {"name": n, "labels": dict(l), "buckets": list(self.buckets), "counts": list(h[0]),
+                     "sum": h[1], "count": h[2]}
+                    for (n, l), h in self._histograms.items()
+                ],
+            }
+
+    def merge(self, snapshot: dict):
+        """다른 프로세스의 snapshot()을 더합니다. (게이지는 덮어씀)"""
+        with self._lock:
+            for item in snapshot.get("counters", []):
+                key = _key(item["name"], item["labels"])
+                self._counters[key] = self._counters.get(key, 0) + item["value"]
+            for item in snapshot.get("gauges", []):
+                self._gauges[_key(item["name"], item["labels"])] = item["value"]
+            for item in snapshot.get("histograms", []):
+                key = _key(item["name"], item["labels"])
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                histogram[0] = [a + b for a, b in zip(histogram[0], item["counts"])]
+                histogram[1] += item["sum"]
+                histogram[2] += item["count"]
+
+    def to_prometheus(self, prefix: str = METRICS_PREFIX) -> str:
+        """Prometheus 텍스트 노출 형식 (node_exporter textfile collector용)"""
+        snapshot = self.snapshot()
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for kind in ("counters", "gauges"):
+            for item in sorted(snapshot[kind], key=lambda i: i["name"]):
+                name = prefix + item["name"]
+                declare(name, "counter" if kind == "counters" else "gauge")
+                lines.append(f"{name}{_labels(item['labels'])} {item['value']}")
+
+        for item in sorted(snapshot["histograms"], key=lambda i: i["name"]):
+            name = prefix + item["name"]
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(list(item["buckets"]) + ["+Inf"], item["counts"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(item['labels'], le=bound)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(item['labels'])} {item['sum']}")
+            lines.append(f"{name}_count{_labels(item['labels'])} {item['count']}")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, run_name: str = "pipeline", out_dir: str = METRICS_DIR) -> tuple:
+        """
+        <out_dir>/<run_name>-<시각>.json 과 <out_dir>/<run_name>.prom 을 기록하고 경로를 반환합니다.
+        .prom 파일은 실행마다 같은 이름으로 교체(atomic rename)합니다.
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        json_path = os.path.join(out_dir, f"{run_name}-{stamp}.json")
+        prom_path = os.path.join(out_dir, f"{run_name}.prom")
+
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"run": run_name, "writtenAt": datetime.now().isoformat(), **self.snapshot()},
+                      f, ensure_ascii=False, indent=2)
+        tmp_path = f"{prom_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, prom_path)
+        return json_path, prom_path
+
+
+def _labels(labels: dict, **extra) -> str:
+    items = {**labels, **extra}
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items.items()) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _ProcessMetrics(Metrics):
+    """
+    프로세스 전역 레지스트리(metrics).
+    scoped_metrics(registry) 블록 안에서는 기록(inc/set/observe)을 그 레지스트리로 보냅니다.
+    (예: 점수 조회 서버 요청 스레드는 서버 전용 레지스트리에 기록해 파이프라인 지표와 섞이지 않음)
+    """
+
+    def inc(self, name: str, value: float = 1, **labels):
+        scoped = _scope.get()
+        if scoped is not None:
+            return scoped.inc(name, value, **labels)
+        super().inc(name, value, **labels)
+
+    def set(self, name: str, value: float, **labels):
+        scoped = _scope.get()
+        if scoped is not None:
+            return scoped.set(name, value, **labels)
+        super().set(name, value, **labels)
+
+    def observe(self, name: str, seconds: float, **labels):
+        scoped = _scope.get()
+        if scoped is not None:
+            return scoped.observe(name, seconds, **labels)
+        super().observe(name, seconds, **labels)
+
+
+metrics = _ProcessMetrics()
+
+
+@contextmanager
+def scoped_metrics(registry: Metrics):
+    """블록 안(현재 스레드/컨텍스트)에서 전역 metrics에 기록되는 값을 registry로 보냅니다."""
+    token = _scope.set(registry)
+    try:
+        yield registry
+    finally:
+        _scope.reset(token)
+
+
+class _Sampler(threading.Thread):
+    """interval마다 대상 스레드의 호출 스택을 수집하는 샘플링 프로파일러 (folded stack 형식)"""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+@contextmanager
+def profile_run(run_name: str = "pipeline", mode: str = PIPELINE_PROFILE, out_dir: str = METRICS_DIR):
+    """
+    mode에 따라 블록 실행을 프로파일링합니다. (PIPELINE_PROFILE 환경변수로 한 번만 켤 수 있음)
+    - cprofile: <run_name>-<시각>.pstats 저장, 누적 시간 상위 함수 로그
+    - sample: PROFILE_SAMPLE_INTERVAL 간격 스택 샘플링, <run_name>-<시각>.folded 저장 (flamegraph 입력)
+    - 그 외/빈 값: 아무것도 하지 않음
+    """
+    mode = (mode or "").lower()
+    if mode not in ("cprofile", "sample"):
+        yield
+        return
+
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = os.path.join(out_dir, f"{run_name}-{stamp}.pstats")
+            profiler.dump_stats(path)
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(15)
+            logger.info("[프로파일] %s 저장\n%s", path, summary.getvalue())
+        return
+
+    sampler = _Sampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL)
+    sampler.start()
+    try:
+        yield
+    finally:
+        sampler.stop()
+        path = os.path.join(out_dir, f"{run_name}-{stamp}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.info("[프로파일] %s 저장 (샘플 %s개)", path, sum(sampler.stacks.values()))
@@ -11,9 +11,116 @@ ANALYSIS_RESULT_API_URL = os.getenv("ANALYSIS_RESULT_API_URL")
 # 모델 학습에 필요한 일수
 REQUIRED_DAYS = 15
 
+# 분석 대상이 되기 위한 최소 일수 (미만이면 분석 생략)
+MIN_ANALYSIS_DAYS = 10
+
 # 예측 기준 시간
 PREDICTION_CUTOFF_HOUR = 2  # 새벽 2시 기준
 PREDICTION_LOG_FILE = "prediction_log.txt"
 
-JOB_MAIN_TIME = os.getenv("JOB_MAIN_TIME", "02:30")
-JOB_CHECK_TIME = os.getenv("JOB_CHECK_TIME", "01:30")
\ No newline at end of file
+JOB_MAIN_TIME = os.getenv("JOB_MAIN_TIME", "01:25")
+JOB_CHECK_TIME = os.getenv("JOB_CHECK_TIME", "01:28")
+
+# 스케줄러 상태/잠금
+# - catch-up: latest(최근 SCHEDULER_CATCH_UP_HOURS 안에 놓친 실행을 재시작 시 한 번 실행) | skip
+SCHEDULER_STATE_PATH = os.getenv("SCHEDULER_STATE_PATH", "data/state/scheduler.json")
+SCHEDULER_CATCH_UP = os.getenv("SCHEDULER_CATCH_UP", "latest")
+SCHEDULER_CATCH_UP_HOURS = float(os.getenv("SCHEDULER_CATCH_UP_HOURS", "6"))
+JOB_STATE_PATH = os.getenv("JOB_STATE_PATH", "data/state/jobs.json")
+LOCK_DIR = os.getenv("LOCK_DIR", "data/locks")
+
+# 여러 복제본 분할 실행 (같은 볼륨의 SQLite로 조율)
+# - 살아 있는 복제본들이 (gateway_id, sensor_id) consistent hash로 센서를 나눠 분석
+# - 수집은 ingest 리스를 잡은 한 복제본만, 센서별 전송은 밤마다 한 번만
+# - REPLICA_ID가 비어 있으면 "<호스트>-<pid>"
+REPLICA_ENABLED = os.getenv("REPLICA_ENABLED", "false").lower() == "true"
+REPLICA_ID = os.getenv("REPLICA_ID", "")
+REPLICA_STORE_PATH = os.getenv("REPLICA_STORE_PATH", "data/state/replicas.sqlite3")
+REPLICA_LEASE_SECONDS = float(os.getenv("REPLICA_LEASE_SECONDS", "60"))
+REPLICA_HEARTBEAT_SECONDS = float(os.getenv("REPLICA_HEARTBEAT_SECONDS", "15"))
+REPLICA_INGEST_WAIT_SECONDS = float(os.getenv("REPLICA_INGEST_WAIT_SECONDS", "900"))
+REPLICA_VNODES = int(os.getenv("REPLICA_VNODES", "64"))
+
+# 센서 이력 저장소 설정
+# - partitioned: 센서타입/일자 단위 세그먼트에 append-only로 기록 (기본값)
+# - csv: 기존 data/sensors/<sensor_id>/<type>.csv 방식
+HISTORY_STORE = os.getenv("HISTORY_STORE", "partitioned")
+HISTORY_DIR = os.getenv("HISTORY_DIR", "data/history")
+HISTORY_SEGMENT_FORMAT = os.getenv("HISTORY_SEGMENT_FORMAT", "csv")  # csv | parquet (pyarrow 필요)
+
+# 이력 보관 정책 (매일 JOB_COMPACT_TIME에 정리, HISTORY_HOT_DAYS가 0이면 사용 안 함)
+# - 센서 타입별 최근 HISTORY_HOT_DAYS일은 원본 일별 행으로 유지 (분석/학습용, REQUIRED_DAYS 이상)
+# - 그보다 오래된 행은 HISTORY_ARCHIVE_FREQ 단위(D/W/M)로 요약해 gzip 압축 보관 세그먼트로 이동
+# - 기존 csv 저장소에서 HISTORY_ORPHAN_DAYS일 넘게 새 데이터가 없는 센서 파일은 보관 후 삭제
+HISTORY_HOT_DAYS = int(os.getenv("HISTORY_HOT_DAYS", "180"))
+HISTORY_ARCHIVE_DIR = os.getenv("HISTORY_ARCHIVE_DIR", "data/archive")
+HISTORY_ARCHIVE_FREQ = os.getenv("HISTORY_ARCHIVE_FREQ", "W")
+HISTORY_ORPHAN_DAYS = int(os.getenv("HISTORY_ORPHAN_DAYS", "30"))
+JOB_COMPACT_TIME = os.getenv("JOB_COMPACT_TIME", "03:00")
+
+# 분석 결과 전송 설정
+RESULT_SEND_CONCURRENCY = int(os.getenv("RESULT_SEND_CONCURRENCY", "8"))
+RESULT_SEND_BATCH_SIZE = int(os.getenv("RESULT_SEND_BATCH_SIZE", "1"))  # 2 이상이면 bulk 엔드포인트로 묶어서 전송
+RESULT_SEND_TIMEOUT = float(os.getenv("RESULT_SEND_TIMEOUT", "5"))
+RESULT_SEND_MAX_RETRIES = int(os.getenv("RESULT_SEND_MAX_RETRIES", "3"))
+RESULT_SEND_BACKOFF = float(os.getenv("RESULT_SEND_BACKOFF", "0.5"))  # 재시도 대기(초), 시도마다 2배
+
+# 전송 실패 결과 보관함 (job_check에서 재전송)
+RESULT_OUTBOX_PATH = os.getenv("RESULT_OUTBOX_PATH", "data/outbox/results.sqlite3")
+
+# 변경분만 전송(delta): 마지막 전송 점수와 비교해 점수가 EPSILON보다 크게 바뀌었거나 상태가 바뀐 결과만 전송
+# 마지막 전송 후 REFRESH_DAYS일이 지난 센서는 변화가 없어도 다시 전송
+RESULT_DELTA_ENABLED = os.getenv("RESULT_DELTA_ENABLED", "false").lower() == "true"
+RESULT_DELTA_EPSILON = float(os.getenv("RESULT_DELTA_EPSILON", "0.01"))
+RESULT_DELTA_REFRESH_DAYS = int(os.getenv("RESULT_DELTA_REFRESH_DAYS", "7"))
+RESULT_DELTA_PATH = os.getenv("RESULT_DELTA_PATH", "data/outbox/sent.sqlite3")
+
+# 모델 저장 형식 및 캐시 설정
+# - pack: 센서 타입별 단일 파일(<type>.<gen>.pack) + 오프셋 인덱스(<type>.index.sqlite3)
+# - joblib / pkl: 센서별 개별 파일 (기존 방식)
+MODEL_FORMAT = os.getenv("MODEL_FORMAT", "pack")
+MODEL_MMAP_MODE = os.getenv("MODEL_MMAP_MODE", "r") or None  # joblib 파일 mmap 모드, 빈 값이면 mmap 사용 안 함
+MODEL_CACHE_MAX_ENTRIES = int(os.getenv("MODEL_CACHE_MAX_ENTRIES", "256"))
+MODEL_CACHE_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+MODEL_COMPILE = os.getenv("MODEL_COMPILE", "true").lower() == "true"  # 로드한 RandomForest를 평탄 배열(FlatForest)로 변환
+
+# 파이프라인 병렬 실행 (1이면 단일 프로세스로 순차 실행)
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "1"))
+
+# 증분 실행: 입력 윈도우가 바뀐 센서만 다시 분석
+PIPELINE_INCREMENTAL = os.getenv("PIPELINE_INCREMENTAL", "true").lower() == "true"
+PIPELINE_MANIFEST_PATH = os.getenv("PIPELINE_MANIFEST_PATH", "data/state/manifest.sqlite3")
+
+# 센서별 최근 REQUIRED_DAYS일 롤링 윈도우 (수집 시 갱신, 분석 시 이력 파일 대신 사용)
+ROLLING_WINDOW_ENABLED = os.getenv("ROLLING_WINDOW_ENABLED", "true").lower() == "true"
+ROLLING_WINDOW_PATH = os.getenv("ROLLING_WINDOW_PATH", "data/state/windows.npz")
+
+# 로컬 점수 조회 서버 (스케줄러와 함께 실행하며 모델/롤링 윈도우를 메모리에 유지)
+# - SCORING_SERVER_SOCKET을 지정하면 TCP 대신 Unix 소켓으로 받음
+SCORING_SERVER_ENABLED = os.getenv("SCORING_SERVER_ENABLED", "false").lower() == "true"
+SCORING_SERVER_HOST = os.getenv("SCORING_SERVER_HOST", "127.0.0.1")
+SCORING_SERVER_PORT = int(os.getenv("SCORING_SERVER_PORT", "8765"))
+SCORING_SERVER_SOCKET = os.getenv("SCORING_SERVER_SOCKET", "")
+SCORING_SERVER_MAX_SENSORS = int(os.getenv("SCORING_SERVER_MAX_SENSORS", "5000"))
+
+# 센서 API 응답 스트리밍 파싱 (ijson 설치 필요)
+SENSOR_FETCH_STREAMING = os.getenv("SENSOR_FETCH_STREAMING", "false").lower() == "true"
+
+# 기간 백필 설정
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "4"))
+BACKFILL_STATE_PATH = os.getenv("BACKFILL_STATE_PATH", "data/state/backfill.json")
+
+# 이력 로더: 센서 단위 묶음 하나의 최대 행 수와 CSV 청크 크기 (학습 시 메모리 사용량 상한)
+LOADER_ROW_BUDGET = int(os.getenv("LOADER_ROW_BUDGET", "500000"))
+LOADER_CHUNK_ROWS = int(os.getenv("LOADER_CHUNK_ROWS", "100000"))
+
+# 모델 일괄 학습 설정
+TRAIN_WORKERS = int(os.getenv("TRAIN_WORKERS", "0"))  # 0이면 CPU 코어 수
+TRAIN_REPORT_DIR = os.getenv("TRAIN_REPORT_DIR", "reports/training")
+
+# 실행 지표(JSON + Prometheus 텍스트) 저장 위치
+METRICS_DIR = os.getenv("METRICS_DIR", "reports/metrics")
+METRICS_PREFIX = os.getenv("METRICS_PREFIX", "sensor_health_")
+# 프로파일링 (한 번 실행할 때만 지정): cprofile | sample, 빈 값이면 사용 안 함
+PIPELINE_PROFILE = os.getenv("PIPELINE_PROFILE", "")
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.01"))
@@ -1,32 +1,39 @@
 import config.logging_setup
-import time
 import logging
-import schedule
-from config.settings import JOB_MAIN_TIME, JOB_CHECK_TIME
-from scheduler.analyze_schedule import job_main, job_check
+from config.settings import JOB_MAIN_TIME, JOB_CHECK_TIME, JOB_COMPACT_TIME, SCORING_SERVER_ENABLED, REPLICA_ENABLED
+from scheduler.analyze_schedule import job_main, job_check, job_compact
+from scheduler.daily_scheduler import DailyScheduler
 import signal
-import sys
 
 logger = logging.getLogger(__name__)
 
-schedule.every().day.at("01:25").do(job_main)
-schedule.every().day.at("01:28").do(job_check)
+scheduler = DailyScheduler()
+scheduler.every_day(JOB_MAIN_TIME, "job_main", job_main)
+scheduler.every_day(JOB_CHECK_TIME, "job_check", job_check)
+scheduler.every_day(JOB_COMPACT_TIME, "job_compact", job_compact)
 
-# 종료 신호 처리 함수
+# 종료 신호 처리 함수: 대기 중이면 바로 깨어나고, 실행 중인 작업은 끝난 뒤 종료
 def signal_handler(sig, frame):
-    logger.info("스케줄러 종료")
-    sys.exit(0)
+    logger.info("스케줄러 종료 요청")
+    scheduler.stop()
 
 signal.signal(signal.SIGINT, signal_handler)
 signal.signal(signal.SIGTERM, signal_handler)
 
 if __name__ == "__main__":
     logger.info("스케줄러 시작")
+    if REPLICA_ENABLED:
+        from services.replica_coordinator import get_coordinator
+        get_coordinator().start()
+    if SCORING_SERVER_ENABLED:
+        from services.scoring_server import start_scoring_server
+        scoring_server = start_scoring_server()
     try:
-        while True:
-            logger.debug("작업 대기 중...")
-            schedule.run_pending()
-            time.sleep(60)
+        scheduler.run_forever()
     except Exception as e:
-        logger.exception(f"스케줄러 실행 중 예외 발생: {e}")
-        logger.info("스케줄러 종료")
\ No newline at end of file
+        logger.exception("스케줄러 실행 중 예외 발생: %s", e)
+    if SCORING_SERVER_ENABLED:
+        scoring_server.shutdown()
+    if REPLICA_ENABLED:
+        get_coordinator().stop()
+    logger.info("스케줄러 종료")
@@ -1,59 +1,265 @@
-import os
-import glob
+import time
+import numpy as np
 import pandas as pd
 from datetime import datetime
-from services.sensor_service import fetch_threshold_history, save_by_sensor_and_type, DATA_DIR
-from ai.health_predictor import predict
-from services.analysis_result_service import send_analysis_result
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config.metrics import metrics, profile_run
+from config.settings import (
+    REQUIRED_DAYS, PIPELINE_WORKERS, PIPELINE_INCREMENTAL, ROLLING_WINDOW_ENABLED, RESULT_DELTA_ENABLED,
+    REPLICA_ENABLED,
+)
+from services.sensor_service import fetch_threshold_history, save_by_sensor_and_type
+from services.history_store import get_history_store
+from ai.health_predictor import predict_batch, predict_windows
+from services.result_sender import ResultSender
+from services.replica_coordinator import get_coordinator
+from services.result_delta import SentIndex
+from services.result_outbox import ResultOutbox
+from services.rolling_window import get_rolling_windows, flush_rolling_windows
+from services.watermark_manifest import get_manifest, window_hashes
 
 import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def run_pipeline():
+def shard_of(df: pd.DataFrame, n_shards: int) -> pd.Series:
+    """(gateway_id, sensor_id) 기준 shard 번호. 프로세스가 달라도 같은 값이 나옵니다."""
+    hashes = pd.util.hash_pandas_object(df[["gateway_id", "sensor_id"]].astype(str), index=False)
+    return hashes % n_shards
+
+def _score_sensor_type(sensor_type: str, shard: int = 0, n_shards: int = 1, incremental: bool = False,
+                       ownership=None):
+    """
+    센서 타입 하나(또는 그 중 shard 하나)를 분석하고 (결과 목록, 센서별 윈도우 해시, 실패 센서 목록)을 반환합니다.
+    윈도우 해시는 결과가 나왔거나 데이터 부족으로 생략된 센서만 담고, 예측 중 실패한 센서는 빼서 다시 분석되게 합니다.
+    워커 프로세스에서는 DataFrame을 전달받지 않고 이력 저장소에서 직접 읽습니다.
+    incremental이면 마지막 분석 이후 입력 윈도우가 바뀐 센서만 분석합니다.
+    ROLLING_WINDOW_ENABLED면 이력 파일 대신 롤링 윈도우 스냅샷을 사용합니다.
+    ownership(services.replica_coordinator.Ownership)을 주면 이 복제본이 맡은 센서만 분석합니다.
+    """
+    if ROLLING_WINDOW_ENABLED:
+        return _score_windows(sensor_type, shard, n_shards, incremental, ownership)
+
+    df = get_history_store().read_recent(sensor_type, days=REQUIRED_DAYS)
+    if n_shards > 1 and not df.empty:
+        df = df[(shard_of(df, n_shards) == shard).values]
+    if ownership is not None and not df.empty:
+        sensors = df[["gateway_id", "sensor_id"]].astype(str).drop_duplicates()
+        owned = sensors[ownership.mask(sensor_type, sensors["gateway_id"], sensors["sensor_id"])]
+        sensor_index = pd.MultiIndex.from_frame(df[["gateway_id", "sensor_id"]].astype(str))
+        df = df[sensor_index.isin(pd.MultiIndex.from_frame(owned))]
+
+    hashes = window_hashes(df)
+    if incremental and not hashes.empty:
+        previous = get_manifest().window_hashes(sensor_type)
+        changed = [key for key, value in hashes.items() if previous.get(key) != value]
+        if len(changed) < len(hashes):
+            logger.info("변경 없는 센서 분석 생략: %s %s개", sensor_type, len(hashes) - len(changed))
+            hashes = hashes.loc[changed] if changed else hashes.iloc[:0]
+            sensor_index = pd.MultiIndex.from_frame(df[["gateway_id", "sensor_id"]].astype(str))
+            df = df[sensor_index.isin(hashes.index)]
+
+    failed = []
+    results = predict_batch(df, sensor_type=sensor_type, failed=failed)
+    return results, _without(hashes.to_dict(), failed), failed
+
+def _score_windows(sensor_type: str, shard: int, n_shards: int, incremental: bool, ownership=None):
+    batch = get_rolling_windows().batch(sensor_type, days=REQUIRED_DAYS)
+    keys = pd.DataFrame({"gateway_id": batch.gateway_ids, "sensor_id": batch.sensor_ids})
+    if n_shards > 1 and len(batch):
+        batch = batch.take((shard_of(keys, n_shards) == shard).values)
+    if ownership is not None and len(batch):
+        batch = batch.take(np.array(ownership.mask(sensor_type, batch.gateway_ids, batch.sensor_ids), dtype=bool))
+
+    # 해시는 센서별 윈도우 행(수십 행)으로만 계산
+    hashes = window_hashes(batch.frame())
+    if incremental and not hashes.empty:
+        previous = get_manifest().window_hashes(sensor_type)
+        changed = [previous.get((gw, sid)) != hashes.get((gw, sid))
+                   for gw, sid in zip(batch.gateway_ids, batch.sensor_ids)]
+        if not all(changed):
+            logger.info("변경 없는 센서 분석 생략: %s %s개", sensor_type, changed.count(False))
+            batch = batch.take(np.array(changed, dtype=bool))
+            hashes = hashes.loc[[(gw, sid) for gw, sid in zip(batch.gateway_ids, batch.sensor_ids)]] \
+                if len(batch) else hashes.iloc[:0]
+
+    failed = []
+    results = predict_windows(batch, failed=failed)
+    return results, _without(hashes.to_dict(), failed), failed
+
+def _without(hashes: dict, failed: list) -> dict:
+    for key in failed:
+        hashes.pop(key, None)
+    return hashes
+
+def _score_in_worker(sensor_type: str, shard: int, n_shards: int, incremental: bool, ownership=None):
+    """워커 프로세스용: 분석 결과와 함께 이 작업에서 쌓인 지표를 반환해 부모 프로세스에서 합칩니다."""
+    baseline = metrics.snapshot()
+    results, hashes, failed = _score_sensor_type(sensor_type, shard, n_shards, incremental, ownership)
+    return results, hashes, failed, metrics.since(baseline).snapshot()
+
+def _init_worker():
+    import config.logging_setup  # noqa: F401 - 워커 프로세스에도 동일한 로그 설정 적용
+
+def _iter_results(sensor_types: list, workers: int, incremental: bool = False, ownership=None):
+    """
+    분석이 끝나는 순서대로 (센서 타입, 작업 이름, 결과 목록, 윈도우 해시, 실패 센서 목록)을 반환합니다.
+    실패한 작업은 로그만 남기고 건너뜁니다.
+    """
+    if workers <= 1:
+        for sensor_type in sensor_types:
+            try:
+                yield (sensor_type, sensor_type,
+                       *_score_sensor_type(sensor_type, incremental=incremental, ownership=ownership))
+            except Exception as e:
+                logger.error("❌ 분석 실패: %s - %s", sensor_type, e)
+        return
+
+    # 센서 타입 × shard 단위로 나눠 프로세스 풀에서 실행
+    tasks = [(sensor_type, shard, workers, incremental, ownership)
+             for sensor_type in sensor_types for shard in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"), initializer=_init_worker) as pool:
+        futures = {pool.submit(_score_in_worker, *task): task for task in tasks}
+        for future in as_completed(futures):
+            sensor_type, shard, n_shards = futures[future][:3]
+            name = f"{sensor_type}[{shard + 1}/{n_shards}]"
+            try:
+                results, hashes, failed, snapshot = future.result()
+                metrics.merge(snapshot)
+                yield sensor_type, name, results, hashes, failed
+            except Exception as e:
+                logger.error("❌ 분석 실패: %s - %s", name, e)
+
+def run_pipeline(workers: int = PIPELINE_WORKERS, incremental: bool = PIPELINE_INCREMENTAL) -> bool:
+    """
+    수집 → 저장 → 분석 → 전송을 한 번 수행합니다.
+    workers가 2 이상이면 센서 타입 × (gateway_id, sensor_id) shard 단위로 여러 프로세스에서 분석합니다.
+    incremental이면 마지막 분석 이후 새 데이터가 들어온 센서 타입만 읽고, 입력 윈도우가 바뀐 센서만 분석합니다.
+    분석 단계까지 진행했으면 True, 수집/저장 데이터가 없어 중단했으면 False를 반환합니다.
+
+    실행이 끝나면 이번 실행의 단계별 지표를 METRICS_DIR에 JSON/Prometheus 형식으로 남깁니다.
+    PIPELINE_PROFILE 환경변수를 주면 이번 실행을 프로파일링합니다.
+    """
+    # 전역 레지스트리를 비우지 않고, 이번 실행 동안 쌓인 값만 따로 기록
+    baseline = metrics.snapshot()
+    started = time.perf_counter()
+    status = "failed"
+    try:
+        with profile_run("pipeline"):
+            completed = _run_pipeline(workers, incremental)
+        status = "completed" if completed else "no_data"
+        return completed
+    finally:
+        metrics.observe("pipeline_seconds", time.perf_counter() - started)
+        metrics.inc("pipeline_runs_total", status=status)
+        metrics.set("pipeline_last_run_timestamp_seconds", int(time.time()))
+        try:
+            json_path, prom_path = metrics.since(baseline).write("pipeline")
+            logger.info("📊 실행 지표 저장: %s, %s", json_path, prom_path)
+        except OSError as e:
+            logger.error("실행 지표 저장 실패: %s", e)
+
+def _ingest() -> int:
+    """수집 후 저장하고 수집한 행 수를 반환합니다."""
     # 1. 센서 데이터 수집
     logger.info("📡 센서 임계치 데이터 수집 시작")
     df = fetch_threshold_history(datetime.now())
-    
-    logger.info(f"수집된 데이터: {df}")
-    
+    logger.info("수집된 데이터: %d건", len(df))
+
     if df.empty:
-        logger.warning("⚠️ 수집된 데이터가 없습니다. 파이프라인 종료")
-        return
+        return 0
 
-    # 2. 수집된 데이터를 센서타입별 CSV로 저장
-    logger.info("💾 센서 타입별 CSV 저장")
+    # 2. 수집된 데이터를 센서 이력 저장소에 저장
+    logger.info("💾 센서 이력 저장")
     save_by_sensor_and_type(df)
+    # 롤링 윈도우는 메모리에만 반영되어 있으므로 분석(워커 프로세스 포함) 전에 스냅샷으로 저장
+    flush_rolling_windows()
+    return len(df)
 
-    # 3. 저장된 모든 센서 타입별 CSV 파일을 탐색
-    csv_files = glob.glob(os.path.join(DATA_DIR, "*", "*.csv"))
+def _run_pipeline(workers: int, incremental: bool) -> bool:
+    # REPLICA_ENABLED면 수집은 리더 한 곳에서만 하고, 분석/전송은 이 복제본이 맡은 센서 중 오늘 밤 처리되지 않은 것만
+    coordinator = get_coordinator() if REPLICA_ENABLED else None
+    scored_on = datetime.now().strftime("%Y-%m-%d")
+    if coordinator is not None:
+        coordinator.start()
+        coordinator.prune()
+        fetched = coordinator.ingest_once(scored_on, _ingest)
+        if fetched is None:
+            return False
+        # 타입 단위 dirty 표시는 복제본끼리 공유되므로 분할 실행에서는 증분 실행을 쓰지 않음
+        incremental = False
+    else:
+        fetched = _ingest()
 
-    if not csv_files:
-        logger.warning("⚠️ 저장된 CSV 파일이 없습니다. 파이프라인 종료")
-        return
+    if not fetched:
+        logger.warning("⚠️ 수집된 데이터가 없습니다. 파이프라인 종료")
+        return False
 
-    for file_path in csv_files:
-        sensor_type = os.path.basename(file_path).replace(".csv", "")
-        try:
-            df = pd.read_csv(file_path, parse_dates=["date"])
-        except Exception as e:
-            logger.error(f"❌ CSV 로드 실패: {file_path} - {e}")
-            continue
+    # 3. 저장된 센서 타입 조회 (증분 실행이면 새 데이터가 들어온 타입만)
+    sensor_types = get_history_store().sensor_types()
+    manifest = get_manifest()
+    if incremental:
+        sensor_types = manifest.dirty_sensor_types(sensor_types)
 
-        # 4. 센서 단위로 예측 수행
-        for (gateway_id, sensor_id), group_df in df.groupby(["gateway_id", "sensor_id"]):
-            df_sensor = group_df.sort_values(by="date").dropna(subset=["min_diff", "max_diff", "avg_diff"]).tail(15)
+    if not sensor_types:
+        logger.warning("⚠️ 분석할 센서 이력이 없습니다. 파이프라인 종료")
+        return True
 
-            if df_sensor.shape[0] < 10:
-                logger.warning(f"⚠️ 분석 생략 - 데이터 부족: {sensor_type}/{gateway_id}/{sensor_id} ({df_sensor.shape[0]}개)")
-                continue
+    # 4. 센서 타입 단위로 분석하고, 끝난 결과부터 바로 전송기에 넘김
+    # 전송 실패 결과는 보관함에 남겨 job_check에서 재전송
+    # RESULT_DELTA_ENABLED면 마지막 전송과 비교해 바뀐 결과만 전송
+    outbox = ResultOutbox()
+    sent_index = SentIndex() if RESULT_DELTA_ENABLED else None
+    ownership = coordinator.ownership(scored_on) if coordinator is not None else None
+    if ownership is not None:
+        logger.info("분할 실행: %s / 복제본 %s", ownership.replica_id, ownership.ring.replicas)
+    completed = {}
+    partial = set()  # 일부 센서 분석이 실패한 타입
+    unchanged = 0
 
-            try:
-                result = predict(sensor_type, gateway_id, sensor_id, df_sensor)
-                send_analysis_result(result)
-                logger.info(f"✅ 분석 완료 및 전송: {sensor_type}/{gateway_id}/{sensor_id}")
-            except Exception as e:
-                logger.error(f"❌ 분석 실패: {sensor_type}/{gateway_id}/{sensor_id} - {e}")
+    def on_success(results):
+        outbox.discard(results)
+        if sent_index is not None:
+            sent_index.record(results)
+        if coordinator is not None:
+            coordinator.mark_done(results, scored_on)
+
+    with metrics.timer("stage_seconds", stage="score_send"), \
+            ResultSender(on_failure=outbox.add, on_success=on_success) as sender:
+        for sensor_type, name, results, hashes, failed in _iter_results(sensor_types, workers, incremental, ownership):
+            if coordinator is not None:
+                # 담당이 겹친 경우(복제본 합류/이탈 직후) 먼저 claim한 복제본만 전송
+                results = coordinator.claim(scored_on, results)
+            if sent_index is not None:
+                results, skipped = sent_index.changed(results)
+                # 생략한 센서의 보관 중인 이전 실패 결과는 더 이상 최신이 아니므로 재전송하지 않음
+                outbox.discard(skipped)
+                unchanged += len(skipped)
+                if coordinator is not None:
+                    coordinator.mark_done(skipped, scored_on)
+            for result in results:
+                sensor_info = result["result"]["sensorInfo"]
+                sender.submit(result)
+                logger.info("✅ 분석 완료 및 전송 요청: %s/%s/%s", name, sensor_info["gatewayId"], sensor_info["sensorId"])
+            manifest.mark_scored(sensor_type, hashes, scored_on)
+            if failed:
+                # 실패한 센서는 dirty로 남겨 다음 실행(증분 포함)에서 다시 분석
+                manifest.mark_failed(sensor_type, failed)
+                partial.add(sensor_type)
+            completed[sensor_type] = completed.get(sensor_type, 0) + 1
+    metrics.set("sensor_types_scored", len(completed))
+
+    # 모든 shard와 센서가 성공한 타입만 dirty 해제 (분할 실행에서는 다른 복제본의 센서가 남아 있으므로 해제하지 않음)
+    for sensor_type, done in completed.items():
+        if done == max(1, workers) and sensor_type not in partial and coordinator is None:
+            manifest.clear_dirty(sensor_type)
+
+    stats = sender.stats.summary()
+    logger.info("📤 결과 전송 완료: 성공 %s건, 실패 %s건 (%s건/초)", stats['sent'], stats['failed'], stats['throughputPerSec'])
+    if sent_index is not None:
+        logger.info("변경 없는 결과 전송 생략: %s건", unchanged)
+    return True
 
 if __name__ == "__main__":
     run_pipeline()
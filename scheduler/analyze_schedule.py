@@ -1,18 +1,84 @@
+import os
+import json
 import logging
+from datetime import date
+from config.settings import JOB_MAIN_TIME, JOB_CHECK_TIME, JOB_COMPACT_TIME, JOB_STATE_PATH, REPLICA_ENABLED
 from pipeline.run_pipeline import run_pipeline
+from services.file_lock import job_lock
+from services.history_retention import compact_history
+from services.replica_coordinator import get_coordinator
+from services.result_outbox import replay_outbox
 
 logger = logging.getLogger(__name__)
 
-def _run_job(job_name: str, schedule_time: str):
-    logger.info(f"{job_name} 시작 [{schedule_time}]")
+
+def _load_completed() -> dict:
+    # 작업별 마지막 완료 날짜 (재시작 후에도 job_check에서 메인 작업 완료 여부를 알 수 있도록 파일에 보관)
+    if not os.path.isfile(JOB_STATE_PATH):
+        return {}
     try:
-        run_pipeline()
-        logger.info(f"{job_name} 종료 [{schedule_time}]")
+        with open(JOB_STATE_PATH, encoding="utf-8") as f:
+            return {name: date.fromisoformat(value) for name, value in json.load(f).items()}
+    except (OSError, ValueError):
+        return {}
+
+
+def _mark_completed(job_name: str):
+    _last_completed[job_name] = date.today()
+    os.makedirs(os.path.dirname(JOB_STATE_PATH) or ".", exist_ok=True)
+    tmp_path = f"{JOB_STATE_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({name: value.isoformat() for name, value in _last_completed.items()}, f)
+    os.replace(tmp_path, JOB_STATE_PATH)
+
+
+_last_completed = _load_completed()
+
+# 분할 실행에서는 같은 볼륨의 다른 복제본과 겹쳐 실행해야 하므로 파이프라인 잠금을 복제본별로 둠
+PIPELINE_LOCK = f"pipeline-{get_coordinator().replica_id}" if REPLICA_ENABLED else "pipeline"
+
+
+def _run_job(job_name: str, schedule_time: str, job=run_pipeline, lock_name: str = PIPELINE_LOCK) -> bool:
+    """
+    lock_name 잠금을 잡은 경우에만 job을 실행합니다.
+    같은 잠금을 쓰는 작업이 (다른 프로세스에서라도) 실행 중이면 겹쳐 실행하지 않고 건너뜁니다.
+    """
+    lock = job_lock(lock_name)
+    if not lock.acquire():
+        logger.warning("%s 건너뜀 [%s]: '%s' 작업이 이미 실행 중입니다. %s", job_name, schedule_time, lock_name, lock.holder())
+        return False
+
+    logger.info("%s 시작 [%s]", job_name, schedule_time)
+    try:
+        completed = job() is not False
+        logger.info("%s 종료 [%s]", job_name, schedule_time)
+        return completed
     except Exception as e:
-        logger.error(f"{job_name} 중 오류 발생: {e}", exc_info=True)
+        logger.error("%s 중 오류 발생: %s", job_name, e, exc_info=True)
+        return False
+    finally:
+        lock.release()
+
 
 def job_main():
-    _run_job("메인 예측 작업", "02:30")
+    if _run_job("메인 예측 작업", JOB_MAIN_TIME):
+        _mark_completed("job_main")
+
 
 def job_check():
-    _run_job("놓친 부분 점검 작업", "01:30")
+    # 오늘 메인 작업이 끝나지 않았을 때만 전체 파이프라인을 다시 실행
+    # 분할 실행에서는 항상 실행: 그 사이 빠진 복제본의 센서 중 오늘 밤 처리되지 않은 것만 나눠 맡음
+    if REPLICA_ENABLED:
+        _run_job("놓친 부분 점검 작업", JOB_CHECK_TIME)
+    elif _last_completed.get("job_main") != date.today():
+        logger.warning("오늘 메인 예측 작업 완료 기록이 없어 전체 파이프라인을 실행합니다.")
+        if _run_job("놓친 부분 점검 작업", JOB_CHECK_TIME):
+            _mark_completed("job_main")
+
+    # 전송에 실패해 보관 중인 결과만 재전송
+    _run_job("미전송 결과 재전송 작업", JOB_CHECK_TIME, replay_outbox, lock_name="outbox")
+
+
+def job_compact():
+    # 수집과 같은 'history' 잠금을 사용하므로 수집 중이면 건너뛰고 다음 날 다시 실행
+    _run_job("이력 정리 작업", JOB_COMPACT_TIME, compact_history, lock_name="history")
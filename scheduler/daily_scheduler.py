@@ -0,0 +1,132 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from config.settings import SCHEDULER_STATE_PATH, SCHEDULER_CATCH_UP, SCHEDULER_CATCH_UP_HOURS
+
+logger = logging.getLogger(__name__)
+
+
+def parse_time(at: str) -> tuple:
+    """"HH:MM" → (시, 분)"""
+    hour, minute = (int(part) for part in at.split(":"))
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"잘못된 시각: {at}")
+    return hour, minute
+
+
+class DailyJob:
+    __slots__ = ("name", "at", "fn", "next_run")
+
+    def __init__(self, name: str, at: str, fn):
+        self.name = name
+        self.at = parse_time(at)
+        self.fn = fn
+        self.next_run = None
+
+    def occurrence(self, day) -> datetime:
+        return datetime.combine(day, datetime.min.time()).replace(hour=self.at[0], minute=self.at[1])
+
+    def next_after(self, moment: datetime) -> datetime:
+        candidate = self.occurrence(moment.date())
+        return candidate if candidate > moment else self.occurrence(moment.date() + timedelta(days=1))
+
+
+class DailyScheduler:
+    """
+    하루 한 번 실행 작업 스케줄러.
+
+    - 주기적으로 깨어나 확인하지 않고 가장 가까운 실행 시각까지 대기합니다. (stop 시 즉시 깨어남)
+    - 작업은 등록 순서대로 같은 스레드에서 실행하므로 서로 겹치지 않습니다.
+      앞 작업이 길어져 실행 시각을 지난 작업은 끝난 뒤 한 번만 실행합니다. (여러 번 밀려도 한 번으로 합침)
+    - 작업별 마지막 실행 시각(state_path)을 기록해 재시작 시 놓친 실행을 catch_up 정책대로 처리합니다.
+      · latest: 최근 catch_up_hours 안에 놓친 실행이 있으면 시작하자마자 한 번 실행
+      · skip: 놓친 실행은 건너뛰고 다음 실행 시각을 기다림
+    - 다른 프로세스와의 중복 실행 방지는 작업 함수 쪽 잠금(services.file_lock)이 담당합니다.
+    """
+
+    def __init__(self, state_path: str = SCHEDULER_STATE_PATH, catch_up: str = SCHEDULER_CATCH_UP,
+                 catch_up_hours: float = SCHEDULER_CATCH_UP_HOURS):
+        if catch_up not in ("latest", "skip"):
+            raise ValueError(f"알 수 없는 catch-up 정책: {catch_up}")
+        self.state_path = state_path
+        self.catch_up = catch_up
+        self.catch_up_hours = catch_up_hours
+        self.jobs = []
+        self._stop = threading.Event()
+        self._last_run = self._load_state()
+
+    def every_day(self, at: str, name: str, fn) -> DailyJob:
+        job = DailyJob(name, at, fn)
+        self.jobs.append(job)
+        return job
+
+    def _load_state(self) -> dict:
+        if not os.path.isfile(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return {name: datetime.fromisoformat(value) for name, value in json.load(f).get("lastRun", {}).items()}
+        except (OSError, ValueError) as e:
+            logger.warning("스케줄러 상태 파일을 읽지 못해 무시합니다: %s", e)
+            return {}
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"lastRun": {name: value.isoformat() for name, value in self._last_run.items()}}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _plan(self, now: datetime):
+        """시작 시 작업별 첫 실행 시각을 정합니다."""
+        for job in self.jobs:
+            job.next_run = job.next_after(now)
+            missed = job.next_run - timedelta(days=1)
+            last_run = self._last_run.get(job.name)
+            # 실행 기록이 없는 작업(최초 배포)은 보충하지 않음
+            if self.catch_up != "latest" or last_run is None or last_run >= missed:
+                continue
+            if now - missed <= timedelta(hours=self.catch_up_hours):
+                logger.warning("놓친 실행 보충: %s (예정 %s)", job.name, format(missed, "%Y-%m-%d %H:%M"))
+                job.next_run = now
+
+    def run_pending(self, now: datetime = None) -> int:
+        """실행 시각이 지난 작업을 등록 순서대로 실행하고 실행한 작업 수를 반환합니다."""
+        ran = 0
+        for job in self.jobs:
+            now = now or datetime.now()
+            if job.next_run is None or job.next_run > now or self._stop.is_set():
+                continue
+            scheduled = job.next_run
+            try:
+                job.fn()
+            except Exception as e:
+                logger.exception("%s 실행 중 예외 발생: %s", job.name, e)
+            finally:
+                self._last_run[job.name] = scheduled
+                self._save_state()
+                # 실행 중 지나간 시각은 다시 실행하지 않음 (coalesce)
+                job.next_run = job.next_after(max(datetime.now(), scheduled))
+                now = None
+            ran += 1
+        return ran
+
+    def run_forever(self):
+        self._plan(datetime.now())
+        for job in self.jobs:
+            logger.info("작업 등록: %s 매일 %02d:%02d (다음 실행 %s)", job.name, job.at[0], job.at[1],
+                        format(job.next_run, "%Y-%m-%d %H:%M"))
+
+        while not self._stop.is_set():
+            self.run_pending()
+            upcoming = min(job.next_run for job in self.jobs)
+            delay = (upcoming - datetime.now()).total_seconds()
+            if delay > 0:
+                logger.debug("다음 작업까지 대기: %s (%.0f초)", format(upcoming, "%Y-%m-%d %H:%M"), delay)
+                # 시계 변경/절전 복귀에 대비해 최대 1시간마다 다시 계산
+                self._stop.wait(min(delay, 3600))
+
+    def stop(self):
+        self._stop.set()
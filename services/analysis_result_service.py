@@ -1,16 +1,28 @@
-import requests
-from config.settings import ANALYSIS_RESULT_API_URL
+from config.metrics import metrics
+from services.result_sender import ANALYSIS_RESULT_ENDPOINT, create_session, post_with_retry
 
 import logging
 
 logger = logging.getLogger(__name__)
 
-ANALYSIS_RESULT_ENDPOINT = f"{ANALYSIS_RESULT_API_URL}/analysis-results"
+# 건별 전송도 커넥션을 재사용하도록 세션을 공유
+_session = None
 
-def send_analysis_result(result: dict):
-    try:
-        response = requests.post(ANALYSIS_RESULT_ENDPOINT, json=result, timeout=5)
-        response.raise_for_status()
-        logger.info(f"결과 전송 완료: {result}")
-    except Exception as e:
-        logger.error(f"결과 전송 실패: {e}", exc_info=True)
\ No newline at end of file
+
+def _get_session():
+    global _session
+    if _session is None:
+        _session = create_session()
+    return _session
+
+
+def send_analysis_result(result: dict) -> bool:
+    ok, error = post_with_retry(_get_session(), ANALYSIS_RESULT_ENDPOINT, result)
+    metrics.inc("results_sent_total", status="sent" if ok else "failed")
+    if ok:
+        sensor_info = result.get("result", {}).get("sensorInfo", {})
+        logger.info("결과 전송 완료: %s/%s/%s", sensor_info.get("sensorType"), sensor_info.get("gatewayId"),
+                    sensor_info.get("sensorId"))
+    else:
+        logger.error("결과 전송 실패: %s", error)
+    return ok
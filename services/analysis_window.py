@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+from config.settings import REQUIRED_DAYS
+
+# 분석 윈도우 기준 (이력 저장소, 롤링 윈도우, 일괄 예측, 점수 조회 서버 공통)
+# - 센서마다 결측값(min/max/avg_diff)이 없는 행 중 날짜가 가장 최근인 days개
+# - 센서 타입 전체의 최근 날짜가 아니라 센서 자신의 최근 행 기준이므로,
+#   수집이 비거나 멈춘 센서도 남은 행으로 분석됩니다.
+VALUE_COLUMNS = ["min_diff", "max_diff", "avg_diff"]
+
+
+def sensor_keys(df: pd.DataFrame) -> list:
+    keys = ["gateway_id", "sensor_id"]
+    return ["sensor_type"] + keys if "sensor_type" in df.columns else keys
+
+
+def recent_window(df: pd.DataFrame, days: int = REQUIRED_DAYS) -> pd.DataFrame:
+    """센서별 분석 윈도우 행을 (센서, 날짜) 순으로 반환합니다."""
+    keys = sensor_keys(df)
+    df = df.dropna(subset=VALUE_COLUMNS).sort_values(by=keys + ["date"], kind="mergesort")
+    return df[df.groupby(keys, observed=True, sort=False).cumcount(ascending=False) < days].reset_index(drop=True)
+
+
+def last_values(days: np.ndarray, values: np.ndarray, counts: np.ndarray, n: int) -> tuple:
+    """
+    날짜 순으로 앞에서부터 채워진 윈도우 배열((센서, size), (센서, size, 3), (센서,))에서
+    센서별 최근 n개만 앞으로 당겨 남깁니다. (recent_window와 같은 기준, 빈 칸은 -1/NaN)
+    """
+    size = days.shape[1]
+    keep = np.minimum(counts, n)
+    index = np.minimum((counts - keep)[:, None] + np.arange(size)[None, :], size - 1)
+    days = np.take_along_axis(days, index, axis=1)
+    values = np.take_along_axis(values, index[:, :, None], axis=1)
+    empty = np.arange(size)[None, :] >= keep[:, None]
+    days[empty] = -1
+    values[empty] = np.nan
+    return days, values, keep.astype(np.int32)
@@ -0,0 +1,104 @@
+import os
+import json
+import logging
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from config.settings import BACKFILL_WORKERS, BACKFILL_STATE_PATH
+from services.result_sender import create_session
+from services.rolling_window import flush_rolling_windows
+from services.sensor_service import fetch_threshold_history, save_by_sensor_and_type
+
+logger = logging.getLogger(__name__)
+
+
+def _load_completed(state_path: str) -> set:
+    if not os.path.isfile(state_path):
+        return set()
+    with open(state_path, encoding="utf-8") as f:
+        return set(json.load(f).get("completed", []))
+
+
+def _save_completed(state_path: str, completed: set):
+    os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"completed": sorted(completed)}, f)
+    os.replace(tmp_path, state_path)
+
+
+def backfill(start_date: date, end_date: date, workers: int = BACKFILL_WORKERS,
+             state_path: str = BACKFILL_STATE_PATH, restart: bool = False) -> dict:
+    """
+    start_date ~ end_date(포함) 기간의 임계치 이력을 동시에 수집해 이력 저장소에 저장합니다.
+
+    - 최대 workers개 날짜를 커넥션 풀을 공유하는 세션으로 동시에 요청합니다.
+    - 도착한 날짜부터 바로 저장하고 완료 날짜를 state_path에 기록합니다.
+    - 중단 후 다시 실행하면 완료된 날짜는 건너뜁니다. (restart=True면 처음부터)
+    - 롤링 윈도우는 날짜마다 메모리에만 반영하고 끝날 때 스냅샷을 한 번 저장합니다.
+    """
+    workers = max(1, workers)
+    days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    completed = set() if restart else _load_completed(state_path)
+    todo = [d for d in days if d.isoformat() not in completed]
+    logger.info("백필 시작: %s ~ %s 중 %s일 수집 (완료 %s일 생략)", start_date, end_date, len(todo), len(days) - len(todo))
+
+    summary = {"days": len(days), "skipped": len(days) - len(todo), "fetched": 0, "failed": [], "rows": 0}
+    session = create_session(workers)
+
+    try:
+        _fetch_and_save(todo, workers, session, state_path, completed, summary)
+    finally:
+        flush_rolling_windows()
+
+    logger.info("백필 종료: %s", summary)
+    return summary
+
+
+def _fetch_and_save(todo: list, workers: int, session, state_path: str, completed: set, summary: dict):
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backfill") as pool:
+        todo_iter = iter(todo)
+        in_flight = {}
+
+        def submit_next():
+            day = next(todo_iter, None)
+            if day is not None:
+                future = pool.submit(fetch_threshold_history, datetime.combine(day, datetime.min.time()),
+                                     session=session, raise_on_error=True)
+                in_flight[future] = day
+
+        # 저장보다 수집이 빠르더라도 메모리에 쌓이는 날짜 수를 workers개로 제한
+        for _ in range(workers):
+            submit_next()
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                day = in_flight.pop(future)
+                try:
+                    df = future.result()
+                    appended = save_by_sensor_and_type(df)
+                except Exception as e:
+                    logger.error("백필 실패 (%s): %s", day, e)
+                    summary["failed"].append(day.isoformat())
+                else:
+                    completed.add(day.isoformat())
+                    _save_completed(state_path, completed)
+                    summary["fetched"] += 1
+                    summary["rows"] += len(appended)
+                submit_next()
+
+
+if __name__ == "__main__":
+    import argparse
+    import config.logging_setup  # noqa: F401
+
+    parser = argparse.ArgumentParser(description="임계치 이력 기간 백필")
+    parser.add_argument("start_date", type=date.fromisoformat, help="시작 날짜 (YYYY-MM-DD)")
+    parser.add_argument("end_date", type=date.fromisoformat, help="종료 날짜 (YYYY-MM-DD, 포함)")
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS, help="동시 요청 수")
+    parser.add_argument("--state", default=BACKFILL_STATE_PATH, help="진행 상태 파일")
+    parser.add_argument("--restart", action="store_true", help="진행 상태를 무시하고 처음부터 수집")
+    args = parser.parse_args()
+
+    result = backfill(args.start_date, args.end_date, args.workers, args.state, args.restart)
+    raise SystemExit(1 if result["failed"] else 0)
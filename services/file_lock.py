@@ -0,0 +1,85 @@
+import os
+import json
+import time
+import fcntl
+import socket
+import logging
+from datetime import datetime
+from config.settings import LOCK_DIR
+
+logger = logging.getLogger(__name__)
+
+
+class FileLock:
+    """
+    flock 기반 프로세스 간 잠금.
+
+    - 같은 파일을 여는 모든 프로세스(컨테이너가 볼륨을 공유하면 컨테이너 간도)에서 배타적으로 동작합니다.
+    - 프로세스가 죽으면 커널이 잠금을 풀기 때문에 오래된 잠금 파일을 따로 정리할 필요가 없습니다.
+    - 잠금 파일에는 보유자 정보(pid, 호스트, 시작 시각)를 남겨 로그에 표시합니다.
+
+        lock = FileLock("data/locks/pipeline.lock")
+        if lock.acquire():
+            try: ...
+            finally: lock.release()
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    @property
+    def locked(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self, blocking: bool = False, timeout: float = None) -> bool:
+        if self._fd is not None:
+            raise RuntimeError(f"이미 보유 중인 잠금입니다: {self.path}")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                    os.close(fd)
+                    return False
+                time.sleep(0.2)
+
+        holder = {"pid": os.getpid(), "host": socket.gethostname(), "since": datetime.now().isoformat()}
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, json.dumps(holder).encode(), 0)
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        try:
+            os.ftruncate(fd, 0)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def holder(self) -> dict:
+        """현재 보유자 정보 (없거나 읽을 수 없으면 빈 dict)"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.loads(f.read() or "{}")
+        except (OSError, ValueError):
+            return {}
+
+    def __enter__(self):
+        self.acquire(blocking=True)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+def job_lock(name: str, lock_dir: str = LOCK_DIR) -> FileLock:
+    """작업 이름별 잠금 (<LOCK_DIR>/<name>.lock)"""
+    return FileLock(os.path.join(lock_dir, f"{name}.lock"))
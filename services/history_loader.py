@@ -0,0 +1,150 @@
+import os
+import pickle
+import logging
+import tempfile
+import numpy as np
+import pandas as pd
+from config.settings import LOADER_CHUNK_ROWS, LOADER_ROW_BUDGET
+
+logger = logging.getLogger(__name__)
+
+ID_COLUMNS = ["gateway_id", "sensor_id", "sensor_type"]
+METRIC_COLUMNS = ["min_diff", "max_diff", "avg_diff"]
+SENSOR_KEYS = ["gateway_id", "sensor_id"]
+
+# 읽을 때 고정하는 스키마
+# - id: 문자열로 읽은 뒤 category (센서 수만큼만 문자열을 보관)
+# - 지표: float32 (health_score는 학습 라벨이므로 float64 유지)
+# - date: ISO8601 형식으로 한 번에 파싱한 datetime64[ns] (행마다 형식을 추론하지 않음)
+READ_DTYPES = {**{col: str for col in ID_COLUMNS}, **{col: "float32" for col in METRIC_COLUMNS},
+               "health_score": "float64"}
+DATE_FORMAT = "ISO8601"
+
+
+def typed_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """이미 읽은 이력 DataFrame에 스키마를 적용합니다. (없는 컬럼은 건너뜀)"""
+    changes = {}
+    for col in ID_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            changes[col] = df[col].astype(str).astype("category")
+    for col in METRIC_COLUMNS:
+        if col in df.columns and df[col].dtype != "float32":
+            changes[col] = df[col].astype("float32")
+    if "date" in df.columns and not pd.api.types.is_datetime64_dtype(df["date"]):
+        changes["date"] = pd.to_datetime(df["date"], format=DATE_FORMAT)
+    return df.assign(**changes) if changes else df
+
+
+def concat_typed(frames: list) -> pd.DataFrame:
+    # 청크마다 category 목록이 달라 concat하면 object가 되므로 합친 뒤 다시 category로 맞춤
+    return typed_frame(pd.concat(frames, ignore_index=True))
+
+
+def read_history_csv(path: str, usecols: list = None, chunksize: int = None):
+    """
+    이력 CSV를 스키마대로 읽습니다.
+    chunksize를 주면 스키마가 적용된 DataFrame 청크 iterator를 반환합니다.
+    """
+    dtype = {col: kind for col, kind in READ_DTYPES.items() if usecols is None or col in usecols}
+    reader = pd.read_csv(path, usecols=usecols, dtype=dtype, chunksize=chunksize)
+    if chunksize is None:
+        return typed_frame(reader)
+    return (typed_frame(chunk) for chunk in reader)
+
+
+def sensor_row_counts(chunks) -> pd.Series:
+    """청크 iterator에서 (gateway_id, sensor_id)별 행 수를 셉니다. (1차 패스, id 컬럼만 사용)"""
+    counts = None
+    for chunk in chunks:
+        part = chunk.groupby(SENSOR_KEYS, observed=True).size()
+        counts = part if counts is None else counts.add(part, fill_value=0)
+    if counts is None:
+        return pd.Series(dtype="int64")
+    return counts.astype("int64")
+
+
+def plan_batches(counts: pd.Series, row_budget: int = LOADER_ROW_BUDGET) -> list:
+    """
+    센서를 행 수 합이 row_budget 이하인 묶음으로 나눕니다.
+    한 센서가 row_budget보다 크면 그 센서만으로 한 묶음이 됩니다. 센서는 여러 묶음에 나뉘지 않습니다.
+    """
+    batches, current, rows = [], [], 0
+    for key, n in counts.items():
+        if current and rows + n > row_budget:
+            batches.append(current)
+            current, rows = [], 0
+        current.append((str(key[0]), str(key[1])))
+        rows += n
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _spill(path: str, frame: pd.DataFrame):
+    # 같은 파일에 청크를 이어서 pickle로 덧붙임 (스키마/category가 그대로 유지됨)
+    with open(path, "ab") as f:
+        pickle.dump(frame, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_spill(path: str) -> list:
+    frames = []
+    with open(path, "rb") as f:
+        while True:
+            try:
+                frames.append(pickle.load(f))
+            except EOFError:
+                return frames
+
+
+def iter_sensor_batches(read_chunks, counts: pd.Series = None, row_budget: int = LOADER_ROW_BUDGET):
+    """
+    센서 단위로 완결된 DataFrame 묶음을 차례로 반환합니다.
+
+    read_chunks()는 스키마가 적용된 청크 iterator를 매번 새로 반환해야 합니다.
+    1차 패스(counts를 주지 않은 경우)로 센서별 행 수를 세고, 2차 패스에서 청크를 한 번만 읽으며
+    행을 묶음별 임시 파일(spill)로 나눈 뒤 묶음마다 그 파일만 읽습니다.
+    최대 메모리 사용량은 전체 파일이 아니라 max(row_budget, 가장 큰 센서 하나)에 비례합니다.
+    counts에 없는 센서의 행(센서별 행 수를 센 뒤 추가된 행)은 건너뜁니다.
+    """
+    if counts is None:
+        counts = sensor_row_counts(read_chunks())
+    batches = plan_batches(counts, row_budget)
+    if not batches:
+        return
+    if len(batches) == 1:
+        frames = list(read_chunks())
+        if frames:
+            yield concat_typed(frames)
+        return
+
+    logger.info("센서 %s개를 %s개 묶음으로 나눠 읽습니다. (묶음당 최대 %s행)", len(counts), len(batches), row_budget)
+    keys = pd.MultiIndex.from_tuples([key for batch in batches for key in batch], names=SENSOR_KEYS)
+    batch_of_key = np.repeat(np.arange(len(batches)), [len(batch) for batch in batches])
+
+    with tempfile.TemporaryDirectory(prefix="sensor-batches-") as spill_dir:
+        paths = [os.path.join(spill_dir, f"batch-{i}.pkl") for i in range(len(batches))]
+        for chunk in read_chunks():
+            positions = keys.get_indexer(pd.MultiIndex.from_frame(chunk[SENSOR_KEYS].astype(str)))
+            batch_ids = np.where(positions >= 0, batch_of_key[positions], -1)
+            for batch_id in np.unique(batch_ids[batch_ids >= 0]):
+                _spill(paths[batch_id], chunk[batch_ids == batch_id])
+
+        for path in paths:
+            if not os.path.isfile(path):
+                continue
+            frames = _read_spill(path)
+            os.remove(path)
+            yield concat_typed(frames)
+
+
+def iter_sensor_groups(read_chunks, counts: pd.Series = None, row_budget: int = LOADER_ROW_BUDGET):
+    """((gateway_id, sensor_id), 센서 DataFrame)을 차례로 반환합니다."""
+    for batch in iter_sensor_batches(read_chunks, counts, row_budget):
+        for (gateway_id, sensor_id), group in batch.groupby(SENSOR_KEYS, observed=True):
+            yield (str(gateway_id), str(sensor_id)), group
+
+
+def iter_csv_batches(path: str, row_budget: int = LOADER_ROW_BUDGET, chunk_rows: int = LOADER_CHUNK_ROWS):
+    """이력 CSV 파일 하나를 센서 단위 묶음으로 읽습니다."""
+    counts = sensor_row_counts(read_history_csv(path, usecols=SENSOR_KEYS, chunksize=chunk_rows))
+    return iter_sensor_batches(lambda: read_history_csv(path, chunksize=chunk_rows), counts, row_budget)
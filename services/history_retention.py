@@ -0,0 +1,186 @@
+import os
+import glob
+import time
+import shutil
+import logging
+from datetime import datetime, timedelta
+import pandas as pd
+from config.metrics import metrics
+from config.settings import (
+    REQUIRED_DAYS, HISTORY_HOT_DAYS, HISTORY_ARCHIVE_DIR, HISTORY_ARCHIVE_FREQ, HISTORY_ORPHAN_DAYS,
+)
+from services.history_store import DATA_DIR, KEY_COLUMNS, PartitionedHistoryStore, get_history_store
+
+ARCHIVE_COLUMNS = ["gateway_id", "sensor_id", "sensor_type", "date", "min_diff", "max_diff", "avg_diff", "days"]
+STALE_TMP_SECONDS = 3600
+
+logger = logging.getLogger(__name__)
+
+
+def downsample(df: pd.DataFrame, freq: str = HISTORY_ARCHIVE_FREQ) -> pd.DataFrame:
+    """
+    센서별로 freq 단위(D/W/M) 구간의 요약 행을 만듭니다.
+    min_diff는 최솟값, max_diff는 최댓값, avg_diff는 평균, days는 요약한 일수이며 date는 구간 시작일입니다.
+    """
+    period = pd.to_datetime(df["date"]).dt.to_period(freq).dt.start_time.rename("date")
+    grouped = df.groupby([df["gateway_id"], df["sensor_id"], df["sensor_type"], period], observed=True)
+    summary = grouped.agg(min_diff=("min_diff", "min"), max_diff=("max_diff", "max"),
+                          avg_diff=("avg_diff", "mean"), days=("avg_diff", "size"))
+    return summary.reset_index()[ARCHIVE_COLUMNS]
+
+
+def _write_archive(df: pd.DataFrame, sensor_type: str, prefix: str = "part",
+                   archive_dir: str = HISTORY_ARCHIVE_DIR) -> int:
+    """
+    오래된 원본 행을 요약해 <archive_dir>/<sensor_type>/<YYYY-MM>/<prefix>-<첫날>_<마지막날>.csv.gz로 씁니다.
+    파일 이름이 원본 일자 범위로 정해지므로 중단 후 다시 실행하면 같은 파일을 덮어씁니다.
+    """
+    if df.empty:
+        return 0
+    dates = pd.to_datetime(df["date"])
+    written = 0
+    for month, month_df in df.groupby(dates.dt.strftime("%Y-%m")):
+        month_dates = pd.to_datetime(month_df["date"])
+        name = f"{prefix}-{month_dates.min():%Y-%m-%d}_{month_dates.max():%Y-%m-%d}.csv.gz"
+        month_dir = os.path.join(archive_dir, sensor_type, month)
+        os.makedirs(month_dir, exist_ok=True)
+        path = os.path.join(month_dir, name)
+        summary = downsample(month_df)
+        summary.to_csv(path + ".tmp", index=False, compression="gzip")
+        os.replace(path + ".tmp", path)
+        written += len(summary)
+    return written
+
+
+def read_archive(sensor_type: str, archive_dir: str = HISTORY_ARCHIVE_DIR) -> pd.DataFrame:
+    """
+    센서 타입의 보관 세그먼트를 모두 읽어 센서·구간별로 다시 합칩니다.
+    (같은 구간이 여러 세그먼트에 나뉘어 있으면 avg_diff는 일수 가중 평균)
+    """
+    paths = sorted(glob.glob(os.path.join(archive_dir, sensor_type, "*", "*.csv.gz")))
+    if not paths:
+        return pd.DataFrame(columns=ARCHIVE_COLUMNS)
+    df = pd.concat([pd.read_csv(path, parse_dates=["date"], dtype={col: str for col in KEY_COLUMNS[:3]})
+                    for path in paths], ignore_index=True)
+    df["weighted"] = df["avg_diff"] * df["days"]
+    grouped = df.groupby(KEY_COLUMNS, observed=True)
+    merged = grouped.agg(min_diff=("min_diff", "min"), max_diff=("max_diff", "max"),
+                         weighted=("weighted", "sum"), days=("days", "sum")).reset_index()
+    merged["avg_diff"] = merged.pop("weighted") / merged["days"]
+    return merged[ARCHIVE_COLUMNS].sort_values(by=["gateway_id", "sensor_id", "date"]).reset_index(drop=True)
+
+
+def compact_partitioned(store: PartitionedHistoryStore, hot_days: int = HISTORY_HOT_DAYS) -> dict:
+    """센서 타입별 최근 hot_days개 일자 파티션만 남기고 나머지는 보관 세그먼트로 옮깁니다."""
+    stats = {"archivedDays": 0, "archivedRows": 0, "removedTmp": 0, "removedDirs": 0}
+    for sensor_type in store.sensor_types():
+        type_dir = os.path.join(store.root, sensor_type)
+        partitions = store._partitions(sensor_type)
+        old_days = partitions[:-hot_days] if len(partitions) > hot_days else []
+        if old_days:
+            df = store._read_partitions(sensor_type, old_days)
+            stats["archivedRows"] += len(df)
+            _write_archive(df, sensor_type)
+            store.drop_partitions(sensor_type, old_days)
+            stats["archivedDays"] += len(old_days)
+            logger.info("이력 보관: %s %s ~ %s (%s건)", sensor_type, old_days[0], old_days[-1], len(df))
+
+        # 중단된 쓰기로 남은 임시 파일과 빈 파티션 정리
+        now = time.time()
+        for day in os.listdir(type_dir):
+            part_dir = os.path.join(type_dir, day)
+            if not os.path.isdir(part_dir):
+                continue
+            for path in glob.glob(os.path.join(part_dir, "*.tmp")):
+                if now - os.path.getmtime(path) > STALE_TMP_SECONDS:
+                    os.remove(path)
+                    stats["removedTmp"] += 1
+            if not os.listdir(part_dir):
+                os.rmdir(part_dir)
+                stats["removedDirs"] += 1
+        if not os.listdir(type_dir):
+            os.rmdir(type_dir)
+            stats["removedDirs"] += 1
+    return stats
+
+
+def compact_legacy(data_dir: str = DATA_DIR, hot_days: int = HISTORY_HOT_DAYS,
+                   orphan_days: int = HISTORY_ORPHAN_DAYS) -> dict:
+    """
+    기존 data/sensors/<sensor_id>/<type>.csv 파일을 정리합니다.
+    - 센서별 최근 hot_days개 행만 남기고 나머지는 보관 세그먼트로 옮깁니다.
+    - orphan_days일 넘게 새 데이터가 없는 파일은 전부 보관한 뒤 삭제하고, 빈 센서 디렉터리를 지웁니다.
+    """
+    stats = {"archivedRows": 0, "orphanFiles": 0, "removedDirs": 0}
+    if not os.path.isdir(data_dir):
+        return stats
+    orphan_before = pd.Timestamp(datetime.now() - timedelta(days=orphan_days))
+
+    for sensor_id in sorted(os.listdir(data_dir)):
+        sensor_dir = os.path.join(data_dir, sensor_id)
+        if not os.path.isdir(sensor_dir):
+            continue
+        for csv_path in glob.glob(os.path.join(sensor_dir, "*.csv")):
+            sensor_type = os.path.basename(csv_path)[:-len(".csv")]
+            df = pd.read_csv(csv_path, parse_dates=["date"], dtype={col: str for col in KEY_COLUMNS[:3]})
+            if df.empty or df["date"].max() < orphan_before:
+                _write_archive(df, sensor_type, prefix=f"legacy-{sensor_id}")
+                os.remove(csv_path)
+                stats["archivedRows"] += len(df)
+                stats["orphanFiles"] += 1
+                continue
+
+            df = df.sort_values(by="date")
+            hot = df.groupby(["gateway_id", "sensor_id"]).tail(hot_days)
+            if len(hot) == len(df):
+                continue
+            old = df.drop(index=hot.index)
+            _write_archive(old, sensor_type, prefix=f"legacy-{sensor_id}")
+            hot.to_csv(csv_path + ".tmp", index=False)
+            os.replace(csv_path + ".tmp", csv_path)
+            stats["archivedRows"] += len(old)
+
+        if not os.listdir(sensor_dir):
+            shutil.rmtree(sensor_dir, ignore_errors=True)
+            stats["removedDirs"] += 1
+    return stats
+
+
+def compact_history(hot_days: int = HISTORY_HOT_DAYS) -> dict:
+    """
+    이력 보관 정책을 한 번 적용합니다.
+    수집(save_by_sensor_and_type)과 같은 'history' 잠금 안에서 호출해야 합니다. (scheduler.analyze_schedule.job_compact)
+    """
+    if hot_days <= 0:
+        logger.info("이력 보관 정책 사용 안 함 (HISTORY_HOT_DAYS=0)")
+        return {}
+    if hot_days < REQUIRED_DAYS:
+        logger.warning("HISTORY_HOT_DAYS(%s)가 분석 윈도우보다 짧아 %s일로 유지합니다.", hot_days, REQUIRED_DAYS)
+        hot_days = REQUIRED_DAYS
+
+    started = time.perf_counter()
+    stats = {}
+    store = get_history_store()
+    if isinstance(store, PartitionedHistoryStore):
+        stats["partitioned"] = compact_partitioned(store, hot_days)
+    # 분할 저장소로 전환한 뒤에도 남아 있는 기존 csv 저장소도 함께 정리
+    stats["legacy"] = compact_legacy(hot_days=hot_days)
+
+    archived = sum(part.get("archivedRows", 0) for part in stats.values())
+    metrics.inc("history_rows_archived_total", archived)
+    metrics.observe("stage_seconds", time.perf_counter() - started, stage="compact")
+    logger.info("🧹 이력 정리 완료: %s", stats)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+    import config.logging_setup  # noqa: F401
+    from services.file_lock import job_lock
+
+    parser = argparse.ArgumentParser(description="센서 이력 보관 정책 적용 (오래된 행 요약 보관, 고아 파일 정리)")
+    parser.add_argument("--hot-days", type=int, default=HISTORY_HOT_DAYS)
+    args = parser.parse_args()
+
+    with job_lock("history"):
+        compact_history(args.hot_days)
@@ -0,0 +1,404 @@
+import os
+import abc
+import glob
+import shutil
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+import pandas as pd
+from config.settings import REQUIRED_DAYS, HISTORY_STORE, HISTORY_DIR, HISTORY_SEGMENT_FORMAT, LOADER_ROW_BUDGET
+from services.analysis_window import VALUE_COLUMNS, recent_window
+from services.history_loader import concat_typed, iter_sensor_batches, read_history_csv, typed_frame
+
+DATA_DIR = "data/sensors"  # 센서별 폴더 구조 기준 경로 (csv 저장소)
+INDEX_FILE = "_index.sqlite3"
+
+# 중복 판단 기준 컬럼
+KEY_COLUMNS = ["gateway_id", "sensor_id", "sensor_type", "date"]
+ID_COLUMNS = ["gateway_id", "sensor_id", "sensor_type"]
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryStore(abc.ABC):
+    """
+    센서 이력 저장소 공통 인터페이스.
+    수집(append)과 조회(read_recent / read_all)만 노출하며 저장 형식은 구현체가 결정합니다.
+    추상 메서드를 모두 구현하지 않은 저장소는 생성 시점에 TypeError가 납니다.
+    """
+
+    @abc.abstractmethod
+    def append(self, df: pd.DataFrame) -> pd.DataFrame:
+        """신규 행만 저장하고 실제로 저장된 행을 반환합니다."""
+
+    @abc.abstractmethod
+    def sensor_types(self) -> list:
+        """저장된 센서 타입 목록을 반환합니다."""
+
+    @abc.abstractmethod
+    def read_recent(self, sensor_type: str, days: int = REQUIRED_DAYS,
+                    gateway_id: str = None, sensor_id: str = None) -> pd.DataFrame:
+        """
+        센서 타입(또는 특정 센서)의 분석 윈도우를 반환합니다.
+        센서마다 결측 없는 최근 days개 행입니다. (services.analysis_window.recent_window)
+        """
+
+    @abc.abstractmethod
+    def read_all(self, sensor_type: str) -> pd.DataFrame:
+        """센서 타입의 전체 이력을 반환합니다."""
+
+    def iter_sensor_batches(self, sensor_type: str, row_budget: int = LOADER_ROW_BUDGET):
+        """
+        센서 타입의 전체 이력을 센서 단위로 완결된 묶음(행 수 row_budget 이하)으로 차례로 반환합니다.
+        기본 구현은 read_all 결과를 한 묶음으로 반환합니다.
+        """
+        df = self.read_all(sensor_type)
+        if not df.empty:
+            yield df
+
+
+def _empty_frame() -> pd.DataFrame:
+    return pd.DataFrame(columns=KEY_COLUMNS[:3] + ["min_diff", "max_diff", "avg_diff", "date"])
+
+
+def _filter_sensor(df: pd.DataFrame, gateway_id: str = None, sensor_id: str = None) -> pd.DataFrame:
+    if gateway_id is not None:
+        df = df[df["gateway_id"] == gateway_id]
+    if sensor_id is not None:
+        df = df[df["sensor_id"] == sensor_id]
+    return df
+
+
+class CsvHistoryStore(HistoryStore):
+    """
+    기존 방식의 저장소: data/sensors/<sensor_id>/<type>.csv
+    파일 전체를 읽어 병합 후 다시 쓰므로 이력이 길어질수록 느려집니다.
+    """
+
+    def __init__(self, data_dir: str = DATA_DIR):
+        self.data_dir = data_dir
+
+    def append(self, df: pd.DataFrame) -> pd.DataFrame:
+        appended = []
+        for sensor_id, sensor_df in df.groupby("sensor_id", observed=True):
+            sensor_dir = os.path.join(self.data_dir, str(sensor_id))
+            os.makedirs(sensor_dir, exist_ok=True)
+
+            for sensor_type, group_df in sensor_df.groupby("sensor_type", observed=True):
+                csv_path = os.path.join(sensor_dir, f"{sensor_type}.csv")
+                group_df = group_df.assign(_new=True)
+
+                if os.path.exists(csv_path):
+                    existing_df = pd.read_csv(csv_path, parse_dates=["date"]).assign(_new=False)
+                    combined_df = pd.concat([existing_df, group_df], ignore_index=True)
+                    # 중복 제거: gateway_id, sensor_id, sensor_type, date 기준
+                    combined_df.drop_duplicates(subset=KEY_COLUMNS, inplace=True)
+                else:
+                    combined_df = group_df
+
+                combined_df = combined_df.sort_values(by=["date"])
+                appended.append(combined_df[combined_df["_new"]].drop(columns="_new"))
+                combined_df.drop(columns="_new").to_csv(csv_path, index=False)
+
+        return pd.concat(appended, ignore_index=True) if appended else _empty_frame()
+
+    def sensor_types(self) -> list:
+        files = glob.glob(os.path.join(self.data_dir, "*", "*.csv"))
+        return sorted({os.path.basename(f)[:-len(".csv")] for f in files})
+
+    def _load(self, sensor_type: str, sensor_id: str = None) -> pd.DataFrame:
+        pattern = os.path.join(self.data_dir, sensor_id or "*", f"{sensor_type}.csv")
+        frames = [read_history_csv(f) for f in glob.glob(pattern)]
+        return concat_typed(frames) if frames else _empty_frame()
+
+    def read_recent(self, sensor_type: str, days: int = REQUIRED_DAYS,
+                    gateway_id: str = None, sensor_id: str = None) -> pd.DataFrame:
+        df = _filter_sensor(self._load(sensor_type, sensor_id), gateway_id, sensor_id)
+        return recent_window(df, days)
+
+    def read_all(self, sensor_type: str) -> pd.DataFrame:
+        return self._load(sensor_type)
+
+
+class PartitionedHistoryStore(HistoryStore):
+    """
+    센서타입/일자 단위로 분할된 append-only 저장소.
+
+        <root>/<sensor_type>/<YYYY-MM-DD>/part-<seq>.<csv|parquet>
+        <root>/_index.sqlite3  (gateway_id, sensor_id, sensor_type, date 중복 판단용 인덱스)
+
+    기존 세그먼트는 다시 쓰지 않으므로 수집 비용은 신규 데이터 양에만 비례합니다.
+    """
+
+    def __init__(self, root: str = HISTORY_DIR, segment_format: str = HISTORY_SEGMENT_FORMAT):
+        if segment_format not in ("csv", "parquet"):
+            raise ValueError(f"지원하지 않는 세그먼트 형식: {segment_format}")
+        self.root = root
+        self.segment_format = segment_format
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+        os.makedirs(root, exist_ok=True)
+
+    # ------------------------------------------------------------------ 인덱스
+
+    def _connect(self) -> sqlite3.Connection:
+        # 프로세스 fork 이후에는 연결을 새로 엽니다.
+        if self._conn is None or self._conn_pid != os.getpid():
+            conn = sqlite3.connect(os.path.join(self.root, INDEX_FILE), timeout=60,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rows ("
+                " sensor_type TEXT NOT NULL, gateway_id TEXT NOT NULL,"
+                " sensor_id TEXT NOT NULL, date TEXT NOT NULL,"
+                " PRIMARY KEY (sensor_type, gateway_id, sensor_id, date)) WITHOUT ROWID"
+            )
+            # 보관 세그먼트로 옮긴 기간: until 이전 날짜는 다시 저장하지 않음
+            conn.execute("CREATE TABLE IF NOT EXISTS archived (sensor_type TEXT PRIMARY KEY, until TEXT NOT NULL)")
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._connect().execute("SELECT 1 FROM rows LIMIT 1").fetchone() is None
+
+    # ------------------------------------------------------------------ 쓰기
+
+    def append(self, df: pd.DataFrame) -> pd.DataFrame:
+        if df.empty:
+            return _empty_frame()
+
+        df = df.copy()
+        df["date"] = pd.to_datetime(df["date"])
+        invalid = df[KEY_COLUMNS].isnull().any(axis=1)
+        if invalid.any():
+            logger.warning("키 누락으로 저장 제외: %s건", int(invalid.sum()))
+            df = df[~invalid]
+        for col in ID_COLUMNS:
+            df[col] = df[col].astype(str)
+
+        df = df.drop_duplicates(subset=KEY_COLUMNS).reset_index(drop=True)
+        date_keys = df["date"].dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+        keys = list(zip(range(len(df)), df["sensor_type"], df["gateway_id"], df["sensor_id"], date_keys))
+
+        with self._lock:
+            conn = self._connect()
+            # 쓰기 잠금을 먼저 잡아 중복 확인과 인덱스 기록을 하나의 트랜잭션으로 처리
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS incoming ("
+                    " pos INTEGER PRIMARY KEY, sensor_type TEXT, gateway_id TEXT, sensor_id TEXT, date TEXT)"
+                )
+                conn.execute("DELETE FROM incoming")
+                conn.executemany("INSERT INTO incoming VALUES (?, ?, ?, ?, ?)", keys)
+                existing = {pos for (pos,) in conn.execute(
+                    "SELECT i.pos FROM incoming i JOIN rows r"
+                    " ON r.sensor_type = i.sensor_type AND r.gateway_id = i.gateway_id"
+                    " AND r.sensor_id = i.sensor_id AND r.date = i.date"
+                )}
+                expired = {pos for (pos,) in conn.execute(
+                    "SELECT i.pos FROM incoming i JOIN archived a"
+                    " ON a.sensor_type = i.sensor_type AND i.date < a.until"
+                )}
+                if expired:
+                    logger.warning("보관 기간이 지난 행 저장 제외: %s건", len(expired))
+                    existing |= expired
+
+                new_mask = ~df.index.isin(list(existing))
+                new_df = df[new_mask]
+                if new_df.empty:
+                    conn.execute("ROLLBACK")
+                    return _empty_frame()
+
+                self._write_segments(new_df, date_keys[new_mask].str[:10])
+                conn.executemany(
+                    "INSERT OR IGNORE INTO rows (sensor_type, gateway_id, sensor_id, date) VALUES (?, ?, ?, ?)",
+                    [key[1:] for key in keys if key[0] not in existing]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        logger.info("이력 저장 완료: 신규 %s건 / 요청 %s건", len(new_df), len(df))
+        return new_df.reset_index(drop=True)
+
+    def _write_segments(self, df: pd.DataFrame, days: pd.Series):
+        for (sensor_type, day), part_df in df.groupby([df["sensor_type"], days]):
+            part_dir = os.path.join(self.root, sensor_type, day)
+            os.makedirs(part_dir, exist_ok=True)
+            part_df = part_df.sort_values(by=["gateway_id", "sensor_id", "date"])
+            name = f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.{self.segment_format}"
+            path = os.path.join(part_dir, name)
+            tmp_path = path + ".tmp"
+            if self.segment_format == "parquet":
+                part_df.to_parquet(tmp_path, index=False)
+            else:
+                part_df.to_csv(tmp_path, index=False)
+            # 완성된 세그먼트만 보이도록 rename으로 공개
+            os.replace(tmp_path, path)
+
+    def drop_partitions(self, sensor_type: str, days: list):
+        """
+        보관 세그먼트로 옮긴 일자 파티션을 지웁니다.
+        인덱스 행을 먼저 지우고 보관 기준일을 기록한 뒤 디렉터리를 삭제합니다.
+        """
+        if not days:
+            return
+        until = max(days) + "~"  # 해당 일자의 모든 시각보다 큰 값
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM rows WHERE sensor_type = ? AND date < ?", (sensor_type, until))
+                conn.execute(
+                    "INSERT INTO archived (sensor_type, until) VALUES (?, ?)"
+                    " ON CONFLICT(sensor_type) DO UPDATE SET until = max(until, excluded.until)",
+                    (sensor_type, until)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        for day in days:
+            shutil.rmtree(os.path.join(self.root, sensor_type, day), ignore_errors=True)
+
+    # ------------------------------------------------------------------ 읽기
+
+    def sensor_types(self) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, name))
+        )
+
+    def _partitions(self, sensor_type: str) -> list:
+        type_dir = os.path.join(self.root, sensor_type)
+        if not os.path.isdir(type_dir):
+            return []
+        return sorted(day for day in os.listdir(type_dir) if len(day) == 10)
+
+    def _read_segment(self, path: str) -> pd.DataFrame:
+        if path.endswith(".parquet"):
+            return typed_frame(pd.read_parquet(path))
+        return read_history_csv(path)
+
+    def _iter_segments(self, sensor_type: str, days: list):
+        for day in days:
+            part_dir = os.path.join(self.root, sensor_type, day)
+            try:
+                for name in sorted(os.listdir(part_dir)):
+                    if name.startswith("part-") and not name.endswith(".tmp"):
+                        yield self._read_segment(os.path.join(part_dir, name))
+            except FileNotFoundError:
+                # 없는 파티션이거나 읽는 도중 이력 정리(compaction)로 삭제된 파티션
+                continue
+
+    def _read_partitions(self, sensor_type: str, days: list) -> pd.DataFrame:
+        frames = list(self._iter_segments(sensor_type, days))
+        if not frames:
+            return _empty_frame()
+        df = concat_typed(frames)
+        # 인덱스 기록 전에 중단된 쓰기로 생긴 중복은 읽을 때 제거 (먼저 쓰인 행 우선)
+        df = df.drop_duplicates(subset=KEY_COLUMNS)
+        return df.sort_values(by="date").reset_index(drop=True)
+
+    def _recent_days(self, sensor_type: str, limit: int, gateway_id: str = None, sensor_id: str = None) -> list:
+        """센서마다 최근 limit개 행이 있는 일자(파티션)의 합집합을 인덱스에서 구합니다."""
+        query = ("SELECT DISTINCT substr(date, 1, 10) FROM ("
+                 " SELECT date, ROW_NUMBER() OVER (PARTITION BY gateway_id, sensor_id ORDER BY date DESC) AS rn"
+                 " FROM rows WHERE sensor_type = ?")
+        params = [sensor_type]
+        if gateway_id is not None:
+            query += " AND gateway_id = ?"
+            params.append(gateway_id)
+        if sensor_id is not None:
+            query += " AND sensor_id = ?"
+            params.append(sensor_id)
+        query += ") WHERE rn <= ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._connect().execute(query, params).fetchall()
+        return sorted(day for (day,) in rows)
+
+    def read_recent(self, sensor_type: str, days: int = REQUIRED_DAYS,
+                    gateway_id: str = None, sensor_id: str = None) -> pd.DataFrame:
+        # 인덱스에서 센서별 최근 days개 행의 일자만 찾아 그 파티션만 읽음
+        read = set(self._recent_days(sensor_type, days, gateway_id, sensor_id))
+        df = _filter_sensor(self._read_partitions(sensor_type, sorted(read)), gateway_id, sensor_id)
+
+        # 결측 행은 윈도우에서 빠지므로, 결측이 있는 센서는 결측 수만큼 이전 행까지 더 읽음
+        frames = [df]
+        missing = df[df[VALUE_COLUMNS].isnull().any(axis=1)]
+        for (gw, sid), n_missing in missing.groupby(["gateway_id", "sensor_id"], observed=True).size().items():
+            gw, sid, have = str(gw), str(sid), set(read)
+            while True:
+                more_days = sorted(set(self._recent_days(sensor_type, days + n_missing, gw, sid)) - have)
+                if not more_days:
+                    break
+                more = _filter_sensor(self._read_partitions(sensor_type, more_days), gw, sid)
+                have.update(more_days)
+                frames.append(more)
+                n_missing += int(more[VALUE_COLUMNS].isnull().any(axis=1).sum())
+        if len(frames) > 1:
+            df = concat_typed(frames)
+        return recent_window(df, days)
+
+    def read_all(self, sensor_type: str) -> pd.DataFrame:
+        return self._read_partitions(sensor_type, self._partitions(sensor_type))
+
+    def iter_sensor_batches(self, sensor_type: str, row_budget: int = LOADER_ROW_BUDGET):
+        """
+        센서별 행 수는 인덱스에서 구하고(1차 패스 없음), 세그먼트는 한 번만 읽어 묶음별로 나눕니다.
+        """
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT gateway_id, sensor_id, COUNT(*) FROM rows WHERE sensor_type = ?"
+                " GROUP BY gateway_id, sensor_id",
+                (sensor_type,)
+            ).fetchall()
+        if not rows:
+            return
+        counts = pd.Series([n for _, _, n in rows],
+                           index=pd.MultiIndex.from_tuples([(gw, sid) for gw, sid, _ in rows]))
+        partitions = self._partitions(sensor_type)
+        for batch in iter_sensor_batches(lambda: self._iter_segments(sensor_type, partitions), counts, row_budget):
+            # 인덱스 기록 전에 중단된 쓰기로 생긴 중복 제거 (read_all과 같은 기준)
+            yield batch.drop_duplicates(subset=KEY_COLUMNS).sort_values(by="date").reset_index(drop=True)
+
+    def import_legacy(self, data_dir: str = DATA_DIR) -> int:
+        """기존 csv 저장소 데이터를 가져옵니다. 이미 있는 행은 인덱스로 걸러집니다."""
+        legacy = CsvHistoryStore(data_dir)
+        total = 0
+        for sensor_type in legacy.sensor_types():
+            total += len(self.append(legacy.read_all(sensor_type)))
+        logger.info("기존 CSV 이력 가져오기 완료: %s건", total)
+        return total
+
+
+_stores = {}
+
+
+def get_history_store(kind: str = None) -> HistoryStore:
+    """설정(HISTORY_STORE)에 맞는 저장소 인스턴스를 반환합니다."""
+    kind = kind or HISTORY_STORE
+    store = _stores.get(kind)
+    if store is None:
+        if kind == "partitioned":
+            store = PartitionedHistoryStore()
+            # 최초 전환 시 기존 CSV 이력을 한 번 가져옴
+            if store.is_empty() and os.path.isdir(DATA_DIR):
+                store.import_legacy(DATA_DIR)
+        elif kind == "csv":
+            store = CsvHistoryStore()
+        else:
+            raise ValueError(f"알 수 없는 이력 저장소: {kind}")
+        _stores[kind] = store
+    return store
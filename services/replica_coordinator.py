@@ -0,0 +1,361 @@
+import os
+import time
+import uuid
+import bisect
+import socket
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from config.metrics import metrics
+from config.settings import (
+    REPLICA_ID, REPLICA_STORE_PATH, REPLICA_LEASE_SECONDS, REPLICA_HEARTBEAT_SECONDS,
+    REPLICA_INGEST_WAIT_SECONDS, REPLICA_VNODES,
+)
+
+logger = logging.getLogger(__name__)
+
+INGEST_LEASE = "ingest"
+DONE_RETENTION_DAYS = 7
+
+
+def sensor_key(sensor_type: str, gateway_id: str, sensor_id: str) -> str:
+    """services.result_outbox.result_key와 같은 형식: sensor_type/gateway_id/sensor_id"""
+    return f"{sensor_type}/{gateway_id}/{sensor_id}"
+
+
+def _result_key(result: dict) -> str:
+    info = result["result"]["sensorInfo"]
+    return sensor_key(info["sensorType"], info["gatewayId"], info["sensorId"])
+
+
+def _hash(value: str) -> int:
+    # 프로세스/호스트가 달라도 같은 값이 나오도록 내장 hash 대신 md5 사용
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """복제본 ID로 만든 consistent hash 링. 복제본이 빠지면 그 복제본의 센서만 다른 복제본으로 옮겨갑니다."""
+
+    __slots__ = ("replicas", "_points", "_owners")
+
+    def __init__(self, replicas: list, vnodes: int = REPLICA_VNODES):
+        self.replicas = sorted(replicas)
+        points = sorted((_hash(f"{replica}#{i}"), replica) for replica in self.replicas for i in range(vnodes))
+        self._points = [point for point, _ in points]
+        self._owners = [replica for _, replica in points]
+
+    def owner(self, gateway_id: str, sensor_id: str) -> str:
+        if not self._points:
+            return None
+        i = bisect.bisect(self._points, _hash(f"{gateway_id}/{sensor_id}")) % len(self._points)
+        return self._owners[i]
+
+
+class Ownership:
+    """
+    워커 프로세스에 넘기는 이번 실행의 분담 정보 (pickle 가능).
+    mask()는 이 복제본이 맡은 센서 중 오늘 밤 아직 다른 복제본이 처리하지 않은 센서만 True입니다.
+    """
+
+    def __init__(self, ring: HashRing, replica_id: str, night: str, store_path: str, lease_seconds: float):
+        self.ring = ring
+        self.replica_id = replica_id
+        self.night = night
+        self.store_path = store_path
+        self.lease_seconds = lease_seconds
+
+    def mask(self, sensor_type: str, gateway_ids, sensor_ids) -> list:
+        coordinator = ReplicaCoordinator(self.replica_id, self.store_path, lease_seconds=self.lease_seconds)
+        taken = coordinator.taken_keys(self.night, sensor_type)
+        return [
+            self.ring.owner(gateway_id, sensor_id) == self.replica_id
+            and sensor_key(sensor_type, gateway_id, sensor_id) not in taken
+            for gateway_id, sensor_id in zip(gateway_ids, sensor_ids)
+        ]
+
+
+class ReplicaCoordinator:
+    """
+    여러 복제본(같은 볼륨을 쓰는 프로세스/컨테이너)의 분할 실행을 SQLite 하나로 조율합니다.
+
+    - replicas: 복제본별 heartbeat. REPLICA_LEASE_SECONDS 안에 갱신한 복제본만 살아 있는 것으로 봅니다.
+    - leases:   이름별 리스(수집 리더 등). 보유자가 heartbeat마다 연장하고, 죽으면 만료 후 다른 복제본이 가져감
+    - claims:   밤(night)별 센서 처리 기록. 전송 전에 claim하고 전송 성공 시 done으로 표시합니다.
+                살아 있는 복제본이 claim한 센서는 다른 복제본이 가져가지 않고,
+                죽은 복제본이 claim만 하고 끝내지 못한 센서는 다음 점검(job_check) 때 새 담당자가 가져갑니다.
+    - marks:    밤별 수집 완료 표시 (팔로워는 이 표시를 기다렸다가 분석 시작)
+    """
+
+    def __init__(self, replica_id: str = REPLICA_ID, path: str = REPLICA_STORE_PATH,
+                 lease_seconds: float = REPLICA_LEASE_SECONDS, heartbeat_seconds: float = REPLICA_HEARTBEAT_SECONDS):
+        self.replica_id = replica_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None or self._conn_pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS replicas ("
+                " replica_id TEXT PRIMARY KEY, heartbeat REAL NOT NULL, started REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS leases ("
+                " name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS claims ("
+                " night TEXT NOT NULL, sensor_key TEXT NOT NULL, holder TEXT NOT NULL, token TEXT NOT NULL,"
+                " done INTEGER NOT NULL DEFAULT 0, updated REAL NOT NULL,"
+                " PRIMARY KEY (night, sensor_key)) WITHOUT ROWID;"
+                "CREATE TABLE IF NOT EXISTS marks ("
+                " name TEXT PRIMARY KEY, value TEXT, at REAL NOT NULL);"
+            )
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _write(self, fn):
+        # 쓰기 잠금을 먼저 잡아 확인과 갱신을 하나의 트랜잭션으로 처리
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn)
+                conn.execute("COMMIT")
+                return result
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    # ------------------------------------------------------------------ heartbeat
+
+    def heartbeat(self):
+        """heartbeat를 기록하고 보유 중인 리스를 연장합니다."""
+        now = time.time()
+
+        def _beat(conn):
+            conn.execute(
+                "INSERT INTO replicas (replica_id, heartbeat, started) VALUES (?, ?, ?)"
+                " ON CONFLICT(replica_id) DO UPDATE SET heartbeat = excluded.heartbeat",
+                (self.replica_id, now, now)
+            )
+            conn.execute("UPDATE leases SET expires = ? WHERE holder = ?", (now + self.lease_seconds, self.replica_id))
+            # 오래 전에 죽은 복제본 정리
+            conn.execute("DELETE FROM replicas WHERE heartbeat < ?", (now - 10 * self.lease_seconds,))
+
+        self._write(_beat)
+
+    def start(self):
+        """백그라운드 heartbeat를 시작합니다. (이미 시작했으면 무시)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.heartbeat()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-heartbeat", daemon=True)
+        self._thread.start()
+        logger.info("복제본 등록: %s (살아 있는 복제본 %s)", self.replica_id, self.live_replicas())
+
+    def _run(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            try:
+                self.heartbeat()
+            except sqlite3.Error as e:
+                logger.warning("복제본 heartbeat 실패: %s", e)
+
+    def stop(self):
+        """heartbeat를 멈추고 등록과 리스를 해제해 다른 복제본이 바로 넘겨받도록 합니다."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+        def _leave(conn):
+            conn.execute("DELETE FROM replicas WHERE replica_id = ?", (self.replica_id,))
+            conn.execute("DELETE FROM leases WHERE holder = ?", (self.replica_id,))
+
+        self._write(_leave)
+
+    def live_replicas(self) -> list:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT replica_id FROM replicas WHERE heartbeat >= ? ORDER BY replica_id",
+                (time.time() - self.lease_seconds,)
+            ).fetchall()
+        return [replica_id for (replica_id,) in rows]
+
+    def ownership(self, night: str) -> Ownership:
+        """지금 살아 있는 복제본 기준의 분담 정보"""
+        replicas = self.live_replicas()
+        if self.replica_id not in replicas:
+            replicas.append(self.replica_id)
+        return Ownership(HashRing(replicas), self.replica_id, night, self.path, self.lease_seconds)
+
+    # ------------------------------------------------------------------ 리스
+
+    def acquire_lease(self, name: str) -> bool:
+        now = time.time()
+
+        def _acquire(conn):
+            conn.execute(
+                "INSERT INTO leases (name, holder, expires) VALUES (?, ?, ?)"
+                " ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires = excluded.expires"
+                " WHERE leases.holder = excluded.holder OR leases.expires < ?",
+                (name, self.replica_id, now + self.lease_seconds, now)
+            )
+            row = conn.execute("SELECT holder FROM leases WHERE name = ?", (name,)).fetchone()
+            return row is not None and row[0] == self.replica_id
+
+        return self._write(_acquire)
+
+    def release_lease(self, name: str):
+        self._write(lambda conn: conn.execute(
+            "DELETE FROM leases WHERE name = ? AND holder = ?", (name, self.replica_id)))
+
+    def mark(self, name: str, value: str = None):
+        self._write(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO marks (name, value, at) VALUES (?, ?, ?)", (name, value, time.time())))
+
+    def get_mark(self, name: str):
+        """(value,) 또는 None"""
+        with self._lock:
+            return self._connect().execute("SELECT value FROM marks WHERE name = ?", (name,)).fetchone()
+
+    def ingest_once(self, night: str, ingest, wait_seconds: float = REPLICA_INGEST_WAIT_SECONDS, poll: float = 5):
+        """
+        밤마다 한 복제본만 ingest()를 실행합니다. ingest는 수집한 행 수를 반환해야 합니다.
+        리스를 잡지 못한 복제본은 수집 완료 표시를 기다렸다가 그 행 수를 반환하고,
+        리더가 중간에 죽으면 리스가 만료된 뒤 다른 복제본이 이어서 수집합니다. (저장소가 중복 행을 거르므로 안전)
+        시간 안에 수집이 끝나지 않으면 None을 반환합니다.
+        """
+        name = f"ingested:{night}"
+        deadline = time.monotonic() + wait_seconds
+        while True:
+            done = self.get_mark(name)
+            if done is not None:
+                return int(done[0])
+            if self.acquire_lease(INGEST_LEASE):
+                try:
+                    # 확인과 리스 획득 사이에 이전 리더가 끝냈을 수 있으므로 리스를 잡은 뒤 다시 확인
+                    done = self.get_mark(name)
+                    if done is not None:
+                        return int(done[0])
+                    logger.info("수집 리더: %s (%s)", self.replica_id, night)
+                    rows = int(ingest())
+                    self.mark(name, str(rows))
+                    return rows
+                finally:
+                    self.release_lease(INGEST_LEASE)
+            if time.monotonic() >= deadline:
+                logger.error("수집 완료를 기다리다 시간 초과: %s", night)
+                return None
+            time.sleep(poll)
+
+    # ------------------------------------------------------------------ 센서별 처리 기록
+
+    def taken_keys(self, night: str, sensor_type: str) -> set:
+        """오늘 밤 이미 끝났거나 살아 있는 복제본(자신 포함)이 claim한 센서 키"""
+        prefix = f"{sensor_type}/"
+        with self._lock:
+            conn = self._connect()
+            live = [replica_id for (replica_id,) in conn.execute(
+                "SELECT replica_id FROM replicas WHERE heartbeat >= ?", (time.time() - self.lease_seconds,))]
+            rows = conn.execute(
+                "SELECT sensor_key, holder, done FROM claims"
+                " WHERE night = ? AND substr(sensor_key, 1, ?) = ?",
+                (night, len(prefix), prefix)
+            ).fetchall()
+        live = set(live) | {self.replica_id}
+        return {key for key, holder, done in rows if done or holder in live}
+
+    def claim(self, night: str, results: list) -> list:
+        """
+        전송할 결과를 claim하고 이 복제본이 새로 가져간 결과만 반환합니다.
+        이미 끝났거나, 살아 있는 복제본(이전 실행의 자신 포함 - 보관함 재전송 대상)이 가진 센서는 제외됩니다.
+        """
+        if not results:
+            return []
+        now = time.time()
+        token = uuid.uuid4().hex
+        keys = [_result_key(r) for r in results]
+
+        def _claim(conn):
+            live_since = now - self.lease_seconds
+            conn.executemany(
+                "INSERT INTO claims (night, sensor_key, holder, token, done, updated) VALUES (?, ?, ?, ?, 0, ?)"
+                " ON CONFLICT(night, sensor_key) DO UPDATE SET"
+                " holder = excluded.holder, token = excluded.token, updated = excluded.updated"
+                " WHERE claims.done = 0 AND claims.holder != excluded.holder AND claims.holder NOT IN"
+                " (SELECT replica_id FROM replicas WHERE heartbeat >= ?)",
+                [(night, key, self.replica_id, token, now, live_since) for key in keys]
+            )
+            return {key for (key,) in conn.execute(
+                "SELECT sensor_key FROM claims WHERE night = ? AND token = ?", (night, token))}
+
+        claimed = self._write(_claim)
+        if len(claimed) < len(results):
+            metrics.inc("replica_claims_skipped_total", len(results) - len(claimed))
+            logger.info("다른 복제본이 처리한 센서 제외: %s건", len(results) - len(claimed))
+        return [result for result, key in zip(results, keys) if key in claimed]
+
+    def mark_done(self, results: list, night: str = None):
+        """
+        전송에 성공한 결과를 done으로 표시합니다. (ResultSender on_success에서 호출)
+        night를 주지 않으면 결과의 analyzedAt 날짜를 사용합니다. (보관함 재전송)
+        """
+        now = time.time()
+        rows = [(now, night or datetime.fromtimestamp(int(r["result"]["analyzedAt"])).strftime("%Y-%m-%d"),
+                 _result_key(r)) for r in results]
+        self._write(lambda conn: conn.executemany(
+            "UPDATE claims SET done = 1, updated = ? WHERE night = ? AND sensor_key = ?", rows))
+
+    def prune(self, keep_days: int = DONE_RETENTION_DAYS):
+        cutoff = (datetime.now() - timedelta(days=keep_days)).strftime("%Y-%m-%d")
+
+        def _prune(conn):
+            conn.execute("DELETE FROM claims WHERE night < ?", (cutoff,))
+            conn.execute("DELETE FROM marks WHERE name < ?", (f"ingested:{cutoff}",))
+
+        self._write(_prune)
+
+    def status(self, night: str) -> dict:
+        with self._lock:
+            conn = self._connect()
+            leases = conn.execute("SELECT name, holder, expires FROM leases").fetchall()
+            claims = conn.execute(
+                "SELECT holder, done, COUNT(*) FROM claims WHERE night = ? GROUP BY holder, done", (night,)
+            ).fetchall()
+        return {
+            "replicaId": self.replica_id,
+            "live": self.live_replicas(),
+            "leases": {name: {"holder": holder, "expiresIn": round(expires - time.time(), 1)}
+                       for name, holder, expires in leases},
+            "claims": [{"holder": holder, "done": bool(done), "count": count} for holder, done, count in claims],
+            "ingested": self.get_mark(f"ingested:{night}"),
+        }
+
+
+_coordinator = None
+
+
+def get_coordinator() -> ReplicaCoordinator:
+    global _coordinator
+    if _coordinator is None:
+        _coordinator = ReplicaCoordinator()
+    return _coordinator
+
+
+if __name__ == "__main__":
+    import json
+    import argparse
+    import config.logging_setup  # noqa: F401
+
+    parser = argparse.ArgumentParser(description="복제본 분할 실행 상태 조회")
+    parser.add_argument("--night", default=datetime.now().strftime("%Y-%m-%d"))
+    args = parser.parse_args()
+    print(json.dumps(ReplicaCoordinator(replica_id="status").status(args.night), ensure_ascii=False, indent=2))
@@ -0,0 +1,108 @@
+import os
+import sqlite3
+import logging
+import threading
+from config.metrics import metrics
+from config.settings import RESULT_DELTA_PATH, RESULT_DELTA_EPSILON, RESULT_DELTA_REFRESH_DAYS
+from services.result_outbox import result_key
+
+logger = logging.getLogger(__name__)
+
+_QUERY_CHUNK = 500
+
+
+class SentIndex:
+    """
+    센서별 마지막 전송 결과(점수, 상태, 분석 시각)를 보관하는 로컬 SQLite 인덱스.
+
+    - changed(results): 마지막 전송과 비교해 다시 보낼 결과와 생략할 결과로 나눕니다.
+      · 전송 기록이 없거나 상태(analysisStatus)가 바뀐 경우
+      · 점수 차이가 epsilon보다 큰 경우 (한쪽만 None이어도 변경)
+      · 마지막 전송 후 refresh_days일이 지난 경우 (하위 시스템과 주기적으로 다시 맞춤)
+    - record(results): 전송에 성공한 결과를 기록합니다. (ResultSender on_success에서 호출)
+    """
+
+    def __init__(self, path: str = RESULT_DELTA_PATH, epsilon: float = RESULT_DELTA_EPSILON,
+                 refresh_days: int = RESULT_DELTA_REFRESH_DAYS):
+        self.path = path
+        self.epsilon = epsilon
+        self.refresh_seconds = refresh_days * 86400
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None or self._conn_pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sent ("
+                " sensor_key TEXT PRIMARY KEY,"
+                " score REAL,"
+                " status TEXT,"
+                " analyzed_at INTEGER NOT NULL) WITHOUT ROWID"
+            )
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _last_sent(self, keys: list) -> dict:
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(keys), _QUERY_CHUNK):
+                chunk = keys[start:start + _QUERY_CHUNK]
+                rows = conn.execute(
+                    f"SELECT sensor_key, score, status, analyzed_at FROM sent"
+                    f" WHERE sensor_key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                found.update((key, (score, status, analyzed_at)) for key, score, status, analyzed_at in rows)
+        return found
+
+    def _is_changed(self, result: dict, previous: tuple) -> bool:
+        if previous is None:
+            return True
+        score, status, sent_at = previous
+        body = result["result"]
+        if body["meta"]["analysisStatus"] != status:
+            return True
+        if int(body["analyzedAt"]) - sent_at >= self.refresh_seconds:
+            return True
+        new_score = body["healthScore"]
+        if new_score is None or score is None:
+            return new_score is not score
+        return abs(new_score - score) > self.epsilon
+
+    def changed(self, results: list) -> tuple:
+        """(보낼 결과, 생략할 결과)를 반환합니다."""
+        if not results:
+            return [], []
+        previous = self._last_sent([result_key(r) for r in results])
+        send, skip = [], []
+        for result in results:
+            (send if self._is_changed(result, previous.get(result_key(result))) else skip).append(result)
+        if skip:
+            metrics.inc("results_unchanged_total", len(skip))
+        return send, skip
+
+    def record(self, results: list):
+        """전송한 결과를 마지막 전송 기록으로 남깁니다. (더 오래된 분석 결과로는 덮어쓰지 않음)"""
+        rows = [
+            (result_key(r), r["result"]["healthScore"], r["result"]["meta"]["analysisStatus"],
+             int(r["result"]["analyzedAt"]))
+            for r in results
+        ]
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO sent (sensor_key, score, status, analyzed_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(sensor_key) DO UPDATE SET"
+                " score = excluded.score, status = excluded.status, analyzed_at = excluded.analyzed_at"
+                " WHERE excluded.analyzed_at >= sent.analyzed_at",
+                rows
+            )
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM sent").fetchone()[0]
@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from config.settings import RESULT_OUTBOX_PATH, RESULT_DELTA_ENABLED, REPLICA_ENABLED
+from services.result_sender import ResultSender
+
+logger = logging.getLogger(__name__)
+
+
+def result_key(result: dict) -> str:
+    """센서 단위 식별 키: sensor_type/gateway_id/sensor_id"""
+    info = result["result"]["sensorInfo"]
+    return f"{info['sensorType']}/{info['gatewayId']}/{info['sensorId']}"
+
+
+class ResultOutbox:
+    """
+    전송에 실패한 분석 결과를 보관하는 로컬 SQLite 보관함.
+    센서마다 가장 최근 결과 한 건만 유지하므로 재전송 비용은 누락된 센서 수에 비례합니다.
+    """
+
+    def __init__(self, path: str = RESULT_OUTBOX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+        self._has_pending = self.count() > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None or self._conn_pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                " sensor_key TEXT PRIMARY KEY,"
+                " payload TEXT NOT NULL,"
+                " analyzed_at INTEGER NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " last_error TEXT,"
+                " created_at REAL NOT NULL)"
+            )
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def add(self, results: list, error: str = None):
+        """전송 실패 결과를 보관합니다. 같은 센서의 더 오래된 결과는 덮어씁니다."""
+        rows = [
+            (result_key(r), json.dumps(r, ensure_ascii=False), int(r["result"]["analyzedAt"]), error, time.time())
+            for r in results
+        ]
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO outbox (sensor_key, payload, analyzed_at, attempts, last_error, created_at)"
+                " VALUES (?, ?, ?, 0, ?, ?)"
+                " ON CONFLICT(sensor_key) DO UPDATE SET"
+                " payload = excluded.payload, analyzed_at = excluded.analyzed_at,"
+                " last_error = excluded.last_error, created_at = excluded.created_at"
+                " WHERE excluded.analyzed_at >= outbox.analyzed_at",
+                rows
+            )
+            self._has_pending = True
+        logger.warning("미전송 결과 보관: %s건", len(rows))
+
+    def discard(self, results: list):
+        """전송에 성공한 결과보다 오래된 보관 결과를 제거합니다."""
+        if not self._has_pending:
+            return
+        rows = [(result_key(r), int(r["result"]["analyzedAt"])) for r in results]
+        with self._lock, self._connect() as conn:
+            conn.executemany("DELETE FROM outbox WHERE sensor_key = ? AND analyzed_at <= ?", rows)
+
+    def mark_failed(self, results: list, error: str = None):
+        rows = [(error, result_key(r), int(r["result"]["analyzedAt"])) for r in results]
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "UPDATE outbox SET attempts = attempts + 1, last_error = ?"
+                " WHERE sensor_key = ? AND analyzed_at = ?",
+                rows
+            )
+
+    def pending(self, after_key: str = "", limit: int = 10000) -> list:
+        """sensor_key 순서로 after_key 다음부터 limit건의 보관 결과를 반환합니다."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT payload FROM outbox WHERE sensor_key > ? ORDER BY sensor_key LIMIT ?",
+                (after_key, limit)
+            ).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+
+def replay_outbox(outbox: ResultOutbox = None, batch_limit: int = 10000) -> dict:
+    """
+    보관함의 미전송 결과만 다시 전송합니다.
+    성공한 결과는 보관함에서 제거하고, 실패한 결과는 시도 횟수를 늘려 남겨둡니다.
+    """
+    outbox = outbox or ResultOutbox()
+    total = outbox.count()
+    if total == 0:
+        logger.info("재전송할 미전송 결과가 없습니다.")
+        return {"pending": 0, "sent": 0, "failed": 0}
+
+    logger.info("미전송 결과 재전송 시작: %s건", total)
+    sent = failed = 0
+    after_key = ""
+    sent_index = coordinator = None
+    if RESULT_DELTA_ENABLED:
+        from services.result_delta import SentIndex
+        sent_index = SentIndex()
+    if REPLICA_ENABLED:
+        from services.replica_coordinator import get_coordinator
+        coordinator = get_coordinator()
+
+    def on_success(results):
+        outbox.discard(results)
+        if sent_index is not None:
+            sent_index.record(results)
+        if coordinator is not None:
+            coordinator.mark_done(results)
+
+    while True:
+        batch = outbox.pending(after_key=after_key, limit=batch_limit)
+        if not batch:
+            break
+        after_key = result_key(batch[-1])
+
+        with ResultSender(on_success=on_success, on_failure=outbox.mark_failed) as sender:
+            for result in batch:
+                sender.submit(result)
+        sent += sender.stats.sent
+        failed += sender.stats.failed
+
+    logger.info("미전송 결과 재전송 완료: 성공 %s건, 실패 %s건, 남은 %s건", sent, failed, outbox.count())
+    return {"pending": total, "sent": sent, "failed": failed}
@@ -0,0 +1,240 @@
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from config.metrics import metrics
+from config.settings import (
+    ANALYSIS_RESULT_API_URL,
+    RESULT_SEND_CONCURRENCY,
+    RESULT_SEND_BATCH_SIZE,
+    RESULT_SEND_TIMEOUT,
+    RESULT_SEND_MAX_RETRIES,
+    RESULT_SEND_BACKOFF,
+)
+
+ANALYSIS_RESULT_ENDPOINT = f"{ANALYSIS_RESULT_API_URL}/analysis-results"
+ANALYSIS_RESULT_BULK_ENDPOINT = f"{ANALYSIS_RESULT_API_URL}/analysis-results/bulk"
+
+# 재시도 대상 HTTP 상태 코드 (그 외 4xx는 재시도해도 결과가 같음)
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+logger = logging.getLogger(__name__)
+
+
+def create_session(pool_size: int = RESULT_SEND_CONCURRENCY) -> requests.Session:
+    """커넥션 풀을 재사용하는 HTTP 세션을 생성합니다."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def post_with_retry(session: requests.Session, url: str, payload, timeout: float = RESULT_SEND_TIMEOUT,
+                    max_retries: int = RESULT_SEND_MAX_RETRIES, backoff: float = RESULT_SEND_BACKOFF,
+                    stats: "SendStats" = None):
+    """
+    지수 백오프로 재시도하며 POST 합니다.
+    (성공 여부, 마지막 오류 메시지)를 반환합니다.
+    """
+    error = None
+    for attempt in range(max_retries + 1):
+        if attempt:
+            # 동시에 실패한 요청들이 한꺼번에 재시도하지 않도록 지터 추가
+            time.sleep(backoff * (2 ** (attempt - 1)) * (1 + random.random() * 0.5))
+            if stats:
+                stats.record_retry()
+            metrics.inc("result_send_retries_total")
+
+        started = time.perf_counter()
+        try:
+            response = session.post(url, json=payload, timeout=timeout)
+            latency = time.perf_counter() - started
+            metrics.observe("result_send_request_seconds", latency)
+            if stats:
+                stats.record_request(latency)
+            if response.status_code in RETRYABLE_STATUS:
+                error = f"HTTP {response.status_code}"
+                continue
+            response.raise_for_status()
+            return True, None
+        except requests.HTTPError as e:
+            return False, str(e)
+        except requests.RequestException as e:
+            latency = time.perf_counter() - started
+            metrics.observe("result_send_request_seconds", latency)
+            if stats:
+                stats.record_request(latency)
+            error = str(e)
+
+    return False, error
+
+
+class SendStats:
+    """한 번의 실행 동안의 전송 처리량/지연 통계"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        self.sent = 0
+        self.failed = 0
+        self.requests = 0
+        self.retries = 0
+        self.latencies = []
+
+    def record_request(self, latency: float):
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(latency)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_delivery(self, count: int, ok: bool):
+        with self._lock:
+            if ok:
+                self.sent += count
+            else:
+                self.failed += count
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    def summary(self) -> dict:
+        with self._lock:
+            elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+            latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2)
+
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "requests": self.requests,
+            "retries": self.retries,
+            "elapsedSec": round(elapsed, 3),
+            "throughputPerSec": round(self.sent / elapsed, 2) if elapsed > 0 else None,
+            "latencyMs": {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": round(latencies[-1] * 1000, 2) if latencies else None,
+            },
+        }
+
+
+class ResultSender:
+    """
+    분석 결과 전송기.
+
+    - 커넥션 풀을 공유하는 세션으로 최대 concurrency개 요청을 동시에 전송합니다.
+    - batch_size가 2 이상이면 결과를 묶어 bulk 엔드포인트로 전송합니다.
+    - 실패한 요청은 지수 백오프로 재시도하고, 최종 실패 시 on_failure(results, error)를 호출합니다.
+    - 전송에 성공하면 on_success(results)를 호출합니다.
+
+        with ResultSender() as sender:
+            sender.submit(result)
+        sender.stats.summary()
+    """
+
+    def __init__(self, endpoint: str = ANALYSIS_RESULT_ENDPOINT, bulk_endpoint: str = ANALYSIS_RESULT_BULK_ENDPOINT,
+                 concurrency: int = RESULT_SEND_CONCURRENCY, batch_size: int = RESULT_SEND_BATCH_SIZE,
+                 timeout: float = RESULT_SEND_TIMEOUT, max_retries: int = RESULT_SEND_MAX_RETRIES,
+                 backoff: float = RESULT_SEND_BACKOFF, on_failure=None, on_success=None,
+                 session: requests.Session = None):
+        concurrency = max(1, concurrency)
+        self.endpoint = endpoint
+        self.bulk_endpoint = bulk_endpoint
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.on_failure = on_failure
+        self.on_success = on_success
+        self.session = session or create_session(concurrency)
+        self.stats = SendStats()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="result-sender")
+        # 대기 중인 작업 수 상한: 생산 속도가 전송 속도보다 빨라도 메모리가 늘지 않도록 함
+        self._slots = threading.BoundedSemaphore(concurrency * 2)
+        self._buffer = []
+        self._buffer_lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, result: dict):
+        if self._closed:
+            raise RuntimeError("이미 종료된 ResultSender 입니다.")
+        if self.batch_size == 1:
+            self._dispatch([result])
+            return
+
+        with self._buffer_lock:
+            self._buffer.append(result)
+            if len(self._buffer) < self.batch_size:
+                return
+            batch, self._buffer = self._buffer, []
+        self._dispatch(batch)
+
+    def flush(self):
+        with self._buffer_lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            self._dispatch(batch)
+
+    def close(self) -> dict:
+        """남은 결과를 모두 전송하고 통계를 반환합니다."""
+        if not self._closed:
+            self.flush()
+            self._closed = True
+            self._executor.shutdown(wait=True)
+            self.stats.finish()
+            logger.info("결과 전송 통계: %s", self.stats.summary())
+        return self.stats.summary()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _dispatch(self, results: list):
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._deliver, results)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+    def _deliver(self, results: list):
+        if self.batch_size == 1:
+            url, payload = self.endpoint, results[0]
+        else:
+            url, payload = self.bulk_endpoint, results
+
+        try:
+            ok, error = post_with_retry(self.session, url, payload, self.timeout,
+                                        self.max_retries, self.backoff, self.stats)
+        except Exception as e:
+            ok, error = False, str(e)
+
+        self.stats.record_delivery(len(results), ok)
+        metrics.inc("results_sent_total", len(results), status="sent" if ok else "failed")
+        if ok:
+            callback, args = self.on_success, (results,)
+        else:
+            logger.error("결과 전송 실패 (%d건): %s", len(results), error)
+            callback, args = self.on_failure, (results, error)
+
+        if callback is not None:
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.error("전송 결과 처리 중 오류: %s", e, exc_info=True)
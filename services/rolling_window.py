@@ -0,0 +1,343 @@
+import os
+import uuid
+import logging
+import threading
+from contextlib import nullcontext
+import numpy as np
+import pandas as pd
+from config.settings import REQUIRED_DAYS, ROLLING_WINDOW_PATH
+from services.analysis_window import VALUE_COLUMNS, last_values
+
+EPOCH_DAY = np.datetime64("1970-01-01", "D")
+
+logger = logging.getLogger(__name__)
+
+
+def _epoch_days(dates) -> np.ndarray:
+    return (pd.to_datetime(dates).values.astype("datetime64[D]") - EPOCH_DAY).astype(np.int32)
+
+
+class WindowBatch:
+    """센서 타입 하나의 윈도우 묶음 (센서별 값은 오래된 날짜 → 최근 날짜 순, 빈 칸은 NaN)"""
+
+    __slots__ = ("sensor_type", "gateway_ids", "sensor_ids", "counts", "days", "values")
+
+    def __init__(self, sensor_type, gateway_ids, sensor_ids, counts, days, values):
+        self.sensor_type = sensor_type
+        self.gateway_ids = gateway_ids  # (n,) str
+        self.sensor_ids = sensor_ids    # (n,) str
+        self.counts = counts            # (n,) 유효 일수
+        self.days = days                # (n, size) epoch day, 빈 칸은 -1
+        self.values = values            # (n, size, 3) min/max/avg_diff
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def take(self, mask) -> "WindowBatch":
+        return WindowBatch(self.sensor_type, self.gateway_ids[mask], self.sensor_ids[mask], self.counts[mask],
+                           self.days[mask], self.values[mask])
+
+    def means(self) -> np.ndarray:
+        """센서별 윈도우 평균 (n, 3)"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.nansum(self.values, axis=1) / self.counts[:, None]
+
+    def frame(self, index: int = None) -> pd.DataFrame:
+        """이력 저장소와 같은 컬럼의 DataFrame (index를 주면 해당 센서만)"""
+        rows = slice(None) if index is None else slice(index, index + 1)
+        counts, days, values = self.counts[rows], self.days[rows], self.values[rows]
+        valid = np.arange(days.shape[1])[None, :] < counts[:, None]
+        repeat = counts.astype(np.intp)
+        flat = values[valid]
+        return pd.DataFrame({
+            "gateway_id": np.repeat(self.gateway_ids[rows], repeat),
+            "sensor_id": np.repeat(self.sensor_ids[rows], repeat),
+            "sensor_type": self.sensor_type,
+            "min_diff": flat[:, 0],
+            "max_diff": flat[:, 1],
+            "avg_diff": flat[:, 2],
+            "date": (EPOCH_DAY + days[valid]).astype("datetime64[ns]"),
+        })
+
+
+class RollingWindows:
+    """
+    (sensor_type, gateway_id, sensor_id)별 최근 size일 (min_diff, max_diff, avg_diff) 링 버퍼.
+
+    - 모든 센서가 하나의 NumPy 블록(values: 슬롯 × size × 3)을 공유하고, 센서마다 슬롯 하나를 씁니다.
+    - 수집(update) 시 날짜가 더 최근인 행은 head 위치에 덮어쓰고, 늦게 들어온 과거 날짜만 슬롯을 다시 정렬합니다.
+    - 결측값이 있는 행은 건너뛰므로 센서마다 결측 없는 최근 size개 값을 보관합니다.
+      (services.analysis_window.recent_window와 같은 기준)
+    - save/load로 작은 바이너리 스냅샷(.npz)에 보관합니다.
+    """
+
+    def __init__(self, size: int = REQUIRED_DAYS, capacity: int = 1024):
+        self.size = size
+        self._lock = threading.RLock()
+        self._slots = {}
+        self._keys = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        self.values = np.full((capacity, self.size, 3), np.nan, dtype=np.float64)
+        self.days = np.full((capacity, self.size), -1, dtype=np.int32)
+        self.head = np.zeros(capacity, dtype=np.int32)   # 다음에 쓸 위치
+        self.count = np.zeros(capacity, dtype=np.int32)  # 유효 일수
+        self.last_day = np.full(capacity, -1, dtype=np.int32)
+
+    def _grow(self, capacity: int):
+        old = (self.values, self.days, self.head, self.count, self.last_day)
+        n = len(self._keys)
+        self._allocate(capacity)
+        for new, prev in zip((self.values, self.days, self.head, self.count, self.last_day), old):
+            new[:n] = prev[:n]
+
+    def _slot(self, key: tuple) -> int:
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = len(self._keys)
+            if slot >= len(self.count):
+                self._grow(len(self.count) * 2)
+            self._slots[key] = slot
+            self._keys.append(key)
+        return slot
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def update(self, df: pd.DataFrame) -> int:
+        """수집된 행을 윈도우에 반영하고 반영한 행 수를 반환합니다."""
+        if df.empty:
+            return 0
+        df = df.dropna(subset=VALUE_COLUMNS + ["date"])
+        if df.empty:
+            return 0
+
+        days = _epoch_days(df["date"])
+        values = df[VALUE_COLUMNS].to_numpy(dtype=np.float64)
+        keys = zip(df["sensor_type"].astype(str), df["gateway_id"].astype(str), df["sensor_id"].astype(str))
+
+        with self._lock:
+            slots = np.fromiter((self._slot(key) for key in keys), dtype=np.int64, count=len(df))
+            order = np.lexsort((days, slots))
+            slots, days, values = slots[order], days[order], values[order]
+
+            # 슬롯 안에서의 순번: 같은 순번끼리는 슬롯이 겹치지 않으므로 한 번에 쓸 수 있음
+            starts = np.r_[0, np.flatnonzero(np.diff(slots)) + 1]
+            rank = np.arange(len(slots)) - np.repeat(starts, np.diff(np.r_[starts, len(slots)]))
+            for r in range(int(rank.max()) + 1):
+                sel = np.flatnonzero(rank == r)
+                s, d = slots[sel], days[sel]
+                newer = d > self.last_day[s]
+                self._append(s[newer], d[newer], values[sel[newer]])
+                for i in sel[~newer]:
+                    self._insert(int(slots[i]), int(days[i]), values[i])
+        return len(df)
+
+    def _append(self, slots: np.ndarray, days: np.ndarray, values: np.ndarray):
+        pos = self.head[slots]
+        self.values[slots, pos] = values
+        self.days[slots, pos] = days
+        self.head[slots] = (pos + 1) % self.size
+        self.count[slots] = np.minimum(self.count[slots] + 1, self.size)
+        self.last_day[slots] = days
+
+    def _insert(self, slot: int, day: int, value: np.ndarray):
+        # 이미 지난 날짜가 늦게 들어온 경우: 슬롯을 날짜 순으로 다시 씀
+        order = self._order(np.array([slot]))[0][:self.count[slot]]
+        days = self.days[slot, order]
+        values = self.values[slot, order]
+        hit = np.flatnonzero(days == day)
+        if hit.size:
+            values[hit[0]] = value
+        elif len(days) == self.size and day < days[0]:
+            return
+        else:
+            at = int(np.searchsorted(days, day))
+            days = np.insert(days, at, day)[-self.size:]
+            values = np.insert(values, at, value, axis=0)[-self.size:]
+
+        n = len(days)
+        self.days[slot] = -1
+        self.values[slot] = np.nan
+        self.days[slot, :n] = days
+        self.values[slot, :n] = values
+        self.head[slot] = n % self.size
+        self.count[slot] = n
+        self.last_day[slot] = days[-1]
+
+    def _order(self, slots: np.ndarray) -> np.ndarray:
+        """슬롯별 위치를 오래된 날짜 → 최근 날짜 순으로 (n, size)"""
+        start = (self.head[slots] - self.count[slots]) % self.size
+        return (start[:, None] + np.arange(self.size)[None, :]) % self.size
+
+    def window(self, sensor_type: str, gateway_id: str, sensor_id: str) -> tuple:
+        """(epoch day 배열, (k, 3) 값 배열)을 날짜 순으로 반환합니다. 없으면 빈 배열."""
+        with self._lock:
+            slot = self._slots.get((sensor_type, str(gateway_id), str(sensor_id)))
+            if slot is None:
+                return np.empty(0, dtype=np.int32), np.empty((0, 3))
+            order = self._order(np.array([slot]))[0][:self.count[slot]]
+            return self.days[slot, order].copy(), self.values[slot, order].copy()
+
+    def sensor_types(self) -> list:
+        with self._lock:
+            return sorted({key[0] for key in self._keys})
+
+    def batch(self, sensor_type: str, days: int = None) -> WindowBatch:
+        """
+        센서 타입의 전체 윈도우를 반환합니다.
+        days를 주면 센서별 최근 days개 값만 남깁니다. (이력 저장소 read_recent(days)와 같은 기준)
+        """
+        with self._lock:
+            slots = np.array([slot for key, slot in self._slots.items() if key[0] == sensor_type], dtype=np.int64)
+            keys = [self._keys[slot] for slot in slots]
+        return self._window_batch(sensor_type, slots, [key[1:] for key in keys], days)
+
+    def select(self, sensor_type: str, sensors: list, days: int = None) -> WindowBatch:
+        """지정한 (gateway_id, sensor_id) 센서들의 윈도우만 반환합니다. (없는 센서는 제외, days는 batch와 같음)"""
+        with self._lock:
+            found = [(str(gw), str(sid)) for gw, sid in sensors
+                     if (sensor_type, str(gw), str(sid)) in self._slots]
+            slots = np.array([self._slots[(sensor_type, gw, sid)] for gw, sid in found], dtype=np.int64)
+        return self._window_batch(sensor_type, slots, found, days)
+
+    def _window_batch(self, sensor_type: str, slots: np.ndarray, sensors: list, days: int = None) -> WindowBatch:
+        with self._lock:
+            order = self._order(slots)
+            window_days = self.days[slots[:, None], order]
+            values = self.values[slots[:, None], order]
+            counts = self.count[slots].copy()
+        if days is not None and days < self.size:
+            window_days, values, counts = last_values(window_days, values, counts, days)
+        return WindowBatch(sensor_type, np.array([gw for gw, _ in sensors], dtype=object),
+                           np.array([sid for _, sid in sensors], dtype=object), counts, window_days, values)
+
+    def to_frame(self) -> pd.DataFrame:
+        """모든 센서 타입의 윈도우 값을 이력 저장소와 같은 컬럼의 DataFrame으로 반환합니다."""
+        frames = [self.batch(sensor_type).frame() for sensor_type in self.sensor_types()]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def save(self, path: str = ROLLING_WINDOW_PATH):
+        """스냅샷을 쓰기마다 다른 임시 파일에 쓴 뒤 교체합니다."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        try:
+            with self._lock:
+                n = len(self._keys)
+                keys = np.array(self._keys, dtype=str).reshape(n, 3)
+                with open(tmp_path, "wb") as f:
+                    np.savez(f, size=np.int32(self.size), keys=keys, values=self.values[:n], days=self.days[:n],
+                             head=self.head[:n], count=self.count[:n], last_day=self.last_day[:n])
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str = ROLLING_WINDOW_PATH) -> "RollingWindows":
+        with np.load(path, allow_pickle=False) as data:
+            n = len(data["keys"])
+            windows = cls(int(data["size"]), capacity=max(1024, n))
+            windows._keys = [tuple(key) for key in data["keys"].tolist()]
+            windows._slots = {key: slot for slot, key in enumerate(windows._keys)}
+            for name in ("values", "days", "head", "count", "last_day"):
+                getattr(windows, name)[:n] = data[name]
+        return windows
+
+    @classmethod
+    def rebuild(cls, store, size: int = REQUIRED_DAYS) -> "RollingWindows":
+        """이력 저장소의 최근 size일로 새로 만듭니다. (스냅샷이 없을 때)"""
+        windows = cls(size)
+        for sensor_type in store.sensor_types():
+            windows.update(store.read_recent(sensor_type, days=size).assign(sensor_type=sensor_type))
+        logger.info("롤링 윈도우 재구성 완료: 센서 %s개", len(windows))
+        return windows
+
+
+_windows = None
+_windows_mtime = None
+# 마지막 저장 이후 반영한 값 (센서별 최근 size일만 보관하므로 크기가 윈도우와 같음)
+# 그 사이 다른 프로세스가 스냅샷을 바꾸면 새로 읽은 스냅샷에 다시 반영합니다.
+_pending = None
+_windows_lock = threading.Lock()
+
+
+def _history_lock(history_locked: bool):
+    from services.file_lock import job_lock
+    return nullcontext() if history_locked else job_lock("history")
+
+
+def _refresh(path: str):
+    """스냅샷이 바뀌었으면 다시 읽습니다. 스냅샷이 없으면 None. (_windows_lock 안에서 호출)"""
+    global _windows, _windows_mtime
+    mtime = os.path.getmtime(path) if os.path.isfile(path) else None
+    if mtime is None:
+        return None
+    if _windows is None or mtime != _windows_mtime:
+        windows = RollingWindows.load(path)
+        if _pending is not None:
+            windows.update(_pending.to_frame())
+        _windows, _windows_mtime = windows, mtime
+    return _windows
+
+
+def _save(path: str):
+    """메모리의 윈도우를 스냅샷으로 저장합니다. ('history' 잠금과 _windows_lock 안에서 호출)"""
+    global _windows_mtime, _pending
+    _windows.save(path)
+    _windows_mtime = os.path.getmtime(path)
+    _pending = None
+
+
+def get_rolling_windows(path: str = ROLLING_WINDOW_PATH, history_locked: bool = False) -> RollingWindows:
+    """
+    프로세스 공용 롤링 윈도우를 반환합니다.
+    다른 프로세스가 스냅샷을 갱신했으면 다시 읽고, 스냅샷이 없으면 'history' 잠금 안에서 이력 저장소로 재구성해 저장합니다.
+    이미 'history' 잠금을 잡고 있는 쪽(수집 저장)은 history_locked=True로 호출합니다.
+    """
+    global _windows
+    with _windows_lock:
+        windows = _refresh(path)
+        if windows is not None:
+            return windows
+
+    # 잠금 순서는 항상 'history' 잠금 → _windows_lock
+    with _history_lock(history_locked), _windows_lock:
+        windows = _refresh(path)
+        if windows is None:
+            from services.history_store import get_history_store
+            _windows = RollingWindows.rebuild(get_history_store())
+            _save(path)
+        return _windows
+
+
+def update_rolling_windows(df: pd.DataFrame, path: str = ROLLING_WINDOW_PATH) -> int:
+    """
+    수집된 행을 메모리의 윈도우에만 반영합니다. ('history' 잠금 안에서 호출)
+    스냅샷은 수집/백필 실행이 끝날 때 flush_rolling_windows()로 한 번 저장합니다.
+    """
+    global _pending
+    get_rolling_windows(path, history_locked=True)
+    with _windows_lock:
+        windows = _refresh(path) or _windows
+        updated = windows.update(df)
+        if updated:
+            if _pending is None:
+                _pending = RollingWindows(windows.size)
+            _pending.update(df)
+    return updated
+
+
+def flush_rolling_windows(path: str = ROLLING_WINDOW_PATH) -> bool:
+    """마지막 저장 이후 반영한 값이 있으면 'history' 잠금 안에서 스냅샷을 저장합니다."""
+    if _pending is None:
+        return False
+    with _history_lock(False), _windows_lock:
+        if _pending is None:
+            return False
+        _refresh(path)
+        _save(path)
+    logger.info("롤링 윈도우 스냅샷 저장: 센서 %s개", len(_windows))
+    return True
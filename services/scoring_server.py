@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import logging
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ai.health_predictor import load_model, predict_windows
+from ai.model_cache import model_cache
+from ai.model_registry import SavedModels
+from config.metrics import Metrics, scoped_metrics
+from config.settings import (
+    MIN_ANALYSIS_DAYS, MODEL_CACHE_MAX_ENTRIES, REQUIRED_DAYS, SCORING_SERVER_HOST, SCORING_SERVER_PORT,
+    SCORING_SERVER_SOCKET, SCORING_SERVER_MAX_SENSORS,
+)
+from services.rolling_window import get_rolling_windows
+
+logger = logging.getLogger(__name__)
+
+
+class ScoringError(ValueError):
+    """요청 형식 오류 (400으로 응답)"""
+
+
+def _parse_sensors(body) -> list:
+    # 단일 센서 {"sensorType", "gatewayId", "sensorId"} 또는 {"sensors": [...]} / [...] 모두 허용
+    if isinstance(body, dict):
+        body = body.get("sensors", [body])
+    if not isinstance(body, list) or not body:
+        raise ScoringError("sensors 목록이 비어 있습니다.")
+    if len(body) > SCORING_SERVER_MAX_SENSORS:
+        raise ScoringError(f"한 번에 요청할 수 있는 센서는 최대 {SCORING_SERVER_MAX_SENSORS}개입니다.")
+
+    sensors = []
+    for item in body:
+        try:
+            sensors.append((str(item["sensorType"]), str(item["gatewayId"]), str(item["sensorId"])))
+        except (TypeError, KeyError) as e:
+            raise ScoringError(f"센서 항목에 sensorType/gatewayId/sensorId가 필요합니다: {item}") from e
+    return sensors
+
+
+def score_sensors(sensors: list, min_days: int = MIN_ANALYSIS_DAYS) -> dict:
+    """
+    메모리에 있는 롤링 윈도우와 캐시된 모델로 센서들을 분석합니다.
+    결과(results)는 predict와 같은 형식이며 요청 순서를 따릅니다.
+    윈도우가 없거나 min_days보다 적은 센서는 missing에 담습니다.
+    """
+    windows = get_rolling_windows()
+    by_type = {}
+    for sensor_type, gateway_id, sensor_id in dict.fromkeys(sensors):
+        by_type.setdefault(sensor_type, []).append((gateway_id, sensor_id))
+
+    scored = {}
+    for sensor_type, keys in by_type.items():
+        # 야간 분석(_score_windows)과 같은 윈도우 (센서별 최근 REQUIRED_DAYS개)
+        batch = windows.select(sensor_type, keys, days=REQUIRED_DAYS)
+        if len(batch) == 0:
+            continue
+        for result in predict_windows(batch, min_days=min_days):
+            info = result["result"]["sensorInfo"]
+            scored[(info["sensorType"], info["gatewayId"], info["sensorId"])] = result
+
+    results, missing = [], []
+    for key in dict.fromkeys(sensors):
+        if key in scored:
+            results.append(scored[key])
+        else:
+            missing.append({"sensorType": key[0], "gatewayId": key[1], "sensorId": key[2]})
+    return {"results": results, "missing": missing}
+
+
+def warm_up(limit: int = MODEL_CACHE_MAX_ENTRIES) -> int:
+    """롤링 윈도우에 있는 센서의 모델을 캐시 크기만큼 미리 불러옵니다."""
+    windows = get_rolling_windows()
+    loaded = 0
+    for sensor_type in windows.sensor_types():
+        saved_models = SavedModels(sensor_type)
+        batch = windows.batch(sensor_type, days=REQUIRED_DAYS)
+        for gateway_id, sensor_id in zip(batch.gateway_ids, batch.sensor_ids):
+            if loaded >= limit:
+                return loaded
+            if (gateway_id, sensor_id) in saved_models and load_model(sensor_type, gateway_id, sensor_id) is not None:
+                loaded += 1
+    return loaded
+
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET  /health  : 윈도우 센서 수, 모델 캐시 상태
+    GET  /metrics : 서버 전용 지표 (Prometheus 텍스트)
+    POST /score   : {"sensors": [{"sensorType", "gatewayId", "sensorId"}, ...], "minDays": 선택}
+
+    지표는 서버 객체의 metrics(전용 레지스트리)에 기록하며, 예측/모델 캐시가 전역 metrics에 남기는 값도
+    요청 처리 중에는 이 레지스트리로 보냅니다. (같은 프로세스의 파이프라인 실행 지표와 섞이지 않음)
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            return self._reply_text(200, self.server.metrics.to_prometheus())
+        if self.path != "/health":
+            return self._reply(404, {"error": "not found"})
+        self._reply(200, {"status": "ok", "sensors": len(get_rolling_windows()), "modelCache": model_cache.stats()})
+
+    def do_POST(self):
+        if self.path != "/score":
+            return self._reply(404, {"error": "not found"})
+        with scoped_metrics(self.server.metrics):
+            self._score()
+
+    def _score(self):
+        metrics = self.server.metrics
+        started = time.perf_counter()
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"null")
+            sensors = _parse_sensors(body)
+            min_days = int(body.get("minDays", MIN_ANALYSIS_DAYS)) if isinstance(body, dict) else MIN_ANALYSIS_DAYS
+        except (ValueError, TypeError) as e:
+            metrics.inc("scoring_requests_total", status="bad_request")
+            return self._reply(400, {"error": str(e)})
+
+        try:
+            response = score_sensors(sensors, min_days=min_days)
+        except Exception as e:
+            logger.exception("점수 조회 처리 실패: %s", e)
+            metrics.inc("scoring_requests_total", status="error")
+            return self._reply(500, {"error": str(e)})
+
+        elapsed = time.perf_counter() - started
+        response["elapsedMs"] = round(elapsed * 1000, 2)
+        metrics.inc("scoring_requests_total", status="ok")
+        metrics.observe("scoring_request_seconds", elapsed)
+        logger.debug("점수 조회: 센서 %d개, 누락 %d개 (%.1fms)",
+                     len(response["results"]), len(response["missing"]), elapsed * 1000)
+        self._reply(200, response)
+
+    def _reply(self, status: int, payload: dict):
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json")
+
+    def _reply_text(self, status: int, text: str):
+        self._send(status, text.encode("utf-8"), "text/plain; version=0.0.4")
+
+    def _send(self, status: int, data: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Unix 소켓에서는 client_address가 비어 있으므로 주소 없이 기록
+        logger.debug("%s", format % args)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def create_server(host: str = SCORING_SERVER_HOST, port: int = SCORING_SERVER_PORT,
+                  socket_path: str = SCORING_SERVER_SOCKET):
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+        server = ThreadingUnixHTTPServer(socket_path, ScoringRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), ScoringRequestHandler)
+        server.daemon_threads = True
+    server.metrics = Metrics()
+    return server
+
+
+def start_scoring_server(warm: bool = True, **kwargs):
+    """백그라운드 스레드에서 서버를 실행하고 서버 객체를 반환합니다. (종료는 server.shutdown())"""
+    server = create_server(**kwargs)
+
+    def _serve():
+        if warm:
+            try:
+                with scoped_metrics(server.metrics):
+                    logger.info("점수 조회 서버 모델 예열 완료: %s개", warm_up())
+            except Exception as e:
+                logger.warning("점수 조회 서버 모델 예열 실패: %s", e)
+        server.serve_forever()
+
+    threading.Thread(target=_serve, name="scoring-server", daemon=True).start()
+    logger.info("🚀 점수 조회 서버 시작: %s", server.server_address)
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+    import config.logging_setup  # noqa: F401
+
+    parser = argparse.ArgumentParser(description="모델/롤링 윈도우를 메모리에 유지하는 로컬 점수 조회 서버")
+    parser.add_argument("--host", default=SCORING_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SCORING_SERVER_PORT)
+    parser.add_argument("--socket", default=SCORING_SERVER_SOCKET, help="Unix 소켓 경로 (지정하면 TCP 대신 사용)")
+    parser.add_argument("--no-warm", action="store_true", help="시작 시 모델을 미리 불러오지 않음")
+    args = parser.parse_args()
+
+    httpd = create_server(args.host, args.port, args.socket)
+    if not args.no_warm:
+        with scoped_metrics(httpd.metrics):
+            logger.info("모델 예열 완료: %s개", warm_up())
+    logger.info("🚀 점수 조회 서버 시작: %s", httpd.server_address)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
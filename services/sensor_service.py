@@ -1,48 +1,94 @@
 import requests
+import numpy as np
 import pandas as pd
-import os
 from datetime import datetime
-from config.settings import SENSOR_API_URL
+from config.metrics import metrics
+from config.settings import SENSOR_API_URL, SENSOR_FETCH_STREAMING, ROLLING_WINDOW_ENABLED
+from services.file_lock import job_lock
+from services.history_store import get_history_store
+from services.rolling_window import update_rolling_windows, flush_rolling_windows
+from services.watermark_manifest import get_manifest
 import logging
 
-DATA_DIR = "data/sensors"  # 센서별 폴더 구조 기준 경로
+try:
+    import ijson  # 선택 의존성: 대용량 응답 스트리밍 파싱
+except ImportError:
+    ijson = None
+
 SENSOR_ENDPOINT = f"{SENSOR_API_URL}/threshold-histories/date"
 logger = logging.getLogger(__name__)
 
 
+_INITIAL_ROWS = 1024
+_VALUE_KEYS = ("min_diff", "max_diff", "avg_diff", "calculated_at")
+
+
+def _as_float(value) -> float:
+    return np.nan if value is None else float(value)
+
+
+def _iter_items(raw_data):
+    # raw_data가 list(또는 스트리밍 iterator)이면 반복 처리, dict이면 단일 게이트웨이
+    return [raw_data] if isinstance(raw_data, dict) else raw_data
+
+
 def flatten_sensor_data(raw_data) -> pd.DataFrame:
     """
     중첩된 센서 데이터를 평탄화하여 DataFrame으로 변환합니다.
-    raw_data는 dict 또는 list일 수 있습니다.
+    raw_data는 dict, list 또는 게이트웨이 항목을 차례로 내주는 iterator일 수 있습니다.
+
+    레코드마다 dict를 만들지 않고 미리 할당한 컬럼 배열에 바로 채운 뒤,
+    calculated_at(밀리초)은 컬럼 전체를 한 번에 변환합니다.
+    ID 컬럼은 category dtype으로 만듭니다.
     """
-    records = []
+    ids = np.empty((_INITIAL_ROWS, 3), dtype=object)  # gateway_id, sensor_id, sensor_type
+    values = np.empty((_INITIAL_ROWS, 4), dtype="float64")  # min/max/avg_diff, calculated_at
+    n = 0
 
-    # raw_data가 list이면 반복 처리
-    data_list = raw_data if isinstance(raw_data, list) else [raw_data]
-    
-    for item in data_list:
+    for item in _iter_items(raw_data):
         gateway_id = item.get("gateway_id")
         for sensor in item.get("sensors", []):
             sensor_id = sensor.get("sensor_id")
             for t in sensor.get("types", []):
-                sensor_type = t.get("type_en_name") or t.get("type")
-                records.append({
-                    "gateway_id": gateway_id,
-                    "sensor_id": sensor_id,
-                    "sensor_type": sensor_type,
-                    "min_diff": t.get("min_diff"),
-                    "max_diff": t.get("max_diff"),
-                    "avg_diff": t.get("avg_diff"),
-                    "date": pd.to_datetime(t.get("calculated_at"), unit='ms')  # 밀리초 단위 변환
-                })
-
-    return pd.DataFrame(records)
-
-
-def fetch_threshold_history(target_date: datetime = None) -> pd.DataFrame:
+                if n == len(ids):
+                    # 스트리밍 입력은 전체 건수를 미리 알 수 없으므로 두 배씩 늘립니다.
+                    ids = np.concatenate([ids, np.empty_like(ids)])
+                    values = np.concatenate([values, np.empty_like(values)])
+                ids[n] = (gateway_id, sensor_id, t.get("type_en_name") or t.get("type"))
+                values[n] = [_as_float(t.get(key)) for key in _VALUE_KEYS]
+                n += 1
+
+    ids, values = ids[:n], values[:n]
+
+    # 밀리초 단위 변환 (값이 없으면 NaT)
+    dates = pd.to_datetime(values[:, 3], unit='ms')
+
+    return pd.DataFrame({
+        "gateway_id": pd.Categorical(ids[:, 0]),
+        "sensor_id": pd.Categorical(ids[:, 1]),
+        "sensor_type": pd.Categorical(ids[:, 2]),
+        "min_diff": values[:, 0].copy(),
+        "max_diff": values[:, 1].copy(),
+        "avg_diff": values[:, 2].copy(),
+        "date": dates,
+    })
+
+
+def _stream_items(response):
+    """응답 본문을 게이트웨이 단위로 점진적으로 파싱합니다. (최상위가 배열인 응답 기준)"""
+    response.raw.decode_content = True
+    return ijson.items(response.raw, "item", use_float=True)
+
+
+@metrics.timed("fetch_seconds")
+def fetch_threshold_history(target_date: datetime = None, stream: bool = SENSOR_FETCH_STREAMING,
+                            session: requests.Session = None, raise_on_error: bool = False) -> pd.DataFrame:
     """
     센서 서비스에서 임계치 변화량 데이터를 받아와 평탄화합니다.
     target_date가 None이면 오늘 날짜 기준으로 요청합니다.
+    stream이면(ijson 필요) 응답 전체를 JSON 객체로 만들지 않고 게이트웨이 단위로 읽으며 평탄화합니다.
+    session을 주면 해당 세션의 커넥션 풀을 사용합니다.
+    raise_on_error가 False이면 호출 실패 시 빈 DataFrame을 반환합니다.
     """
     try:
         if target_date is None:
@@ -50,46 +96,52 @@ def fetch_threshold_history(target_date: datetime = None) -> pd.DataFrame:
         date_str = target_date.strftime("%Y-%m-%d")
         url = f"{SENSOR_ENDPOINT}/{date_str}"
 
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        raw_data = response.json()
-        
-        logger.info(f"raw_data 확인 : {raw_data}")
-        return raw_data
+        if stream and ijson is None:
+            logger.warning("ijson이 설치되어 있지 않아 스트리밍 파싱 없이 수집합니다.")
+            stream = False
+
+        with (session or requests).get(url, timeout=5, stream=stream) as response:
+            response.raise_for_status()
+            df = flatten_sensor_data(_stream_items(response) if stream else response.json())
+
+        metrics.inc("records_fetched_total", len(df))
+        logger.info("수집 완료 (%s): %s건", date_str, len(df))
+        return df
     except Exception as e:
-        logger.error(f"센서 API 호출 실패: {e}", exc_info=True)
+        metrics.inc("fetch_failures_total")
+        if raise_on_error:
+            raise
+        logger.error("센서 API 호출 실패: %s", e, exc_info=True)
         return pd.DataFrame()
 
 
-def save_by_sensor_and_type(df: pd.DataFrame):
+@metrics.timed("save_seconds")
+def save_by_sensor_and_type(df: pd.DataFrame) -> pd.DataFrame:
     """
-    센서 ID별 폴더 내에 타입별 CSV 파일로 저장합니다.
-    기존 파일이 있으면 중복 제거 후 이어쓰기 합니다.
+    센서 이력 저장소(HISTORY_STORE)에 저장합니다.
+    gateway_id, sensor_id, sensor_type, date 기준으로 이미 있는 행은 제외하고,
+    실제로 추가된 행을 반환합니다.
+    이력 정리(services.history_retention)와 겹치지 않도록 'history' 잠금 안에서 저장합니다.
     """
     if df.empty:
         logger.info("저장할 데이터가 없습니다.")
-        return
-
-    for sensor_id, sensor_df in df.groupby("sensor_id"):
-        sensor_dir = os.path.join(DATA_DIR, sensor_id)
-        os.makedirs(sensor_dir, exist_ok=True)
-
-        for sensor_type, group_df in sensor_df.groupby("sensor_type"):
-            csv_path = os.path.join(sensor_dir, f"{sensor_type}.csv")
-
-            if os.path.exists(csv_path):
-                existing_df = pd.read_csv(csv_path, parse_dates=["date"])
-                combined_df = pd.concat([existing_df, group_df], ignore_index=True)
-                # 중복 제거: gateway_id, sensor_id, sensor_type, date 기준
-                combined_df.drop_duplicates(subset=["gateway_id", "sensor_id", "sensor_type", "date"], inplace=True)
-            else:
-                combined_df = group_df
-
-            combined_df.sort_values(by=["date"], inplace=True)
-            combined_df.to_csv(csv_path, index=False)
-            logger.info(f"센서 {sensor_id} - 타입 {sensor_type}: {len(group_df)}개 저장 완료 ({datetime.now().isoformat()})")
+        return df
+
+    with job_lock("history"):
+        appended = get_history_store().append(df)
+        # 새로 추가된 센서만 다음 분석 대상(dirty)으로 표시
+        get_manifest().mark_ingested(appended)
+        if ROLLING_WINDOW_ENABLED:
+            # 분석 시 이력 파일을 다시 읽지 않도록 센서별 최근 윈도우도 함께 갱신
+            # (메모리에만 반영, 스냅샷은 호출한 쪽이 실행 끝에 flush_rolling_windows()로 저장)
+            update_rolling_windows(appended)
+    metrics.inc("records_ingested_total", len(appended))
+    metrics.inc("records_duplicate_total", len(df) - len(appended))
+    logger.info("센서 이력 저장: %s/%s건 신규 (%s)", len(appended), len(df), datetime.now().isoformat())
+    return appended
 
 
 if __name__ == "__main__":
     df = fetch_threshold_history(datetime.now())
     save_by_sensor_and_type(df)
+    flush_rolling_windows()
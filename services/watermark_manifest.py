@@ -0,0 +1,150 @@
+import os
+import sqlite3
+import logging
+import threading
+import pandas as pd
+from config.settings import PIPELINE_MANIFEST_PATH
+
+SENSOR_KEYS = ["gateway_id", "sensor_id"]
+WINDOW_COLUMNS = ["gateway_id", "sensor_id", "date", "min_diff", "max_diff", "avg_diff"]
+
+logger = logging.getLogger(__name__)
+
+
+def window_hashes(df: pd.DataFrame) -> pd.Series:
+    """
+    센서별 입력 윈도우 해시 (gateway_id, sensor_id 인덱스).
+    행 해시를 센서별로 합산하므로 행 순서와 무관합니다.
+    """
+    if df.empty:
+        return pd.Series(dtype=str)
+    rows = df[WINDOW_COLUMNS].copy()
+    for col in SENSOR_KEYS:
+        rows[col] = rows[col].astype(str)
+    row_hashes = pd.util.hash_pandas_object(rows, index=False)
+    # uint64 합은 2^64로 나눈 나머지로 계산되어 넘침 없이 결합됨
+    sums = row_hashes.groupby([rows["gateway_id"], rows["sensor_id"]], sort=False).sum()
+    return sums.map(lambda v: format(int(v), "016x"))
+
+
+class WatermarkManifest:
+    """
+    센서/타입별 수집·분석 워터마크.
+
+    - last_ingested: 마지막으로 수집된 데이터 날짜
+    - last_scored:   마지막으로 분석한 날짜
+    - window_hash:   마지막 분석 시 입력 윈도우 해시
+    - dirty:         마지막 분석 이후 새 데이터가 수집되었는지 여부
+    """
+
+    def __init__(self, path: str = PIPELINE_MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None or self._conn_pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sensors ("
+                " sensor_type TEXT NOT NULL, gateway_id TEXT NOT NULL, sensor_id TEXT NOT NULL,"
+                " last_ingested TEXT, last_scored TEXT, window_hash TEXT,"
+                " dirty INTEGER NOT NULL DEFAULT 1,"
+                " PRIMARY KEY (sensor_type, gateway_id, sensor_id)) WITHOUT ROWID"
+            )
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def mark_ingested(self, df: pd.DataFrame):
+        """새로 저장된 행의 센서들을 dirty로 표시하고 마지막 수집 날짜를 갱신합니다."""
+        if df.empty:
+            return
+        latest = df.groupby(["sensor_type", "gateway_id", "sensor_id"], observed=True)["date"].max()
+        rows = [
+            (str(s_type), str(gateway_id), str(sensor_id), pd.Timestamp(date).strftime("%Y-%m-%d"))
+            for (s_type, gateway_id, sensor_id), date in latest.items()
+        ]
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO sensors (sensor_type, gateway_id, sensor_id, last_ingested, dirty)"
+                " VALUES (?, ?, ?, ?, 1)"
+                " ON CONFLICT(sensor_type, gateway_id, sensor_id) DO UPDATE SET"
+                " last_ingested = max(coalesce(last_ingested, ''), excluded.last_ingested), dirty = 1",
+                rows
+            )
+
+    def dirty_sensor_types(self, sensor_types: list) -> list:
+        """
+        다시 분석해야 하는 센서 타입 목록.
+        dirty 센서가 있거나 아직 워터마크가 없는 타입이 대상입니다.
+        """
+        with self._lock:
+            conn = self._connect()
+            dirty = {t for (t,) in conn.execute("SELECT DISTINCT sensor_type FROM sensors WHERE dirty = 1")}
+            known = {t for (t,) in conn.execute("SELECT DISTINCT sensor_type FROM sensors")}
+        return [t for t in sensor_types if t in dirty or t not in known]
+
+    def window_hashes(self, sensor_type: str) -> dict:
+        """(gateway_id, sensor_id) -> 마지막 분석 시 윈도우 해시"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT gateway_id, sensor_id, window_hash FROM sensors"
+                " WHERE sensor_type = ? AND window_hash IS NOT NULL",
+                (sensor_type,)
+            ).fetchall()
+        return {(gateway_id, sensor_id): window_hash for gateway_id, sensor_id, window_hash in rows}
+
+    def mark_scored(self, sensor_type: str, hashes: dict, scored_on: str):
+        """분석한 센서의 윈도우 해시와 분석 날짜를 기록하고 dirty를 해제합니다."""
+        rows = [(sensor_type, gateway_id, sensor_id, scored_on, window_hash)
+                for (gateway_id, sensor_id), window_hash in hashes.items()]
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO sensors (sensor_type, gateway_id, sensor_id, last_scored, window_hash, dirty)"
+                " VALUES (?, ?, ?, ?, ?, 0)"
+                " ON CONFLICT(sensor_type, gateway_id, sensor_id) DO UPDATE SET"
+                " last_scored = excluded.last_scored, window_hash = excluded.window_hash, dirty = 0",
+                rows
+            )
+
+    def mark_failed(self, sensor_type: str, keys: list):
+        """분석 중 실패한 센서를 dirty로 표시하고 윈도우 해시를 지워, 입력이 그대로여도 다시 분석되게 합니다."""
+        rows = [(sensor_type, gateway_id, sensor_id) for gateway_id, sensor_id in keys]
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO sensors (sensor_type, gateway_id, sensor_id, dirty) VALUES (?, ?, ?, 1)"
+                " ON CONFLICT(sensor_type, gateway_id, sensor_id) DO UPDATE SET dirty = 1, window_hash = NULL",
+                rows
+            )
+
+    def clear_dirty(self, sensor_type: str):
+        """타입 전체 분석이 끝난 뒤, 윈도우 밖의 데이터만 수집된 센서의 dirty도 해제합니다."""
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE sensors SET dirty = 0 WHERE sensor_type = ?", (sensor_type,))
+
+    def mark_dirty(self, sensor_type: str, gateway_id: str = None, sensor_id: str = None):
+        """모델 교체 등으로 입력과 무관하게 다시 분석해야 할 때 사용합니다."""
+        query = "UPDATE sensors SET dirty = 1, window_hash = NULL WHERE sensor_type = ?"
+        params = [sensor_type]
+        if gateway_id is not None:
+            query += " AND gateway_id = ?"
+            params.append(gateway_id)
+        if sensor_id is not None:
+            query += " AND sensor_id = ?"
+            params.append(sensor_id)
+        with self._lock, self._connect() as conn:
+            conn.execute(query, params)
+
+
+_manifest = None
+
+
+def get_manifest() -> WatermarkManifest:
+    global _manifest
+    if _manifest is None:
+        _manifest = WatermarkManifest()
+    return _manifest
@@ -0,0 +1,59 @@
+import glob
+import os
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from services.history_loader import iter_csv_batches, read_history_csv  # noqa: E402
+from services.history_store import PartitionedHistoryStore  # noqa: E402
+
+SENSORS = [("gw-1", f"sensor-{i}") for i in range(6)]
+DAYS = pd.date_range("2025-01-01", periods=5, freq="D")
+
+
+def _history() -> pd.DataFrame:
+    rows = [
+        {"gateway_id": gw, "sensor_id": sid, "sensor_type": "temperature", "date": day,
+         "min_diff": 0.1, "max_diff": 0.5, "avg_diff": 0.3, "health_score": 0.9}
+        for day in DAYS for gw, sid in SENSORS
+    ]
+    return pd.DataFrame(rows)
+
+
+def _assert_whole_sensors(batches: list):
+    assert len(batches) > 1
+    assert sum(len(batch) for batch in batches) == len(SENSORS) * len(DAYS)
+    seen = [key for batch in batches for key in batch.groupby(["gateway_id", "sensor_id"], observed=True).groups]
+    assert sorted(seen) == sorted(SENSORS)  # 센서가 여러 묶음에 나뉘지 않음
+
+
+def test_partitioned_batches_read_each_segment_once(tmp_path, monkeypatch):
+    store = PartitionedHistoryStore(root=str(tmp_path / "history"), segment_format="csv")
+    store.append(_history())
+    segments = glob.glob(os.path.join(store.root, "temperature", "*", "part-*"))
+
+    reads = []
+    read_segment = store._read_segment
+    monkeypatch.setattr(store, "_read_segment", lambda path: reads.append(path) or read_segment(path))
+
+    batches = list(store.iter_sensor_batches("temperature", row_budget=2 * len(DAYS)))
+
+    assert len(batches) == 3
+    assert sorted(reads) == sorted(segments)
+    _assert_whole_sensors(batches)
+
+
+def test_csv_batches_read_file_twice(tmp_path, monkeypatch):
+    path = str(tmp_path / "history.csv")
+    _history().to_csv(path, index=False)
+
+    import services.history_loader as history_loader
+    reads = []
+    monkeypatch.setattr(history_loader, "read_history_csv",
+                        lambda *args, **kwargs: reads.append(kwargs.get("usecols")) or read_history_csv(*args, **kwargs))
+
+    batches = list(iter_csv_batches(path, row_budget=2 * len(DAYS), chunk_rows=7))
+
+    # 센서별 행 수를 세는 1차 패스(id 컬럼만) + 전체 컬럼 1회
+    assert reads == [["gateway_id", "sensor_id"], None]
+    _assert_whole_sensors(batches)
@@ -0,0 +1,69 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from services.history_store import CsvHistoryStore, PartitionedHistoryStore  # noqa: E402
+
+COLUMNS = ["gateway_id", "sensor_id", "date", "min_diff", "max_diff", "avg_diff"]
+LAST_DAY = pd.Timestamp("2025-03-31")
+
+
+def _rows(sensor_id: str, days) -> list:
+    return [{"gateway_id": "gw-1", "sensor_id": sensor_id, "sensor_type": "temperature", "date": day,
+             "min_diff": 0.25, "max_diff": 0.75, "avg_diff": 0.5 + (i % 4) / 8} for i, day in enumerate(days)]
+
+
+def gappy_history() -> pd.DataFrame:
+    """
+    - dense:   최근 20일 매일
+    - gappy:   최근 60일 동안 사흘에 한 번, 최근 행 두 개는 결측값
+    - stopped: 40일 전에 수집이 멈춘 센서
+    """
+    rows = _rows("dense", pd.date_range(end=LAST_DAY, periods=20, freq="D"))
+    gappy = _rows("gappy", pd.date_range(end=LAST_DAY, periods=20, freq="3D"))
+    for row in gappy[-2:]:
+        row["avg_diff"] = None
+    rows += gappy
+    rows += _rows("stopped", pd.date_range(end=LAST_DAY - pd.Timedelta(days=40), periods=20, freq="D"))
+    return pd.DataFrame(rows)
+
+
+def expected_window(df: pd.DataFrame, days: int) -> pd.DataFrame:
+    # 기존 파이프라인 기준: 센서별 날짜 정렬 → 결측 제외 → 최근 days개
+    frames = [group.sort_values(by="date").dropna(subset=["min_diff", "max_diff", "avg_diff"]).tail(days)
+              for _, group in df.groupby(["gateway_id", "sensor_id"])]
+    return normalized(pd.concat(frames))
+
+
+def normalized(df: pd.DataFrame) -> pd.DataFrame:
+    df = df[COLUMNS].astype({"gateway_id": str, "sensor_id": str, "min_diff": "float32",
+                             "max_diff": "float32", "avg_diff": "float32"})
+    df["date"] = pd.to_datetime(df["date"])
+    return df.sort_values(by=["gateway_id", "sensor_id", "date"]).reset_index(drop=True)
+
+
+@pytest.fixture(params=["csv", "partitioned"])
+def store(request, tmp_path):
+    if request.param == "csv":
+        return CsvHistoryStore(str(tmp_path / "sensors"))
+    return PartitionedHistoryStore(root=str(tmp_path / "history"), segment_format="csv")
+
+
+def test_read_recent_uses_each_sensors_own_window(store):
+    df = gappy_history()
+    store.append(df)
+
+    window = normalized(store.read_recent("temperature", days=15))
+
+    pd.testing.assert_frame_equal(window, expected_window(df, 15))
+    assert window.groupby("sensor_id").size().to_dict() == {"dense": 15, "gappy": 15, "stopped": 15}
+
+
+def test_read_recent_single_sensor_skips_missing_rows(store):
+    df = gappy_history()
+    store.append(df)
+
+    window = normalized(store.read_recent("temperature", days=15, gateway_id="gw-1", sensor_id="gappy"))
+
+    expected = expected_window(df, 15)
+    pd.testing.assert_frame_equal(window, expected[expected["sensor_id"] == "gappy"].reset_index(drop=True))